@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Benchmarks: SeeZee hub hot paths (run on the PC or Pi, no hardware needed)
+
+Usage: python bench_seezee.py [name ...]
+       python bench_seezee.py lan --seconds 5 --fps 60 --strips 4 --leds 300
+"""
+
+import socket
+import statistics
+import sys
+import threading
+import time
+
+import seezee_server as hub
+
+
+def _arg(name, default):
+    """Read --name value from argv"""
+    flag = f"--{name}"
+    if flag in sys.argv:
+        index = sys.argv.index(flag)
+        if index + 1 < len(sys.argv):
+            return type(default)(sys.argv[index + 1])
+    return default
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class UdpSink:
+    """Local UDP receiver that records (arrival time, packet size) per port"""
+
+    def __init__(self, count):
+        self.sockets = []
+        self.frames = {}
+        self.running = True
+        for _ in range(count):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind(('127.0.0.1', 0))
+            sock.settimeout(0.2)
+            port = sock.getsockname()[1]
+            self.sockets.append(sock)
+            self.frames[port] = []
+        self.threads = [threading.Thread(target=self._recv, args=(s,), daemon=True) for s in self.sockets]
+        for t in self.threads:
+            t.start()
+
+    @property
+    def ports(self):
+        return list(self.frames.keys())
+
+    def _recv(self, sock):
+        frames = self.frames[sock.getsockname()[1]]
+        while self.running:
+            try:
+                data = sock.recv(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            # DDP push flag (or any non-DDP packet) marks a complete frame
+            if data[0] & 0xC0 != 0x40 or data[0] & 0x01:
+                frames.append((time.perf_counter(), len(data)))
+
+    def close(self):
+        self.running = False
+        for t in self.threads:
+            t.join()
+        for s in self.sockets:
+            s.close()
+
+
+def bench_lan():
+    """Stream solid-color frames to a local sink and report fps + jitter"""
+    seconds = _arg('seconds', 5.0)
+    fps = _arg('fps', 60.0)
+    strips = _arg('strips', 4)
+    leds = _arg('leds', 300)
+
+    sink = UdpSink(strips)
+    devices = [
+        {'id': f'bench-{i}', 'name': f'Bench strip {i}', 'ip': '127.0.0.1', 'port': port,
+         'protocol': 'ddp' if i % 2 == 0 else 'drgb', 'ledCount': leds}
+        for i, port in enumerate(sink.ports)
+    ]
+    streams = [hub.lan_get_stream(d) for d in devices]
+
+    print(f"📡 LAN stream: {strips} strip(s) × {leds} LEDs @ {fps:.0f} fps for {seconds:.0f}s")
+    interval = 1.0 / fps
+    start = time.monotonic()
+    next_frame = start
+    frame = 0
+    while time.monotonic() - start < seconds:
+        hue = frame % 256
+        for stream in streams:
+            hub.lan_fill_solid(stream, hue, 255 - hue, 128)
+            hub.lan_push(stream)
+        frame += 1
+        next_frame += interval
+        delay = next_frame - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    time.sleep(0.3)
+    sink.close()
+
+    for device, port in zip(devices, sink.ports):
+        arrivals = [t for t, _ in sink.frames[port]]
+        gaps = [(b - a) * 1000 for a, b in zip(arrivals, arrivals[1:])]
+        achieved = (len(arrivals) - 1) / (arrivals[-1] - arrivals[0]) if len(arrivals) > 1 else 0.0
+        jitter = statistics.pstdev(gaps) if gaps else 0.0
+        print(f"   {device['name']} [{device['protocol']}]: {len(arrivals)} frames, "
+              f"{achieved:.1f} fps, jitter σ={jitter:.2f} ms, p99 gap={_percentile(gaps, 99):.2f} ms")
+
+
+def bench_effects():
+    """Run a color cycle across segmented strips on the effects engine"""
+    seconds = _arg('seconds', 5.0)
+    strips = _arg('strips', 4)
+    leds = _arg('leds', 300)
+    segments = _arg('segments', 30)
+
+    sink = UdpSink(strips)
+    hub.config = {
+        'lan_lights': {'enabled': True, 'devices': [
+            {'id': f'fx-{i}', 'name': f'FX strip {i}', 'ip': '127.0.0.1', 'port': port,
+             'protocol': 'ddp', 'ledCount': leds, 'segments': segments}
+            for i, port in enumerate(sink.ports)
+        ]},
+        'govee': {'enabled': False}
+    }
+    colors = [{'r': 255, 'g': 0, 'b': 0}, {'r': 0, 'g': 255, 'b': 0}, {'r': 0, 'g': 0, 'b': 255}]
+
+    print(f"✨ Effects: cycle on {strips} strip(s) × {segments} segments for {seconds:.0f}s")
+    hub.start_lighting_effect('cycle', colors, duration_ms=seconds * 1000, period_ms=2000, backends=['lan'], spread=0.1)
+    time.sleep(seconds + 0.5)
+    sink.close()
+
+    stats = hub.lighting_engine_stats()
+    for name, backend in stats['backends'].items():
+        print(f"   {name}: sent={backend['framesSent']} dropped={backend['framesDropped']} (max {backend['maxFps']} fps)")
+    for port in sink.ports:
+        arrivals = [t for t, _ in sink.frames[port]]
+        gaps = [(b - a) * 1000 for a, b in zip(arrivals, arrivals[1:])]
+        achieved = (len(arrivals) - 1) / (arrivals[-1] - arrivals[0]) if len(arrivals) > 1 else 0.0
+        print(f"   sink :{port}: {achieved:.1f} fps, jitter σ={statistics.pstdev(gaps) if gaps else 0:.2f} ms")
+
+
+def bench_segments():
+    """Correct + diff hundreds of segments across the fleet per frame"""
+    import numpy as np
+
+    frames = _arg('frames', 500)
+    govee_devices = _arg('govee', 40)
+    lan_devices = _arg('lan', 10)
+    hub.config = {
+        'lighting': {'gamma': 2.2, 'whiteBalance': [1.0, 0.92, 0.85]},
+        'govee': {'enabled': True, 'apiKey': 'bench', 'devices': [
+            {'device': f'AA:{i:02X}', 'model': 'H6182', 'name': f'Strip {i}', 'segments': 15,
+             'calibration': [[0.95, 0.05, 0], [0, 1, 0], [0, 0.05, 0.95]]}
+            for i in range(govee_devices)
+        ]},
+        'lan_lights': {'enabled': True, 'devices': [
+            {'id': f'wled-{i}', 'ip': f'10.0.0.{i + 10}', 'ledCount': 300, 'segments': 30}
+            for i in range(lan_devices)
+        ]}
+    }
+    layout = hub._segment_layout()
+    refs = [t['key'] for t in layout['targets']]
+    rng = np.random.default_rng(1)
+    print(f"🌈 Segments: {layout['rows']} segments on {len(refs)} devices, {frames} frames")
+
+    pass_times = []
+    diff_times = []
+    changed_total = 0
+    for _ in range(frames):
+        # ~10% of devices change a few segments per frame
+        batch = {}
+        for key in rng.choice(refs, size=max(1, len(refs) // 10), replace=False):
+            target = layout['byKey'][key]
+            colors = layout['frame'][target['rows']].copy()
+            colors[rng.integers(0, target['segments'], size=3)] = rng.integers(0, 256, size=(3, 3))
+            batch[key] = colors.tolist()
+
+        start = time.perf_counter()
+        hub.set_segment_frame(batch, dispatch=False)
+        pass_times.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        for key in batch:
+            target, indices, colors = hub.segment_changes(key)
+            changed_total += len(indices)
+            hub._segment_mark_sent(target, indices, colors)
+        diff_times.append((time.perf_counter() - start) * 1000)
+
+    print(f"   pipeline pass: avg {statistics.mean(pass_times):.3f} ms, p99 {_percentile(pass_times, 99):.3f} ms")
+    print(f"   diff + mark:   avg {statistics.mean(diff_times):.3f} ms, p99 {_percentile(diff_times, 99):.3f} ms")
+    print(f"   segments sent: {changed_total / frames:.1f} per frame of {layout['rows']}")
+
+
+def bench_schedule():
+    """Heap scheduler overhead with thousands of scheduled scenes"""
+    import random
+
+    entries = _arg('entries', 5000)
+    rng = random.Random(1)
+    day_sets = ['daily', 'weekdays', 'weekends', ['mon', 'wed', 'fri']]
+    hub.config = {'schedule': [
+        {'id': f'e{i}', 'name': f'Scene {i}', 'at': f'{rng.randrange(24):02d}:{rng.randrange(60):02d}',
+         'days': rng.choice(day_sets), 'theme': {'brightness': 20}}
+        for i in range(entries)
+    ]}
+    print(f"⏰ Schedule: {entries} entries")
+
+    start = time.perf_counter()
+    hub.rebuild_schedule(now=time.time())
+    print(f"   rebuild: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    upcoming = hub.upcoming_schedule(20)
+    print(f"   upcoming(20): {(time.perf_counter() - start) * 1000:.2f} ms (next in {upcoming[0]['inSeconds']}s)")
+
+    # Walk one simulated week of firings without applying themes
+    now = time.time()
+    fired = 0
+    start = time.perf_counter()
+    with hub.schedule_lock:
+        while hub.schedule_state['heap'] and hub.schedule_state['heap'][0][0] < now + 7 * 86400:
+            fired += len(hub._schedule_pop_due(hub.schedule_state['heap'][0][0]))
+    elapsed = time.perf_counter() - start
+    print(f"   one week: {fired} firings, {elapsed / max(1, fired) * 1e6:.1f} µs per firing (pop + reschedule)")
+
+
+BENCHMARKS = {
+    'lan': bench_lan,
+    'effects': bench_effects,
+    'segments': bench_segments,
+    'schedule': bench_schedule,
+}
+
+
+if __name__ == '__main__':
+    names = [a for a in sys.argv[1:] if not a.startswith('--') and a in BENCHMARKS] or list(BENCHMARKS)
+    for name in names:
+        print("=" * 60)
+        BENCHMARKS[name]()
+    print("=" * 60)
@@ -11,6 +11,7 @@ type SpotifyNowPlaying = {
   artists?: string[]
   album?: string
   albumArtUrl?: string | null
+  albumArt?: string | null
   progressMs?: number
   durationMs?: number
 }
@@ -228,9 +229,9 @@ export default function AudioController() {
           <section className="lg:col-span-2 rounded-2xl border border-white/10 bg-white/5 p-5">
             <div className="flex items-start gap-4">
               <div className="h-24 w-24 rounded-2xl bg-gradient-to-br from-green-500/40 to-emerald-500/20 flex items-center justify-center text-3xl flex-shrink-0 overflow-hidden">
-                {nowPlaying?.albumArtUrl ? (
+                {nowPlaying?.albumArt || nowPlaying?.albumArtUrl ? (
                   <img
-                    src={nowPlaying.albumArtUrl}
+                    src={nowPlaying.albumArt ? `${serverUrl}${nowPlaying.albumArt}` : nowPlaying.albumArtUrl!}
                     alt={nowPlaying.album || "Album art"}
                     className="w-full h-full object-cover"
                   />
@@ -244,9 +244,11 @@ export const useConnectionStore = create<ConnectionStore>()(
         }
         
         try {
-          const body = game.steamAppId 
-            ? { steamAppId: game.steamAppId }
-            : { execPath: game.execPath }
+          // id lets the server find the game in its library to theme the room from its cover art
+          const body = {
+            ...(game.steamAppId ? { steamAppId: game.steamAppId } : { execPath: game.execPath }),
+            id: game.id,
+          }
           
           console.log('Launching game with:', body)
           
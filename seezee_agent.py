@@ -4,112 +4,520 @@ Lightweight background service that exposes system stats via HTTP
 
 Install: pip install psutil flask flask-cors
 Run: python seezee_agent.py
+
+Push telemetry (optional): SEEZEE_HUB_TELEMETRY="<hub ip>[:port]" sends one
+small UDP datagram per SEEZEE_TELEMETRY_INTERVAL seconds (default 2) to the
+hub, which then stops polling /stats for this device.
 """
 
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 import psutil
 import os
+import json
 import socket
+import threading
+import time
+from array import array
+
+import seezee_sensors
+import seezee_telemetry
 
 app = Flask(__name__)
 CORS(app)
 
+# Seconds between samples per metric group. Override with
+# SEEZEE_AGENT_INTERVALS="temps=10,disk=60".
+SAMPLE_INTERVALS = {
+    'cpu': 1.0,
+    'memory': 1.0,
+    'network': 1.0,
+    'freq': 5.0,
+    'gpu': 2.0,
+    'temps': 5.0,
+    'disk': 30.0,
+    'system': 30.0
+}
+ALWAYS_SAMPLED = ('cpu', 'memory', 'network', 'system')   # cheap; the rest follow demand
+FIELD_DEMAND_SECONDS = 120.0   # expensive groups nobody asked for recently are not sampled
+STATS_FIELDS = ('system', 'cpu', 'memory', 'disk', 'network', 'temps', 'gpu')
+FIELD_GROUPS = {'cpu': ('cpu', 'freq')}   # response field -> groups it is built from
+
+# The sampler thread swaps in a fresh record per group on every sample; /stats
+# assembles the requested fields from memory and caches the serialized body
+# until a group it uses is sampled again.
+stats_lock = threading.Lock()
+sample_lock = threading.Lock()   # one reader of the OS counters at a time
+stats_state = {
+    'groups': {},           # group -> {'value', 'sampledAt' (epoch), 'due' (monotonic)}
+    'requested': {},        # group -> time.monotonic() of the last request that needed it
+    'counters': {},         # previous raw readings for rates
+    'errors': {},           # group -> last sampling error, until it samples again
+    'version': 0,
+    'cache': {},            # fields tuple -> (version, body bytes)
+    'samples': 0,
+    'thread': None,
+    'ready': threading.Event()
+}
+
+
 def get_hostname():
     """Get system hostname"""
     return socket.gethostname()
 
-@app.route('/stats', methods=['GET'])
-def get_stats():
-    """Return system statistics"""
+
+def _load_intervals():
+    for item in os.environ.get('SEEZEE_AGENT_INTERVALS', '').split(','):
+        name, _, seconds = item.partition('=')
+        if name.strip() in SAMPLE_INTERVALS:
+            try:
+                SAMPLE_INTERVALS[name.strip()] = max(0.5, float(seconds))
+            except ValueError:
+                pass
+
+
+def _rate(current, previous, elapsed):
+    return int(max(0, current - previous) / elapsed) if previous is not None and elapsed > 0 else 0
+
+
+def _sample_cpu(counters):
+    return {'usage': round(psutil.cpu_percent(interval=None), 1), 'cores': psutil.cpu_count()}
+
+
+def _sample_freq(counters):
+    cpu_freq = psutil.cpu_freq()
+    return {'freq': round(cpu_freq.current, 0) if cpu_freq else 0}
+
+
+def _sample_memory(counters):
+    mem = psutil.virtual_memory()
+    return {
+        'used': round(mem.used / (1024**3), 2),
+        'total': round(mem.total / (1024**3), 2),
+        'percent': round(mem.percent, 1)
+    }
+
+
+def _sample_disk(counters):
+    """Disk usage and I/O rates (bytes/s) over the disk interval"""
+    now = time.monotonic()
+    usage = psutil.disk_usage('/')
+    value = {
+        'used': round(usage.used / (1024**3), 2),
+        'total': round(usage.total / (1024**3), 2),
+        'percent': round(usage.percent, 1),
+        'readRate': 0,
+        'writeRate': 0
+    }
+    io = psutil.disk_io_counters()
+    if io is not None:
+        elapsed = now - counters.get('diskAt', now)
+        value['readRate'] = _rate(io.read_bytes, counters.get('read'), elapsed)
+        value['writeRate'] = _rate(io.write_bytes, counters.get('write'), elapsed)
+        counters['read'], counters['write'], counters['diskAt'] = io.read_bytes, io.write_bytes, now
+    return value
+
+
+def _sample_network(counters):
+    """Network totals (GB) and rates (bytes/s)"""
+    now = time.monotonic()
+    net = psutil.net_io_counters()
+    elapsed = now - counters.get('netAt', now)
+    value = {
+        'sent': round(net.bytes_sent / (1024**3), 2),
+        'recv': round(net.bytes_recv / (1024**3), 2),
+        'sentRate': _rate(net.bytes_sent, counters.get('sent'), elapsed),
+        'recvRate': _rate(net.bytes_recv, counters.get('recv'), elapsed)
+    }
+    counters['sent'], counters['recv'], counters['netAt'] = net.bytes_sent, net.bytes_recv, now
+    return value
+
+
+def _sample_temps(counters):
+    return dict(seezee_sensors.read_temperatures())
+
+
+def _sample_gpu(counters):
+    gpu_sensors = seezee_sensors.gpu_sensors()
+    return {'gpus': gpu_sensors.read(), 'status': gpu_sensors.status()}
+
+
+def _sample_system(counters):
+    return {'hostname': get_hostname(), 'ip': get_local_ip(), 'bootTime': psutil.boot_time()}
+
+
+SAMPLERS = {
+    # group -> (sampler returning a new value, placeholder value before the first sample)
+    'cpu': (_sample_cpu, lambda: {'usage': 0.0, 'cores': psutil.cpu_count()}),
+    'freq': (_sample_freq, lambda: {'freq': 0}),
+    'memory': (_sample_memory, lambda: {'used': 0.0, 'total': 0.0, 'percent': 0.0}),
+    'disk': (_sample_disk, lambda: {'used': 0.0, 'total': 0.0, 'percent': 0.0, 'readRate': 0, 'writeRate': 0}),
+    'network': (_sample_network, lambda: {'sent': 0.0, 'recv': 0.0, 'sentRate': 0, 'recvRate': 0}),
+    'temps': (_sample_temps, dict),
+    'gpu': (_sample_gpu, lambda: {'gpus': [], 'status': None}),
+    'system': (_sample_system, lambda: {'hostname': '', 'ip': '', 'bootTime': 0})
+}
+
+
+def sample_groups(names):
+    """Sample the given groups, replacing each group's record in one assignment
+
+    Readers never lock: they see either the old record or the new one, never a
+    value that is half updated.
+    """
+    sampled = False
+    with sample_lock:
+        for name in names:
+            group = stats_state['groups'].get(name)
+            if group is None:
+                group = {'value': SAMPLERS[name][1](), 'sampledAt': None, 'due': 0.0}
+                stats_state['groups'][name] = group
+            try:
+                value = SAMPLERS[name][0](stats_state['counters'])
+            except Exception as e:
+                print(f"[Agent] Sampling {name} failed: {e}")
+                stats_state['errors'][name] = str(e)
+                continue
+            stats_state['errors'].pop(name, None)
+            stats_state['groups'][name] = {
+                'value': value,
+                'sampledAt': time.time(),
+                'due': time.monotonic() + SAMPLE_INTERVALS[name]
+            }
+            sampled = True
+    if sampled:
+        with stats_lock:
+            stats_state['version'] += 1
+            stats_state['samples'] += 1
+
+
+def _demanded(name, now):
+    if name in ALWAYS_SAMPLED:
+        return True
+    return now - stats_state['requested'].get(name, float('-inf')) < FIELD_DEMAND_SECONDS
+
+
+# Metric history: one preallocated array per metric covering the last hour at
+# 1 s resolution (about 100 KB total); slots are overwritten in place.
+HISTORY_SECONDS = 3600
+HISTORY_RESOLUTION_SECONDS = 1.0
+HISTORY_DEFAULT_POINTS = 120
+
+
+def _first_gpu(groups, key):
+    gpus = groups.get('gpu', {}).get('value', {}).get('gpus')
+    value = gpus[0].get(key) if gpus else None
+    return float('nan') if value is None else value
+
+
+HISTORY_METRICS = {
+    # name -> (unit, group it needs, reader over the group values)
+    'cpu': ('%', 'cpu', lambda g: g['cpu']['value']['usage']),
+    'memory': ('%', 'memory', lambda g: g['memory']['value']['percent']),
+    'netSent': ('B/s', 'network', lambda g: g['network']['value']['sentRate']),
+    'netRecv': ('B/s', 'network', lambda g: g['network']['value']['recvRate']),
+    'gpu': ('%', 'gpu', lambda g: _first_gpu(g, 'usage')),
+    'gpuTemp': ('°C', 'gpu', lambda g: _first_gpu(g, 'temp'))
+}
+
+history_lock = threading.Lock()
+history = {
+    'times': array('d', bytes(8 * HISTORY_SECONDS)),
+    'values': {name: array('f', [float('nan')]) * HISTORY_SECONDS for name in HISTORY_METRICS},
+    'head': 0,              # next slot to write
+    'count': 0,
+    'lastAt': 0.0
+}
+
+
+def record_history():
+    """Append the current value of every metric (NaN where its group isn't sampled)"""
+    now = time.time()
+    if now - history['lastAt'] < HISTORY_RESOLUTION_SECONDS * 0.9:
+        return
+    groups = stats_state['groups']
+    # Groups not sampled within ~2 of their intervals (e.g. GPU after demand lapsed) record NaN
+    fresh = {
+        name for name, group in list(groups.items())
+        if group.get('sampledAt') is not None and now - group['sampledAt'] <= 2 * SAMPLE_INTERVALS[name] + 0.5
+    }
+    with history_lock:
+        slot = history['head']
+        history['times'][slot] = now
+        for name, (_, group, reader) in HISTORY_METRICS.items():
+            try:
+                history['values'][name][slot] = reader(groups) if group in fresh else float('nan')
+            except (KeyError, TypeError):
+                history['values'][name][slot] = float('nan')
+        history['head'] = (slot + 1) % HISTORY_SECONDS
+        history['count'] = min(history['count'] + 1, HISTORY_SECONDS)
+        history['lastAt'] = now
+
+
+def history_series(metric, since, points):
+    """min/max/avg per bucket for samples newer than since, oldest first"""
+    with history_lock:
+        count = history['count']
+        start = (history['head'] - count) % HISTORY_SECONDS
+        order = [(start + i) % HISTORY_SECONDS for i in range(count)]
+        times = history['times']
+        values = history['values'][metric]
+        samples = [(times[i], values[i]) for i in order if times[i] > since]
+
+    series = {'t': [], 'min': [], 'max': [], 'avg': []}
+    if not samples:
+        return series
+    buckets = min(points, len(samples))
+    size = len(samples) / buckets
+    for b in range(buckets):
+        chunk = samples[int(b * size):int((b + 1) * size)]
+        finite = [v for _, v in chunk if v == v]   # drop NaN gaps
+        series['t'].append(round(chunk[-1][0], 3))
+        if finite:
+            series['min'].append(round(min(finite), 2))
+            series['max'].append(round(max(finite), 2))
+            series['avg'].append(round(sum(finite) / len(finite), 2))
+        else:
+            series['min'].append(None)
+            series['max'].append(None)
+            series['avg'].append(None)
+    return series
+
+
+def _sampler_loop():
+    psutil.cpu_percent(interval=None)  # prime the CPU baseline
+    tick = min(SAMPLE_INTERVALS.values())
+    next_run = time.monotonic()
+    while True:
+        now = time.monotonic()
+        due = [
+            name for name in SAMPLERS
+            # Half a tick of slack so a group due just after this tick isn't pushed a whole tick late
+            if _demanded(name, now) and now + tick / 2 >= stats_state['groups'].get(name, {}).get('due', 0.0)
+        ]
+        if due:
+            sample_groups(due)
+        record_history()
+        stats_state['ready'].set()
+
+        next_run += tick
+        delay = next_run - time.monotonic()
+        if delay < 0:
+            next_run = time.monotonic()
+            delay = 0
+        time.sleep(delay)
+
+
+def start_sampler():
+    with stats_lock:
+        thread = stats_state['thread']
+        if thread is None or not thread.is_alive():
+            _load_intervals()
+            stats_state['thread'] = threading.Thread(target=_sampler_loop, daemon=True)
+            stats_state['thread'].start()
+
+
+telemetry_state = {
+    'target': None,         # (host, port) when push telemetry is enabled
+    'interval': 2.0,
+    'seq': 0,
+    'boot': int.from_bytes(os.urandom(4), 'big'),   # new per start; the hub detects restarts by it
+    'sent': 0,
+    'errors': 0,
+    'thread': None
+}
+TELEMETRY_GROUPS = ('cpu', 'memory', 'disk', 'network', 'gpu')
+
+
+def _telemetry_target():
+    host, _, port = os.environ.get('SEEZEE_HUB_TELEMETRY', '').strip().partition(':')
+    if not host:
+        return None
     try:
-        # CPU
-        cpu_percent = psutil.cpu_percent(interval=0.1)
-        cpu_freq = psutil.cpu_freq()
-        cpu_count = psutil.cpu_count()
-        
-        # Memory
-        mem = psutil.virtual_memory()
-        
-        # Disk
-        disk = psutil.disk_usage('/')
-        
-        # Network
-        net = psutil.net_io_counters()
-        
-        # Temperatures (if available)
-        temps = {}
+        return host, int(port or seezee_telemetry.TELEMETRY_PORT)
+    except ValueError:
+        print(f"[Agent] Ignoring SEEZEE_HUB_TELEMETRY={os.environ['SEEZEE_HUB_TELEMETRY']!r}")
+        return None
+
+
+def _telemetry_stats(groups):
+    """Current group values in the /stats layout the datagram packs"""
+    stats = {name: groups[name]['value'] for name in ('cpu', 'memory', 'disk', 'network') if name in groups}
+    gpus = groups.get('gpu', {}).get('value', {}).get('gpus')
+    if gpus:
+        stats['gpu'] = gpus[0]
+    return stats
+
+
+def _telemetry_loop():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    host_id = seezee_telemetry.host_hash(get_hostname())
+    interval = telemetry_state['interval']
+    stats_state['ready'].wait(5)
+    next_run = time.monotonic()
+    while True:
+        now = time.monotonic()
+        with stats_lock:
+            # The hub reads these from the datagram, so keep them sampled
+            for name in TELEMETRY_GROUPS:
+                stats_state['requested'][name] = now
+        packet = seezee_telemetry.pack(telemetry_state['seq'], telemetry_state['boot'], host_id,
+                                       interval * 1000, _telemetry_stats(stats_state['groups']))
         try:
-            temps_raw = psutil.sensors_temperatures()
-            if temps_raw:
-                for name, entries in temps_raw.items():
-                    if entries:
-                        temps[name] = entries[0].current
-        except:
-            pass
-        
-        stats = {
-            'hostname': get_hostname(),
-            'ip': get_local_ip(),
-            'timestamp': int(psutil.boot_time()),
-            'uptime': int(psutil.boot_time()),
-            'cpu': {
-                'usage': round(cpu_percent, 1),
-                'cores': cpu_count,
-                'freq': round(cpu_freq.current, 0) if cpu_freq else 0
-            },
-            'memory': {
-                'used': round(mem.used / (1024**3), 2),
-                'total': round(mem.total / (1024**3), 2),
-                'percent': round(mem.percent, 1)
-            },
-            'disk': {
-                'used': round(disk.used / (1024**3), 2),
-                'total': round(disk.total / (1024**3), 2),
-                'percent': round(disk.percent, 1)
-            },
-            'network': {
-                'sent': round(net.bytes_sent / (1024**3), 2),
-                'recv': round(net.bytes_recv / (1024**3), 2)
-            },
-            'temps': temps
+            sock.sendto(packet, telemetry_state['target'])
+            telemetry_state['sent'] += 1
+        except OSError as e:
+            if telemetry_state['errors'] == 0:
+                print(f"[Agent] Telemetry send failed: {e}")
+            telemetry_state['errors'] += 1
+        # Sequence advances even when a send fails so the hub sees the gap
+        telemetry_state['seq'] = (telemetry_state['seq'] + 1) & 0xFFFFFFFF
+
+        next_run += interval
+        delay = next_run - time.monotonic()
+        if delay < 0:
+            next_run = time.monotonic()
+            delay = 0
+        time.sleep(delay)
+
+
+def start_telemetry():
+    """Start pushing datagrams to the hub if SEEZEE_HUB_TELEMETRY is set"""
+    target = _telemetry_target()
+    if target is None or telemetry_state['thread'] is not None:
+        return target
+    try:
+        telemetry_state['interval'] = max(0.5, float(os.environ.get('SEEZEE_TELEMETRY_INTERVAL', 2.0)))
+    except ValueError:
+        pass
+    telemetry_state['target'] = target
+    start_sampler()
+    telemetry_state['thread'] = threading.Thread(target=_telemetry_loop, daemon=True)
+    telemetry_state['thread'].start()
+    return target
+
+
+def _field_value(field, groups):
+    """Response entries for one field, in the /stats layout"""
+    if field == 'system':
+        system = groups['system']['value']
+        now = time.time()
+        return {
+            'hostname': system['hostname'],
+            'ip': system['ip'],
+            'timestamp': int(now),
+            'uptime': int(now - system['bootTime']) if system['bootTime'] else None
         }
-        
-        # Try to get GPU stats (NVIDIA only for now)
-        try:
-            import pynvml
-            pynvml.nvmlInit()
-            device_count = pynvml.nvmlDeviceGetCount()
-            
-            gpus = []
-            for i in range(device_count):
-                handle = pynvml.nvmlDeviceGetHandleByIndex(i)
-                name = pynvml.nvmlDeviceGetName(handle)
-                util = pynvml.nvmlDeviceGetUtilizationRates(handle)
-                mem_info = pynvml.nvmlDeviceGetMemoryInfo(handle)
-                temp = pynvml.nvmlDeviceGetTemperature(handle, 0)
-                
-                gpus.append({
-                    'name': name,
-                    'usage': util.gpu,
-                    'memory': {
-                        'used': round(mem_info.used / (1024**3), 2),
-                        'total': round(mem_info.total / (1024**3), 2),
-                        'percent': round((mem_info.used / mem_info.total) * 100, 1)
-                    },
-                    'temp': temp
-                })
-            
-            stats['gpu'] = gpus[0] if len(gpus) == 1 else gpus
-            pynvml.nvmlShutdown()
-        except:
-            pass
-        
-        return jsonify(stats)
-    
+    if field == 'cpu':
+        return {'cpu': dict(groups['cpu']['value'], freq=groups['freq']['value']['freq'])}
+    if field == 'gpu':
+        gpu = groups['gpu']['value']
+        entries = {'gpus': gpu['gpus'], 'sensors': {'gpu': gpu['status']}}
+        if gpu['gpus']:
+            entries['gpu'] = gpu['gpus'][0]   # first GPU for single-GPU consumers
+        return entries
+    return {field: groups[field]['value']}
+
+
+def stats_payload(fields):
+    """Serialized /stats body for the given fields, with per-field sample ages"""
+    now = time.monotonic()
+    needed = [g for f in fields for g in FIELD_GROUPS.get(f, (f,))]
+    with stats_lock:
+        for name in needed:
+            stats_state['requested'][name] = now
+    missing = [g for g in needed if stats_state['groups'].get(g, {}).get('sampledAt') is None]
+    if missing:
+        # First request for a demand-sampled group: read it now rather than wait a cycle
+        sample_groups(missing)
+
+    groups = dict(stats_state['groups'])
+    # Groups that have never sampled successfully are served as nulls (age None,
+    # plus an error) rather than as placeholder zeros
+    for name in needed:
+        if groups.get(name, {}).get('sampledAt') is None:
+            groups[name] = {'value': {k: None for k in SAMPLERS[name][1]()} or None, 'sampledAt': None}
+    primary = {f: FIELD_GROUPS.get(f, (f,))[0] for f in fields}
+    key = tuple(fields)
+    with stats_lock:
+        version = stats_state['version']
+        cached = stats_state['cache'].get(key)
+    if cached and cached[0] == version and 'system' not in fields:
+        body = cached[1]
+    else:
+        response = {}
+        for field in fields:
+            response.update(_field_value(field, groups))
+        body = json.dumps(response).encode('utf-8')
+        with stats_lock:
+            stats_state['cache'][key] = (version, body)
+
+    wall = time.time()
+    ages = {}
+    errors = {}
+    for field in fields:
+        # A field's age is its primary group's (cpu usage, not the slower frequency)
+        sampled_at = groups[primary[field]]['sampledAt']
+        ages[field] = round(wall - sampled_at, 2) if sampled_at is not None else None
+        if sampled_at is None:
+            errors[field] = stats_state['errors'].get(primary[field], 'not sampled yet')
+    # Ages change every request; splice them (and any errors) into the cached body
+    extra = {'ages': ages, 'errors': errors} if errors else {'ages': ages}
+    return body[:-1] + (b', ' if len(body) > 2 else b'') + json.dumps(extra).encode('utf-8')[1:]
+
+
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    """Return system statistics from the sampler (?fields=cpu,memory for a subset)"""
+    start_sampler()
+    requested = request.args.get('fields')
+    if requested:
+        fields = [f.strip() for f in requested.split(',') if f.strip()]
+        fields = ['gpu' if f == 'gpus' else f for f in fields]
+        unknown = [f for f in fields if f not in STATS_FIELDS]
+        if unknown:
+            return jsonify({'error': f"Unknown fields: {', '.join(unknown)}", 'fields': list(STATS_FIELDS)}), 400
+        fields = [f for f in STATS_FIELDS if f in fields]
+    else:
+        fields = list(STATS_FIELDS)
+
+    if not stats_state['ready'].is_set():
+        stats_state['ready'].wait(timeout=2.0)
+    try:
+        return Response(stats_payload(fields), mimetype='application/json')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/stats/history', methods=['GET'])
+def get_stats_history():
+    """Metric history: ?metric=cpu,memory&since=<epoch s>&points=120 (min/max/avg per point)"""
+    start_sampler()
+    metrics = [m.strip() for m in (request.args.get('metric') or 'cpu').split(',') if m.strip()]
+    unknown = [m for m in metrics if m not in HISTORY_METRICS]
+    if unknown:
+        return jsonify({'error': f"Unknown metrics: {', '.join(unknown)}", 'metrics': list(HISTORY_METRICS)}), 400
+    try:
+        since = float(request.args.get('since', 0))
+        points = int(request.args.get('points', HISTORY_DEFAULT_POINTS))
+    except ValueError:
+        return jsonify({'error': 'since and points must be numbers'}), 400
+    since = max(since, time.time() - HISTORY_SECONDS)
+    points = max(1, min(points, HISTORY_SECONDS))
+
+    # Asking for GPU history keeps the GPU group sampled
+    with stats_lock:
+        for metric in metrics:
+            stats_state['requested'][HISTORY_METRICS[metric][1]] = time.monotonic()
+
+    return jsonify({
+        'since': since,
+        'resolutionSeconds': HISTORY_RESOLUTION_SECONDS,
+        'series': {
+            metric: dict(history_series(metric, since, points), unit=HISTORY_METRICS[metric][0])
+            for metric in metrics
+        }
+    })
+
 def get_local_ip():
     """Get local IP address"""
     try:
@@ -141,6 +549,10 @@ if __name__ == '__main__':
     print("⌨️  Press Ctrl+C to stop\n")
     print("=" * 60 + "\n")
     
+    start_sampler()
+    telemetry_target = start_telemetry()
+    if telemetry_target:
+        print(f"📨 Pushing telemetry to {telemetry_target[0]}:{telemetry_target[1]} every {telemetry_state['interval']:g}s\n")
     try:
         app.run(host='0.0.0.0', port=5050, debug=False)
     except KeyboardInterrupt:
@@ -0,0 +1,234 @@
+"""
+SEE STUDIO ZEE sensor backends shared by the hub and the agent
+
+NVML is initialized once per process and device handles are cached; a missing
+driver or library degrades to "no GPU" and init is retried with backoff.
+Set SEEZEE_FAKE_NVML=<gpu count> to run against FakeNvml on machines without
+an NVIDIA GPU.
+"""
+
+import os
+import threading
+import time
+
+NVML_RETRY_BACKOFF = (5.0, 300.0)  # seconds: first retry, max retry interval
+NVML_TEMPERATURE_GPU = 0
+
+
+class NvmlSensors:
+    """Persistent NVML session with cached per-GPU handles"""
+
+    def __init__(self, nvml=None):
+        self._nvml = nvml
+        self._lock = threading.Lock()
+        self._handles = None        # [(index, handle, name)] once initialized
+        self._failures = 0
+        self._retry_at = 0.0
+        self.error = None
+
+    def _module(self):
+        if self._nvml is None:
+            import pynvml
+            self._nvml = pynvml
+        return self._nvml
+
+    def _ensure(self):
+        """Initialize NVML if needed; False while unavailable or backing off"""
+        if self._handles is not None:
+            return True
+        if time.monotonic() < self._retry_at:
+            return False
+        try:
+            nvml = self._module()
+        except ImportError:
+            self.error = 'pynvml not installed'
+            self._retry_at = float('inf')   # nothing will change until a restart
+            return False
+
+        try:
+            nvml.nvmlInit()
+        except Exception as e:
+            self._fail(f"NVML init failed: {e}")
+            return False
+        try:
+            handles = []
+            for index in range(nvml.nvmlDeviceGetCount()):
+                handle = nvml.nvmlDeviceGetHandleByIndex(index)
+                name = nvml.nvmlDeviceGetName(handle)
+                handles.append((index, handle, name.decode() if isinstance(name, bytes) else name))
+        except Exception as e:
+            # Init succeeded: release that reference before retrying later
+            try:
+                nvml.nvmlShutdown()
+            except Exception:
+                pass
+            self._fail(f"NVML device enumeration failed: {e}")
+            return False
+
+        self._handles = handles
+        self._failures = 0
+        self.error = None
+        return True
+
+    def _fail(self, error):
+        self._failures += 1
+        base, cap = NVML_RETRY_BACKOFF
+        self._retry_at = time.monotonic() + min(cap, base * 2 ** (self._failures - 1))
+        self.error = error
+        self._handles = None
+
+    def _optional(self, read):
+        """Sensors some GPUs don't expose (temperature, power) read as None"""
+        try:
+            return read()
+        except Exception:
+            return None
+
+    def read(self):
+        """Per-GPU stats for every GPU; [] when NVML is unavailable"""
+        with self._lock:
+            if not self._ensure():
+                return []
+            nvml = self._nvml
+            gpus = []
+            try:
+                for index, handle, name in self._handles:
+                    util = nvml.nvmlDeviceGetUtilizationRates(handle)
+                    mem_info = nvml.nvmlDeviceGetMemoryInfo(handle)
+                    power = self._optional(lambda: nvml.nvmlDeviceGetPowerUsage(handle))
+                    gpus.append({
+                        'index': index,
+                        'name': name,
+                        'usage': util.gpu,
+                        'memory': {
+                            'used': round(mem_info.used / (1024**3), 2),
+                            'total': round(mem_info.total / (1024**3), 2),
+                            'percent': round((mem_info.used / mem_info.total) * 100, 1) if mem_info.total else 0.0
+                        },
+                        'temp': self._optional(lambda: nvml.nvmlDeviceGetTemperature(handle, NVML_TEMPERATURE_GPU)),
+                        'power': round(power / 1000.0, 1) if power is not None else None
+                    })
+            except Exception as e:
+                # Driver reload or GPU lost: drop the session and re-init after backoff
+                self._shutdown()
+                self._fail(f"NVML read failed: {e}")
+                return []
+            return gpus
+
+    def status(self):
+        with self._lock:
+            retry_in = self._retry_at - time.monotonic()
+            return {
+                'available': self._handles is not None,
+                'gpuCount': len(self._handles) if self._handles is not None else 0,
+                'error': self.error,
+                'retryInSeconds': round(retry_in, 1) if self._handles is None and 0 < retry_in < float('inf') else None
+            }
+
+    def _shutdown(self):
+        if self._handles is not None:
+            try:
+                self._nvml.nvmlShutdown()
+            except Exception:
+                pass
+        self._handles = None
+
+    def shutdown(self):
+        with self._lock:
+            self._shutdown()
+
+
+class FakeNvml:
+    """Stand-in for the pynvml module: deterministic GPUs, optional init failures"""
+
+    class NVMLError(Exception):
+        pass
+
+    class _Utilization:
+        def __init__(self, gpu):
+            self.gpu = gpu
+            self.memory = gpu // 2
+
+    class _Memory:
+        def __init__(self, used, total):
+            self.used = used
+            self.total = total
+            self.free = total - used
+
+    def __init__(self, gpus=1, fail_init=0):
+        self.gpus = gpus
+        self.fail_init = fail_init
+        self.init_calls = 0
+        self.initialized = False
+
+    def nvmlInit(self):
+        self.init_calls += 1
+        if self.init_calls <= self.fail_init:
+            raise self.NVMLError('Driver Not Loaded')
+        self.initialized = True
+
+    def nvmlShutdown(self):
+        self.initialized = False
+
+    def _check(self):
+        if not self.initialized:
+            raise self.NVMLError('Uninitialized')
+
+    def nvmlDeviceGetCount(self):
+        self._check()
+        return self.gpus
+
+    def nvmlDeviceGetHandleByIndex(self, index):
+        self._check()
+        if index >= self.gpus:
+            raise self.NVMLError('Invalid Argument')
+        return index
+
+    def nvmlDeviceGetName(self, handle):
+        return f"Fake GPU {handle}"
+
+    def nvmlDeviceGetUtilizationRates(self, handle):
+        self._check()
+        return self._Utilization(int(time.time() * 7 + handle * 13) % 100)
+
+    def nvmlDeviceGetMemoryInfo(self, handle):
+        self._check()
+        total = 8 * 1024**3
+        return self._Memory(total // (handle + 2), total)
+
+    def nvmlDeviceGetTemperature(self, handle, sensor):
+        self._check()
+        return 45 + handle * 5
+
+    def nvmlDeviceGetPowerUsage(self, handle):
+        self._check()
+        return 120000 + handle * 10000   # milliwatts
+
+
+_gpu_sensors = None
+_gpu_sensors_lock = threading.Lock()
+
+
+def gpu_sensors():
+    """Process-wide NVML session (FakeNvml when SEEZEE_FAKE_NVML is set)"""
+    global _gpu_sensors
+    with _gpu_sensors_lock:
+        if _gpu_sensors is None:
+            fake = os.environ.get('SEEZEE_FAKE_NVML')
+            _gpu_sensors = NvmlSensors(FakeNvml(gpus=int(fake)) if fake else None)
+        return _gpu_sensors
+
+
+def read_temperatures():
+    """First reading per sensor chip (empty where unsupported)"""
+    import psutil
+
+    temps = {}
+    try:
+        temps_raw = psutil.sensors_temperatures()
+    except (AttributeError, OSError):
+        return temps
+    for name, entries in (temps_raw or {}).items():
+        if entries:
+            temps[name] = entries[0].current
+    return temps
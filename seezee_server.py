@@ -4,7 +4,7 @@ import sys
 import io
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, send_file
 from flask_cors import CORS
 import os
 import json
@@ -14,7 +14,15 @@ import uuid
 import re
 import time
 import string
-from datetime import datetime
+import heapq
+import socket
+import random
+import threading
+import warnings
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from datetime import datetime, timedelta
 
 try:
     import winreg  # Windows only
@@ -22,8 +30,16 @@ try:
 except ImportError:
     WINDOWS = False
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from pathlib import Path
 
+import seezee_sensors
+import seezee_telemetry
+
 
 def _clamp_int(value, minimum, maximum, default):
     try:
@@ -65,15 +81,18 @@ config = {}
 # Lighting state cache (prevents API spam)
 lighting_state_cache = {
     'last_theme': None,
-    'last_rgb': None,  # Global RGB for theme tracking
-    'device_rgb': {},  # Per-device RGB cache: {device_mac: (r,g,b)}
+    'last_rgb': None,  # Global RGB for theme tracking (per-device state lives in govee_device_state)
     'last_govee_call': 0,  # timestamp
     'govee_rate_limit': 1.0  # min seconds between calls
 }
 
+# Every Govee cloud call waits out govee_rate_limit after the previous one under this lock
+govee_call_lock = threading.RLock()
+
 # Govee command queue (ensures one-at-a-time execution)
 govee_queue = []
 govee_queue_processing = False
+govee_queue_lock = threading.Lock()   # guards the queue and the processing flag
 
 
 def _get_spotify_config():
@@ -81,19 +100,37 @@ def _get_spotify_config():
     return spotify_config if isinstance(spotify_config, dict) else {}
 
 
-def _refresh_spotify_token():
-    """Refresh Spotify access token using refresh token"""
-    global config
-    spotify = _get_spotify_config()
-    
-    if not spotify.get('refresh_token'):
-        return None
-    
+# Token manager: one refresh in flight at a time, renewed ahead of expiry in
+# the background; the config file is written off the request path
+SPOTIFY_RENEW_BEFORE_SECONDS = 300
+SPOTIFY_EXPIRED_MARGIN_SECONDS = 30
+
+spotify_token_lock = threading.Lock()
+spotify_token_state = {
+    'inflight': None,       # threading.Event for the refresh in progress
+    'lastError': None,
+    'refreshedAt': None,
+    'refreshes': 0,
+    'renewWake': threading.Event()
+}
+
+
+def _spotify_stored_token(spotify=None):
+    spotify = spotify if spotify is not None else _get_spotify_config()
+    token = spotify.get('access_token')
+    # Try old key name for backwards compatibility
+    if not token:
+        token = spotify.get('accessToken')
+    return token.strip() if isinstance(token, str) and token.strip() else None
+
+
+def _spotify_token_exchange(spotify):
+    """POST the refresh token to Spotify; returns (tokens, error)"""
     try:
         import requests
     except ImportError:
-        return None
-    
+        return None, 'requests library not installed'
+
     try:
         # If we have client_id and client_secret, use them. Otherwise just use the refresh token.
         # Spotify allows refreshing with just the refresh token if the app is a public client
@@ -108,90 +145,166 @@ def _refresh_spotify_token():
             },
             timeout=5
         )
-        
-        if response.status_code == 200:
-            tokens = response.json()
-            new_token = tokens.get("access_token")
-            if new_token:
-                spotify["access_token"] = new_token
-                # Update expires_in timestamp if provided
-                if "expires_in" in tokens:
-                    import time
-                    spotify["access_token_expires_at"] = int(time.time()) + tokens.get("expires_in", 3600)
-                # Update refresh token if a new one was provided
-                if "refresh_token" in tokens:
-                    spotify["refresh_token"] = tokens.get("refresh_token")
-                
-                config['spotify'] = spotify
-                save_config()
-                print(f"[Spotify] Token refreshed successfully at {_now_iso()}")
-                return new_token
     except Exception as e:
-        print(f"[Spotify] Failed to refresh token: {e}")
-    
-    return None
+        return None, str(e)
+
+    if response.status_code != 200:
+        return None, f"HTTP {response.status_code}"
+    tokens = response.json()
+    if not tokens.get('access_token'):
+        return None, 'No access_token in response'
+    return tokens, None
+
+
+def _refresh_spotify_token(stale_token=None, wait=True):
+    """Single-flight refresh: concurrent callers share one token request
+
+    Pass the token that just failed as stale_token; if another caller has
+    already replaced it, the current token is returned without a new request.
+    """
+    global config
+    with spotify_token_lock:
+        current = _spotify_stored_token()
+        if stale_token is not None and current and current != stale_token:
+            return current
+        event = spotify_token_state['inflight']
+        leader = event is None
+        if leader:
+            event = threading.Event()
+            spotify_token_state['inflight'] = event
+
+    if not leader:
+        if wait:
+            event.wait(timeout=8)
+        return _spotify_stored_token()
+
+    try:
+        spotify = dict(_get_spotify_config())
+        if not spotify.get('refresh_token'):
+            return None
+
+        tokens, error = _spotify_token_exchange(spotify)
+        if error:
+            spotify_token_state['lastError'] = error
+            print(f"[Spotify] Failed to refresh token: {error}")
+            return None
+
+        with spotify_token_lock:
+            spotify = _get_spotify_config()
+            spotify['access_token'] = tokens['access_token']
+            spotify['access_token_expires_at'] = int(time.time()) + int(tokens.get('expires_in', 3600))
+            # Update refresh token if a new one was provided
+            if tokens.get('refresh_token'):
+                spotify['refresh_token'] = tokens['refresh_token']
+            config['spotify'] = spotify
+            spotify_token_state['lastError'] = None
+            spotify_token_state['refreshedAt'] = _now_iso()
+            spotify_token_state['refreshes'] += 1
+
+        save_config_soon()
+        spotify_token_state['renewWake'].set()
+        print(f"[Spotify] Token refreshed successfully at {_now_iso()}")
+        return tokens['access_token']
+    finally:
+        with spotify_token_lock:
+            spotify_token_state['inflight'] = None
+        event.set()
 
 
 def _spotify_access_token():
-    """Get Spotify access token, refreshing if necessary"""
+    """Get Spotify access token; blocks on a refresh only once it has actually expired"""
     spotify = _get_spotify_config()
-    token = spotify.get('access_token')
-    
-    # Try old key name for backwards compatibility
-    if not token:
-        token = spotify.get('accessToken')
-    
-    if not (isinstance(token, str) and token.strip()):
+    token = _spotify_stored_token(spotify)
+    if token is None:
         return None
-    
-    # Check if token needs refresh (check if expires_at is set and in the past)
-    import time
+
     expires_at = spotify.get('access_token_expires_at')
     if expires_at and isinstance(expires_at, (int, float)):
-        # Refresh if token expires in less than 5 minutes
-        if time.time() > (expires_at - 300):
-            new_token = _refresh_spotify_token()
-            if new_token:
-                return new_token
-    
+        remaining = expires_at - time.time()
+        if remaining < SPOTIFY_EXPIRED_MARGIN_SECONDS:
+            return _refresh_spotify_token(stale_token=token) or token
+        if remaining < SPOTIFY_RENEW_BEFORE_SECONDS and spotify_token_state['inflight'] is None:
+            # The renewal loop should have done this already; nudge it
+            spotify_token_state['renewWake'].set()
+
     return token
 
 
-def _spotify_request(method, path, params=None, body=None, retry=True):
+def _spotify_token_renew_loop():
+    """Renew the access token shortly before it expires"""
+    while True:
+        spotify = _get_spotify_config()
+        expires_at = spotify.get('access_token_expires_at')
+        delay = 600.0
+        if spotify.get('refresh_token') and isinstance(expires_at, (int, float)):
+            delay = expires_at - SPOTIFY_RENEW_BEFORE_SECONDS - time.time()
+            if delay <= 0:
+                if _refresh_spotify_token() is None:
+                    delay = 60.0   # retry a failed renewal in a minute
+                else:
+                    continue
+        spotify_token_state['renewWake'].wait(timeout=max(1.0, min(delay, 600.0)))
+        spotify_token_state['renewWake'].clear()
+
+
+def _spotify_request(method, path, params=None, body=None, retry=True, headers=None, meta=None):
+    """Call the Spotify Web API; returns (data, error)
+
+    error is a plain (dict, status) tuple: endpoints can return it as-is and
+    background threads can read it without an app context. Extra request headers (e.g. If-None-Match) go in headers. If meta is a dict
+    it receives the response 'status' and 'etag'; a 304 returns (None, None).
+    """
     token = _spotify_access_token()
     if not token:
-        return None, (jsonify({'error': 'Spotify not configured'}), 400)
+        return None, ({'error': 'Spotify not configured'}, 400)
 
     try:
         import requests
     except ImportError:
-        return None, (jsonify({'error': 'requests library not installed'}), 500)
+        return None, ({'error': 'requests library not installed'}, 500)
+
+    if not breaker_allow('spotify'):
+        status = breaker_status('spotify')
+        return None, ({
+            'error': 'Spotify degraded (circuit open)',
+            'circuit': status['state'],
+            'retryInSeconds': status['retryInSeconds']
+        }, 503)
 
     url = f"https://api.spotify.com{path}"
-    headers = {
+    request_headers = {
         'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json'
+        'Content-Type': 'application/json',
+        **(headers or {})
     }
 
     try:
         response = requests.request(
             method=method,
             url=url,
-            headers=headers,
+            headers=request_headers,
             params=params,
             json=body,
             timeout=8
         )
     except Exception as e:
-        return None, (jsonify({'error': str(e)}), 502)
+        breaker_failure('spotify', str(e))
+        return None, ({'error': str(e)}, 502)
+    record_upstream_response('spotify', response)
 
-    # Handle 401 Unauthorized - try to refresh token
+    # Handle 401 Unauthorized - try to refresh token (shared with concurrent callers)
     if response.status_code == 401 and retry:
-        new_token = _refresh_spotify_token()
+        new_token = _refresh_spotify_token(stale_token=token)
         if new_token:
             # Retry with new token
-            return _spotify_request(method, path, params, body, retry=False)
-    
+            return _spotify_request(method, path, params, body, retry=False, headers=headers, meta=meta)
+
+    if meta is not None:
+        meta['status'] = response.status_code
+        meta['etag'] = response.headers.get('ETag')
+    if response.status_code == 304:
+        return None, None
+
     # Many Spotify control endpoints return 204 No Content
     if response.status_code == 204:
         return {}, None
@@ -201,7 +314,7 @@ def _spotify_request(method, path, params=None, body=None, retry=True):
             error_json = response.json()
         except Exception:
             error_json = {'message': response.text}
-        return None, (jsonify({'error': 'Spotify API error', 'status': response.status_code, 'details': error_json}), response.status_code)
+        return None, ({'error': 'Spotify API error', 'status': response.status_code, 'details': error_json}, response.status_code)
 
     try:
         return response.json(), None
@@ -234,115 +347,313 @@ def _normalize_spotify_currently_playing(payload):
         'artists': artist_names,
         'album': album.get('name'),
         'albumArtUrl': album_art,
+        'albumArt': album_art_path(album_art),
         'progressMs': payload.get('progress_ms'),
         'durationMs': item.get('duration_ms'),
     }
 
 
-def _system_volume_get():
+# System volume service: one thread owns a long-lived mixer handle (pycaw
+# endpoint in its own COM apartment on Windows; ALSA mixer or amixer on Linux),
+# keeps the current level in memory and applies the latest requested level.
+VOLUME_POLL_SECONDS = 5.0           # re-read interval without change events
+VOLUME_EVENT_POLL_SECONDS = 30.0    # safety re-read when change events are available
+VOLUME_SET_COALESCE = 0.05          # let a slider burst settle before writing
+VOLUME_REOPEN_SECONDS = 10.0
+
+volume_lock = threading.Lock()
+volume_wake = threading.Event()
+volume_state = {
+    'supported': None,      # None until the backend has been opened
+    'volume': None,
+    'muted': None,
+    'backend': 'none',
+    'events': False,
+    'error': None,
+    'hint': None,
+    'updatedAt': None,
+    'pendingSet': None,
+    'changes': 0,
+    'thread': None,
+    'ready': threading.Event()
+}
+
+
+def _volume_backend_pycaw():
+    """Cached endpoint on the service thread, with change notifications when available"""
+    from comtypes import CoInitialize, CoUninitialize
+    from pycaw.pycaw import AudioUtilities
+
+    CoInitialize()
+    devices = AudioUtilities.GetSpeakers()
+    # Use the EndpointVolume property (works with newer pycaw versions)
+    endpoint = devices.EndpointVolume
+    backend = {
+        'name': 'pycaw',
+        'events': False,
+        'read': lambda: (int(round(float(endpoint.GetMasterVolumeLevelScalar()) * 100)), bool(endpoint.GetMute())),
+        'write': lambda level: endpoint.SetMasterVolumeLevelScalar(level / 100.0, None)
+    }
+
+    try:
+        from comtypes import COMObject
+        from pycaw.pycaw import IAudioEndpointVolumeCallback
+
+        class _VolumeCallback(COMObject):
+            _com_interfaces_ = [IAudioEndpointVolumeCallback]
+
+            def OnNotify(self, notify):
+                volume_wake.set()
+
+        backend['callback'] = _VolumeCallback()  # keep a reference while registered
+        endpoint.RegisterControlChangeNotify(backend['callback'])
+        backend['events'] = True
+    except Exception as e:
+        print(f"[Volume] Change notifications unavailable, polling instead: {e}")
+
+    def close():
+        if backend.get('callback') is not None:
+            endpoint.UnregisterControlChangeNotify(backend.pop('callback'))
+        CoUninitialize()
+
+    backend['close'] = close
+    return backend
+
+
+def _volume_backend_alsa(control):
+    """pyalsaaudio mixer handle; a watcher thread turns mixer events into wakeups"""
+    import alsaaudio
+    import select
+
+    mixer = alsaaudio.Mixer(control)
+    mixer_lock = threading.Lock()
+
+    def read():
+        with mixer_lock:
+            mixer.handleevents()
+            levels = mixer.getvolume()
+            try:
+                muted = any(mixer.getmute())
+            except alsaaudio.ALSAAudioError:
+                muted = False   # control has no mute switch
+        return int(round(sum(levels) / len(levels))), muted
+
+    def write(level):
+        with mixer_lock:
+            mixer.setvolume(level)
+
+    stop = threading.Event()
+
+    def watch():
+        poller = select.poll()
+        for fd, mask in mixer.polldescriptors():
+            poller.register(fd, mask)
+        while not stop.is_set():
+            if poller.poll(1000):
+                with mixer_lock:
+                    mixer.handleevents()
+                volume_wake.set()
+
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+
+    def close():
+        stop.set()
+        watcher.join(timeout=2)
+        with mixer_lock:
+            mixer.close()
+
+    return {'name': 'alsa', 'events': True, 'read': read, 'write': write, 'close': close}
+
+
+def _volume_backend_amixer(control):
+    """amixer -M for reads/writes, with a persistent `amixer events` monitor for changes"""
+    def read():
+        result = subprocess.run(['amixer', '-M', 'get', control], capture_output=True, text=True, timeout=3)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or 'amixer failed')
+        match = re.search(r"\[(\d+)%\](?:.*\[(on|off)\])?", result.stdout)
+        if not match:
+            raise RuntimeError('Could not parse amixer output')
+        return int(match.group(1)), match.group(2) == 'off'
+
+    def write(level):
+        result = subprocess.run(['amixer', '-M', '-q', 'set', control, f'{level}%'], capture_output=True, text=True, timeout=3)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or 'amixer failed')
+
+    backend = {'name': 'amixer', 'events': False, 'read': read, 'write': write}
+    read()  # fail now (FileNotFoundError, bad control) rather than on first request
+
+    try:
+        monitor = subprocess.Popen(['amixer', 'events'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                   text=True, bufsize=1)
+    except OSError as e:
+        print(f"[Volume] amixer events unavailable, polling instead: {e}")
+        return backend
+
+    def watch():
+        for line in monitor.stdout:
+            if line.startswith('event value'):
+                volume_wake.set()
+
+    def close():
+        monitor.terminate()
+        try:
+            monitor.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            monitor.kill()
+            monitor.wait()
+
+    threading.Thread(target=watch, daemon=True).start()   # ends at EOF once the monitor exits
+    backend['monitor'] = monitor
+    backend['events'] = True
+    backend['close'] = close
+    return backend
+
+
+def _volume_open_backend():
+    """Open the platform mixer, recording why in volume_state if none is usable"""
+    control = config.get('audio', {}).get('mixerControl', 'Master') if isinstance(config, dict) else 'Master'
     if WINDOWS:
         try:
-            from comtypes import CoInitialize
-            from pycaw.pycaw import AudioUtilities
-
-            CoInitialize()
-            devices = AudioUtilities.GetSpeakers()
-            # Use the EndpointVolume property (works with newer pycaw versions)
-            volume = devices.EndpointVolume
-
-            scalar = float(volume.GetMasterVolumeLevelScalar())
-            muted = bool(volume.GetMute())
-            return {
-                'supported': True,
-                'volume': int(round(scalar * 100)),
-                'muted': muted,
-                'backend': 'pycaw'
-            }
+            return _volume_backend_pycaw()
         except ImportError:
-            return {
-                'supported': False,
-                'error': 'System volume control requires pycaw on Windows',
-                'hint': 'pip install pycaw comtypes',
-                'backend': 'none'
-            }
+            error, hint = 'System volume control requires pycaw on Windows', 'pip install pycaw comtypes'
         except Exception as e:
-            return {
-                'supported': False,
-                'error': str(e),
-                'hint': 'pycaw may need reinstall: pip install --upgrade pycaw',
-                'backend': 'none'
-            }
+            error, hint = str(e), 'pycaw may need reinstall: pip install --upgrade pycaw'
+    else:
+        # Linux / Raspberry Pi: ALSA bindings if installed, else amixer
+        try:
+            return _volume_backend_alsa(control)
+        except ImportError:
+            pass
+        except Exception as e:
+            print(f"[Volume] ALSA mixer unavailable, trying amixer: {e}")
+        try:
+            return _volume_backend_amixer(control)
+        except FileNotFoundError:
+            error, hint = 'amixer not available', 'sudo apt install alsa-utils (or pip install pyalsaaudio)'
+        except Exception as e:
+            error, hint = str(e), None
 
-    # Linux / Raspberry Pi: try amixer
-    try:
-        result = subprocess.run(['amixer', 'get', 'Master'], capture_output=True, text=True, timeout=3)
-        if result.returncode != 0:
-            return {
-                'supported': False,
-                'error': result.stderr.strip() or 'amixer failed',
-                'backend': 'none'
-            }
+    with volume_lock:
+        volume_state.update({'supported': False, 'backend': 'none', 'events': False, 'error': error, 'hint': hint})
+    return None
 
-        match = re.search(r"\[(\d+)%\].*\[(on|off)\]", result.stdout)
-        if not match:
-            return {
-                'supported': False,
-                'error': 'Could not parse amixer output',
-                'backend': 'none'
-            }
 
-        volume = int(match.group(1))
-        muted = match.group(2) == 'off'
-        return {
+def _volume_refresh(backend):
+    level, muted = backend['read']()
+    with volume_lock:
+        if volume_state['pendingSet'] is not None:
+            return   # a newer set is about to be written; keep the optimistic level
+        if (level, muted) != (volume_state['volume'], volume_state['muted']):
+            volume_state['changes'] += 1
+        volume_state.update({
             'supported': True,
-            'volume': volume,
+            'volume': level,
             'muted': muted,
-            'backend': 'amixer'
-        }
-    except FileNotFoundError:
-        return {
-            'supported': False,
-            'error': 'amixer not available',
-            'backend': 'none'
-        }
+            'backend': backend['name'],
+            'events': backend['events'],
+            'error': None,
+            'hint': None,
+            'updatedAt': _now_iso()
+        })
+
+
+def _volume_close_backend(backend):
+    """Release a failed backend's watcher, monitor process or COM callback before reopening"""
+    close = backend.get('close')
+    if close is None:
+        return
+    try:
+        close()
     except Exception as e:
+        print(f"[Volume] Closing {backend['name']} backend failed: {e}")
+
+
+def _volume_service_loop():
+    backend = None
+    while True:
+        if backend is None:
+            backend = _volume_open_backend()
+            if backend is None:
+                volume_state['ready'].set()
+                volume_wake.wait(timeout=VOLUME_REOPEN_SECONDS * 6)
+                volume_wake.clear()
+                continue
+            print(f"[Volume] Using {backend['name']} backend (change events: {backend['events']})")
+
+        try:
+            with volume_lock:
+                target = volume_state['pendingSet']
+            if target is not None:
+                backend['write'](target)
+                with volume_lock:
+                    if volume_state['pendingSet'] == target:
+                        volume_state['pendingSet'] = None
+            _volume_refresh(backend)
+        except Exception as e:
+            print(f"[Volume] {backend['name']} backend failed, reopening: {e}")
+            with volume_lock:
+                volume_state.update({'pendingSet': None, 'error': str(e)})
+            _volume_close_backend(backend)
+            backend = None
+            time.sleep(VOLUME_REOPEN_SECONDS)
+            continue
+        volume_state['ready'].set()
+
+        interval = VOLUME_EVENT_POLL_SECONDS if backend['events'] else VOLUME_POLL_SECONDS
+        if volume_wake.wait(timeout=interval):
+            volume_wake.clear()
+            time.sleep(VOLUME_SET_COALESCE)
+
+
+def _volume_service_ensure(wait=2.0):
+    with volume_lock:
+        thread = volume_state['thread']
+        if thread is None or not thread.is_alive():
+            volume_state['thread'] = threading.Thread(target=_volume_service_loop, daemon=True)
+            volume_state['thread'].start()
+    if not volume_state['ready'].is_set():
+        volume_state['ready'].wait(timeout=wait)
+
+
+def _system_volume_get():
+    """Current system volume from memory (the service thread keeps it fresh)"""
+    _volume_service_ensure()
+    with volume_lock:
+        if volume_state['supported'] is None:
+            return {'supported': False, 'error': 'Volume backend still starting', 'backend': 'none'}
+        if not volume_state['supported']:
+            result = {'supported': False, 'error': volume_state['error'], 'backend': 'none'}
+            if volume_state['hint']:
+                result['hint'] = volume_state['hint']
+            return result
         return {
-            'supported': False,
-            'error': str(e),
-            'backend': 'none'
+            'supported': True,
+            'volume': volume_state['volume'],
+            'muted': volume_state['muted'],
+            'backend': volume_state['backend'],
+            'events': volume_state['events'],
+            'updatedAt': volume_state['updatedAt']
         }
 
 
 def _system_volume_set(volume_percent):
+    """Record the requested level (latest wins) and let the service thread write it"""
     volume_percent = _clamp_int(volume_percent, 0, 100, 50)
-
-    if WINDOWS:
-        try:
-            from comtypes import CoInitialize
-            from pycaw.pycaw import AudioUtilities
-
-            CoInitialize()
-            devices = AudioUtilities.GetSpeakers()
-            # Use the EndpointVolume property (works with newer pycaw versions)
-            endpoint = devices.EndpointVolume
-            
-            endpoint.SetMasterVolumeLevelScalar(volume_percent / 100.0, None)
-            return {'success': True, 'volume': volume_percent}
-        except ImportError:
-            return {'success': False, 'error': 'System volume control requires pycaw on Windows', 'hint': 'pip install pycaw comtypes'}
-        except Exception as e:
-            return {'success': False, 'error': str(e), 'hint': 'pycaw may need reinstall: pip install --upgrade pycaw'}
-
-    # Linux / Raspberry Pi
-    try:
-        result = subprocess.run(['amixer', 'set', 'Master', f'{volume_percent}%'], capture_output=True, text=True, timeout=3)
-        if result.returncode != 0:
-            return {'success': False, 'error': result.stderr.strip() or 'amixer failed'}
-        return {'success': True, 'volume': volume_percent}
-    except FileNotFoundError:
-        return {'success': False, 'error': 'amixer not available'}
-    except Exception as e:
-        return {'success': False, 'error': str(e)}
+    _volume_service_ensure()
+    with volume_lock:
+        if not volume_state['supported']:
+            result = {'success': False, 'error': volume_state['error'] or 'Volume backend unavailable'}
+            if volume_state['hint']:
+                result['hint'] = volume_state['hint']
+            return result
+        volume_state['pendingSet'] = volume_percent
+        volume_state['volume'] = volume_percent
+    volume_wake.set()
+    return {'success': True, 'volume': volume_percent, 'pending': True}
 
 def load_config():
     """Load configuration from JSON file"""
@@ -372,6 +683,11 @@ def save_config():
         print(f"✗ Error saving config: {e}")
         return False
 
+
+def save_config_soon(delay=1.0):
+    """Coalesce config writes from hot paths into one background save"""
+    return submit_debounced('config:save', save_config, delay=delay, max_wait=delay * 5, lane='config')
+
 def find_steam_libraries():
     """Auto-detect Steam library folders"""
     libraries = []
@@ -701,15 +1017,575 @@ def scan_folder_for_games(folder_config):
     print(f"Found {len(games)} executables in {folder_path}")
     return games
 
+# ============================================================
+# DEBOUNCED DISPATCH (latest-wins per key, one worker per lane)
+# ============================================================
+
+DISPATCH_MAX_JOBS = 500
+
+dispatch_lock = threading.Lock()
+dispatch_wake = threading.Condition(dispatch_lock)
+
+# Pending work per key: {key: {'lane', 'fn', 'args', 'due', 'firstAt', 'jobId'}}
+# Lanes keep slow upstreams (Govee cloud, Spotify) from blocking each other.
+dispatch_pending = {}
+dispatch_lanes = {}    # lane -> worker thread
+dispatch_jobs = {}     # job_id -> job (insertion ordered, trimmed to DISPATCH_MAX_JOBS)
+
+
+def submit_debounced(key, fn, args=(), delay=0.15, max_wait=0.5, lane='default'):
+    """Schedule fn(*args) for key; a newer submit within the window replaces it
+
+    Trailing-edge debounce: the call runs `delay` seconds after the latest
+    submit, but never later than `max_wait` after the first pending one, so a
+    continuous slider drag still lands periodically. Returns the new job.
+    """
+    now = time.monotonic()
+    job = {
+        'id': uuid.uuid4().hex[:12],
+        'key': key,
+        'status': 'queued',
+        'createdAt': _now_iso(),
+        'latencyMs': None,
+        'result': None,
+        '_created': now
+    }
+
+    with dispatch_lock:
+        previous = dispatch_pending.get(key)
+        first_at = previous['firstAt'] if previous else now
+        if previous:
+            old_job = dispatch_jobs.get(previous['jobId'])
+            if old_job:
+                old_job['status'] = 'superseded'
+                old_job['supersededBy'] = job['id']
+
+        dispatch_pending[key] = {
+            'lane': lane,
+            'fn': fn,
+            'args': args,
+            'due': min(now + delay, first_at + max_wait),
+            'firstAt': first_at,
+            'jobId': job['id']
+        }
+        dispatch_jobs[job['id']] = job
+        while len(dispatch_jobs) > DISPATCH_MAX_JOBS:
+            del dispatch_jobs[next(iter(dispatch_jobs))]
+
+        worker = dispatch_lanes.get(lane)
+        if worker is None or not worker.is_alive():
+            worker = threading.Thread(target=_dispatch_worker, args=(lane,), daemon=True)
+            dispatch_lanes[lane] = worker
+            worker.start()
+        dispatch_wake.notify_all()
+
+    return job
+
+
+def _dispatch_worker(lane):
+    while True:
+        with dispatch_lock:
+            while True:
+                lane_items = [(p['due'], k) for k, p in dispatch_pending.items() if p['lane'] == lane]
+                if not lane_items:
+                    dispatch_wake.wait()
+                    continue
+                due, key = min(lane_items)
+                delay = due - time.monotonic()
+                if delay <= 0:
+                    break
+                dispatch_wake.wait(timeout=delay)
+            pending = dispatch_pending.pop(key)
+            job = dispatch_jobs.get(pending['jobId'])
+            if job:
+                job['status'] = 'running'
+
+        try:
+            result = pending['fn'](*pending['args'])
+            status = 'done' if not isinstance(result, dict) or result.get('success', True) else 'failed'
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+            status = 'failed'
+
+        if job:
+            job['result'] = result
+            job['status'] = status
+            job['_completed'] = time.monotonic()
+            job['completedAt'] = _now_iso()
+            job['latencyMs'] = int((job['_completed'] - job['_created']) * 1000)
+
+
+def get_dispatch_job(job_id):
+    """Public view of a job (None if unknown or trimmed)"""
+    job = dispatch_jobs.get(job_id)
+    if job is None:
+        return None
+    view = {k: v for k, v in job.items() if not k.startswith('_')}
+    if view['status'] == 'superseded':
+        # A superseded update completes when the update that replaced it does
+        carrier = dispatch_jobs.get(view.get('supersededBy'))
+        while carrier and carrier['status'] == 'superseded':
+            carrier = dispatch_jobs.get(carrier.get('supersededBy'))
+        if carrier and '_completed' in carrier:
+            view['latencyMs'] = int((carrier['_completed'] - job['_created']) * 1000)
+            view['result'] = carrier['result']
+    return view
+
+
+# ============================================================
+# CONCURRENT FAN-OUT (composite endpoints gather sources under a deadline)
+# ============================================================
+
+FANOUT_MAX_WORKERS = 16
+
+fanout_pool = ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS, thread_name_prefix='fanout')
+fanout_lock = threading.Lock()
+fanout_last_good = {}   # source name -> (value, time.time()) of the last successful read
+fanout_inflight = {}    # source name -> (future, timing) still running (shared instead of resubmitted)
+
+
+def gather_with_deadline(sources, deadline):
+    """Run {name: fn} concurrently; return {name: report} once all finish or the deadline passes
+
+    Each report has 'status' (ok / stale / error / timeout), 'value', 'stale',
+    'error' and 'latencyMs'. A source that misses the deadline or fails falls
+    back to its last good value (status 'stale') when one exists; its work keeps
+    running in the pool and refreshes the last good value when it completes.
+    While a source's call is still running, later gathers wait on that call
+    instead of starting another, so a hung upstream holds one worker at most.
+    """
+    futures = {}
+
+    # timing lives with the call, so a gather sharing another's future reports that call's own latency
+    def run(name, fn, timing):
+        timing['started'] = time.monotonic()
+        try:
+            value = fn()
+        finally:
+            timing['finished'] = time.monotonic()
+        with fanout_lock:
+            fanout_last_good[name] = (value, time.time())
+        return value
+
+    for name, fn in sources.items():
+        with fanout_lock:
+            inflight = fanout_inflight.get(name)
+            if inflight is None or inflight[0].done():
+                timing = {}
+                inflight = (fanout_pool.submit(run, name, fn, timing), timing)
+                fanout_inflight[name] = inflight
+        futures[name] = inflight
+    wait_futures([future for future, _ in futures.values()], timeout=deadline)
+
+    reports = {}
+    for name, (future, timing) in futures.items():
+        report = {'status': 'ok', 'value': None, 'stale': False, 'error': None, 'latencyMs': None}
+        if future.done():
+            if 'finished' in timing:
+                report['latencyMs'] = int((timing['finished'] - timing['started']) * 1000)
+            error = future.exception()
+            if error is None:
+                report['value'] = future.result()
+                reports[name] = report
+                continue
+            report['status'] = 'error'
+            report['error'] = str(error)
+        else:
+            report['status'] = 'timeout'
+            report['error'] = f"No response within {int(deadline * 1000)} ms"
+            report['latencyMs'] = int(deadline * 1000)
+
+        with fanout_lock:
+            last = fanout_last_good.get(name)
+        if last is not None:
+            report['status'] = 'stale'
+            report['stale'] = True
+            report['value'] = last[0]
+            report['ageSeconds'] = round(time.time() - last[1], 1)
+        reports[name] = report
+    return reports
+
+
+# ============================================================
+# CIRCUIT BREAKERS (per upstream: Govee cloud, Spotify)
+# ============================================================
+
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_BASE_BACKOFF = 5.0     # seconds open after the first trip
+BREAKER_MAX_BACKOFF = 300.0
+BREAKER_PROBE_TIMEOUT = 30.0   # a probe that never reported back frees the slot after this
+
+circuit_lock = threading.Lock()
+circuit_breakers = {}          # name -> breaker
+circuit_close_listeners = {}   # name -> [fn] called (outside the lock) when a breaker closes again
+
+
+def _breaker(name):
+    breaker = circuit_breakers.get(name)
+    if breaker is None:
+        breaker = {
+            'state': 'closed',
+            'failures': 0,      # consecutive failures while closed
+            'trips': 0,         # consecutive opens; drives the exponential backoff
+            'openUntil': 0.0,
+            'probing': False,
+            'probeStartedAt': 0.0,
+            'lastError': None,
+            'changedAt': time.time()
+        }
+        circuit_breakers[name] = breaker
+    return breaker
+
+
+def breaker_allow(name):
+    """True if a call to this upstream may proceed
+
+    While open, calls fail fast. Once the backoff expires the breaker goes
+    half-open and lets exactly one probe through (another after
+    BREAKER_PROBE_TIMEOUT if the first never reported success or failure).
+    """
+    with circuit_lock:
+        breaker = _breaker(name)
+        if breaker['state'] == 'closed':
+            return True
+        now = time.time()
+        if breaker['state'] == 'open' and now >= breaker['openUntil']:
+            breaker['state'] = 'half_open'
+            breaker['changedAt'] = now
+        if breaker['state'] == 'half_open' and (
+                not breaker['probing'] or now - breaker['probeStartedAt'] > BREAKER_PROBE_TIMEOUT):
+            breaker['probing'] = True
+            breaker['probeStartedAt'] = now
+            return True
+        return False
+
+
+def breaker_success(name):
+    with circuit_lock:
+        breaker = _breaker(name)
+        reopened = breaker['state'] != 'closed'
+        breaker.update({'state': 'closed', 'failures': 0, 'trips': 0, 'probing': False, 'lastError': None})
+        if reopened:
+            breaker['changedAt'] = time.time()
+        listeners = list(circuit_close_listeners.get(name, [])) if reopened else []
+
+    if reopened:
+        print(f"✓ Circuit '{name}' closed - upstream recovered")
+    for listener in listeners:
+        try:
+            listener()
+        except Exception as e:
+            print(f"✗ Circuit '{name}' close listener failed: {e}")
+
+
+def breaker_failure(name, error=None, retry_after=None):
+    """Record an upstream failure; trips the breaker after repeated failures or a failed probe"""
+    with circuit_lock:
+        breaker = _breaker(name)
+        breaker['failures'] += 1
+        breaker['lastError'] = error
+        if breaker['state'] == 'closed' and breaker['failures'] < BREAKER_FAILURE_THRESHOLD and not retry_after:
+            return
+
+        breaker['trips'] += 1
+        backoff = min(BREAKER_MAX_BACKOFF, BREAKER_BASE_BACKOFF * (2 ** (breaker['trips'] - 1)))
+        # Equal jitter: half fixed, half random, so clients don't re-probe in lockstep
+        backoff = backoff / 2 + random.uniform(0, backoff / 2)
+        if retry_after:
+            backoff = max(backoff, float(retry_after))
+        breaker.update({
+            'state': 'open',
+            'openUntil': time.time() + backoff,
+            'probing': False,
+            'changedAt': time.time()
+        })
+    print(f"⚠️  Circuit '{name}' open for {backoff:.1f}s: {error}")
+
+
+def breaker_on_close(name, listener):
+    with circuit_lock:
+        circuit_close_listeners.setdefault(name, []).append(listener)
+
+
+def breaker_status(name):
+    with circuit_lock:
+        breaker = dict(_breaker(name))
+    retry_in = max(0.0, breaker['openUntil'] - time.time()) if breaker['state'] == 'open' else 0.0
+    return {
+        'state': breaker['state'],
+        'degraded': breaker['state'] != 'closed',
+        'failures': breaker['failures'],
+        'retryInSeconds': round(retry_in, 1),
+        'lastError': breaker['lastError'],
+        'since': datetime.utcfromtimestamp(breaker['changedAt']).isoformat() + "Z"
+    }
+
+
+def _retry_after_seconds(response):
+    """Seconds to wait from Retry-After (or Govee's reset header), if present"""
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        if headers.get('Retry-After'):
+            return float(headers['Retry-After'])
+        if headers.get('API-RateLimit-Reset'):
+            return max(0.0, float(headers['API-RateLimit-Reset']) - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def record_upstream_response(name, response):
+    """429 and 5xx count against the breaker; anything else proves the upstream is up"""
+    if response.status_code == 429 or response.status_code >= 500:
+        breaker_failure(name, f'HTTP {response.status_code}', _retry_after_seconds(response))
+    else:
+        breaker_success(name)
+
+
 # ============================================================
 # RGB LIGHTING CONTROL
 # ============================================================
 
-def set_govee_color(device, r, g, b, brightness=None):
-    """Control Govee device via cloud API with rate limiting
-    
-    Best practice: Send brightness first, then color for reliable results
+GOVEE_API_BASE = 'https://developer-api.govee.com/v1'
+
+# Desired vs last-known state per Govee device: {device_mac: {'power', 'brightness', 'color', 'colorTem'}}
+# 'reported' entries also carry 'online' and 'refreshedAt' (time.time()).
+govee_device_state = {
+    'desired': {},
+    'reported': {}
+}
+govee_state_lock = threading.Lock()
+
+GOVEE_STATE_TTL_SECONDS = 60
+GOVEE_STATE_QUOTA_PER_HOUR = 240
+GOVEE_STATE_FOREGROUND_SHARE = 0.25   # of the hourly quota held back from the refresh-ahead loop
+
+govee_state_reads = deque()   # time.time() of each cloud state read in the last hour
+govee_state_inflight = {}     # device_mac -> threading.Event for the read in progress
+govee_reconcile_locks = {}    # device_mac -> threading.Lock serializing reconciles
+
+
+def _govee_headers(api_key):
+    return {
+        'Govee-API-Key': api_key,
+        'Content-Type': 'application/json'
+    }
+
+
+def _govee_control(device, cmd_name, value, api_key):
+    """Send one control command to a Govee device"""
+    import requests
+
+    try:
+        response = requests.put(
+            f'{GOVEE_API_BASE}/devices/control',
+            headers=_govee_headers(api_key),
+            json={
+                'device': device.get('device'),
+                'model': device.get('model'),
+                'cmd': {'name': cmd_name, 'value': value}
+            },
+            timeout=5
+        )
+    except requests.exceptions.RequestException as e:
+        breaker_failure('govee', type(e).__name__)
+        raise
+    record_upstream_response('govee', response)
+    return response
+
+
+def _parse_govee_state(payload):
+    """Flatten Govee /v1/devices/state properties into our state shape"""
+    state = {}
+    properties = (payload or {}).get('data', {}).get('properties', [])
+    for prop in properties if isinstance(properties, list) else []:
+        if not isinstance(prop, dict):
+            continue
+        if 'online' in prop:
+            state['online'] = prop['online'] in (True, 'true')
+        if 'powerState' in prop:
+            state['power'] = prop['powerState']
+        if 'brightness' in prop:
+            state['brightness'] = _clamp_int(prop['brightness'], 0, 100, None)
+        if isinstance(prop.get('color'), dict):
+            c = prop['color']
+            state['color'] = (int(c.get('r', 0)), int(c.get('g', 0)), int(c.get('b', 0)))
+            state['colorTem'] = None
+        for tem_key in ('colorTem', 'colorTemInKelvin'):
+            if prop.get(tem_key):
+                state['colorTem'] = int(prop[tem_key])
+                state['color'] = None
+    return state
+
+
+def fetch_govee_state(device, api_key):
+    """Read a device's real state from the cloud; returns (state, error)"""
+    import requests
+
+    try:
+        response = requests.get(
+            f'{GOVEE_API_BASE}/devices/state',
+            headers=_govee_headers(api_key),
+            params={'device': device.get('device'), 'model': device.get('model')},
+            timeout=5
+        )
+    except requests.exceptions.RequestException as e:
+        breaker_failure('govee', type(e).__name__)
+        raise
+    record_upstream_response('govee', response)
+    if response.status_code != 200:
+        return None, parse_govee_error(response)
+
+    state = _parse_govee_state(response.json())
+    state['refreshedAt'] = time.time()
+    with govee_state_lock:
+        govee_device_state['reported'][device.get('device')] = state
+    return state, None
+
+
+def _govee_state_ttl(device):
+    default_ttl = config.get('govee', {}).get('stateTtlSeconds', GOVEE_STATE_TTL_SECONDS)
+    return _clamp_int(device.get('stateTtl', default_ttl), 1, 86400, GOVEE_STATE_TTL_SECONDS)
+
+
+def _govee_state_quota_left():
+    """Remaining cloud state reads in the rolling hour budget"""
+    quota = _clamp_int(config.get('govee', {}).get('stateQuotaPerHour', GOVEE_STATE_QUOTA_PER_HOUR),
+                       1, 10000, GOVEE_STATE_QUOTA_PER_HOUR)
+    cutoff = time.time() - 3600
+    with govee_state_lock:
+        while govee_state_reads and govee_state_reads[0] < cutoff:
+            govee_state_reads.popleft()
+        return quota - len(govee_state_reads)
+
+
+def refresh_govee_state(device, wait=True):
+    """Single-flight cloud read: concurrent callers share one request per device"""
+    device_mac = device.get('device')
+    with govee_state_lock:
+        event = govee_state_inflight.get(device_mac)
+        leader = event is None
+        if leader:
+            event = threading.Event()
+            govee_state_inflight[device_mac] = event
+
+    if not leader:
+        if wait:
+            event.wait(timeout=6)
+        with govee_state_lock:
+            state = govee_device_state['reported'].get(device_mac)
+        return state, None if state else 'State refresh failed'
+
+    try:
+        api_key = config.get('govee', {}).get('apiKey', '')
+        if not api_key:
+            return None, 'Govee API key not configured'
+        if _govee_state_quota_left() <= 0:
+            return None, 'Govee state quota exhausted for this hour'
+        if not breaker_allow('govee'):
+            return None, 'Govee cloud degraded (circuit open)'
+        with govee_state_lock:
+            govee_state_reads.append(time.time())
+        return fetch_govee_state(device, api_key)
+    except Exception as e:
+        return None, str(e)
+    finally:
+        with govee_state_lock:
+            govee_state_inflight.pop(device_mac, None)
+        event.set()
+
+
+def get_govee_state_cached(device):
+    """Serve device state from memory; stale entries are revalidated in the background
+
+    Returns (state, meta) where meta has ageSeconds, stale and source.
     """
+    device_mac = device.get('device')
+    with govee_state_lock:
+        state = govee_device_state['reported'].get(device_mac)
+        state = dict(state) if state else None
+
+    refreshed_at = state.get('refreshedAt') if state else None
+    if refreshed_at:
+        age = time.time() - refreshed_at
+        stale = age > _govee_state_ttl(device)
+        if stale and device_mac not in govee_state_inflight:
+            submit_debounced(f"govee-state:{device_mac}", refresh_govee_state, args=(device,),
+                             delay=0, lane='govee-state')
+        return state, {'ageSeconds': round(age, 1), 'stale': stale, 'source': 'cache'}
+
+    # Nothing cached yet: fetch once (concurrent first readers share the request)
+    state, error = refresh_govee_state(device)
+    if state is None:
+        return None, {'error': error, 'source': 'cloud'}
+    return state, {'ageSeconds': 0.0, 'stale': False, 'source': 'cloud'}
+
+
+def set_govee_desired(device, power=None, brightness=None, color=None, color_tem=None):
+    """Merge new desired values for a device (color and colorTem are exclusive)"""
+    with govee_state_lock:
+        desired = govee_device_state['desired'].setdefault(device.get('device'), {})
+        if power is not None:
+            desired['power'] = power
+        if brightness is not None:
+            desired['brightness'] = _clamp_int(brightness, 0, 100, 100)
+        if color is not None:
+            desired['color'] = tuple(int(c) for c in color)
+            desired.pop('colorTem', None)
+        if color_tem is not None:
+            desired['colorTem'] = int(color_tem)
+            desired.pop('color', None)
+        return dict(desired)
+
+
+def govee_minimal_commands(desired, known):
+    """Commands needed to move a device from known to desired state, no-ops dropped
+
+    Brightness goes before color (Govee applies them more reliably that way).
+    Unknown known-values are treated as different so they get sent.
+    """
+    if desired.get('power') == 'off':
+        return [] if known.get('power') == 'off' else [('turn', 'off')]
+
+    commands = []
+    if known.get('power') == 'off' and desired.get('power', 'on') == 'on':
+        commands.append(('turn', 'on'))
+    if desired.get('brightness') is not None and known.get('brightness') != desired['brightness']:
+        commands.append(('brightness', desired['brightness']))
+    if desired.get('color') is not None and tuple(known.get('color') or ()) != desired['color']:
+        r, g, b = desired['color']
+        commands.append(('color', {'r': r, 'g': g, 'b': b}))
+    elif desired.get('colorTem') is not None and known.get('colorTem') != desired['colorTem']:
+        commands.append(('colorTem', desired['colorTem']))
+    return commands
+
+
+def _govee_apply_command_to_known(known, cmd_name, value):
+    if cmd_name == 'turn':
+        known['power'] = value
+    elif cmd_name == 'brightness':
+        known['brightness'] = value
+        known['power'] = 'on'
+    elif cmd_name == 'color':
+        known['color'] = (value['r'], value['g'], value['b'])
+        known['colorTem'] = None
+        known['power'] = 'on'
+    elif cmd_name == 'colorTem':
+        known['colorTem'] = value
+        known['color'] = None
+        known['power'] = 'on'
+
+
+def reconcile_govee_device(device):
+    """Send only the commands that close the gap between desired and last-known state"""
+    # One reconcile per device at a time, so a concurrent one sees the updated known state
+    with govee_state_lock:
+        device_lock = govee_reconcile_locks.setdefault(device.get('device'), threading.Lock())
+    with device_lock:
+        return _reconcile_govee_device(device)
+
+
+def _reconcile_govee_device(device):
     govee_config = config.get('govee', {})
     
     if not govee_config.get('enabled'):
@@ -719,92 +1595,70 @@ def set_govee_color(device, r, g, b, brightness=None):
     if not api_key:
         return {'success': False, 'error': 'Govee API key not configured'}
     
+    if not _govee_pending_commands(device):
+        print(f"✓ Govee: {device.get('name', 'Unknown')} already in desired state, skipping")
+        return {'success': True, 'cached': True, 'noop': True, 'device': device.get('name', 'Unknown'), 'commands': []}
+    # Global spacing between Govee calls: wait our turn rather than drop the latest desired state
+    with govee_call_lock:
+        _govee_wait_spacing()
+        return _reconcile_govee_device_now(device, api_key)
+
+
+def _govee_pending_commands(device):
+    device_mac = device.get('device')
+    with govee_state_lock:
+        desired = dict(govee_device_state['desired'].get(device_mac, {}))
+        known = dict(govee_device_state['reported'].get(device_mac, {}))
+    return govee_minimal_commands(desired, known)
+
+
+def _reconcile_govee_device_now(device, api_key):
+    """Send the minimal commands for one device (caller holds govee_call_lock)"""
     device_mac = device.get('device')
-    device_model = device.get('model')
     device_name = device.get('name', 'Unknown')
+    # Re-read after waiting: a newer desired state set meanwhile is what gets sent
+    commands = _govee_pending_commands(device)
+
+    if not commands:
+        print(f"✓ Govee: {device_name} already in desired state, skipping")
+        return {'success': True, 'cached': True, 'noop': True, 'device': device_name, 'commands': []}
     
-    # Rate limiting check (global - 1 second between any Govee call)
-    now = time.time()
-    time_since_last = now - lighting_state_cache['last_govee_call']
-    if time_since_last < lighting_state_cache['govee_rate_limit']:
-        print(f"⚠️  Govee rate limit: skipping {device_name} (last call {time_since_last:.1f}s ago)")
-        return {'success': False, 'error': 'Rate limited', 'cached': True, 'device': device_name}
-    
-    # Per-device RGB cache check (only skip if THIS device already has this color)
-    current_rgb = (r, g, b)
-    device_cache = lighting_state_cache.get('device_rgb', {})
-    if device_cache.get(device_mac) == current_rgb:
-        print(f"✓ Govee: {device_name} already at RGB{current_rgb}, skipping")
-        return {'success': True, 'cached': True, 'device': device_name}
+    # Fail fast while the cloud is down; desired state is kept and replayed on recovery
+    if not breaker_allow('govee'):
+        status = breaker_status('govee')
+        return {
+            'success': False,
+            'error': 'Govee cloud degraded (circuit open)',
+            'circuit': status['state'],
+            'retryInSeconds': status['retryInSeconds'],
+            'device': device_name
+        }
     
     try:
         import requests
         
-        headers = {
-            'Govee-API-Key': api_key,
-            'Content-Type': 'application/json'
-        }
-        
-        # STEP 1: Set brightness (if provided)
-        if brightness is not None:
-            brightness_data = {
-                'device': device_mac,
-                'model': device_model,
-                'cmd': {
-                    'name': 'brightness',
-                    'value': int(brightness)
-                }
-            }
+        sent = []
+        for index, (cmd_name, value) in enumerate(commands):
+            if index > 0:
+                # Small delay between commands
+                time.sleep(0.3)
+            response = _govee_control(device, cmd_name, value, api_key)
+            lighting_state_cache['last_govee_call'] = time.time()
             
-            brightness_response = requests.put(
-                'https://developer-api.govee.com/v1/devices/control',
-                headers=headers,
-                json=brightness_data,
-                timeout=5
-            )
-            
-            if brightness_response.status_code != 200:
-                error_detail = parse_govee_error(brightness_response)
-                print(f"✗ Govee brightness failed for {device_name}: {error_detail}")
-                return {'success': False, 'error': error_detail, 'device': device_name}
+            if response.status_code != 200:
+                error_detail = parse_govee_error(response)
+                print(f"✗ Govee {cmd_name} failed for {device_name}: {error_detail}")
+                return {'success': False, 'error': error_detail, 'device': device_name, 'commands': sent}
             
-            # Small delay between commands
-            time.sleep(0.3)
+            sent.append(cmd_name)
+            with govee_state_lock:
+                known_state = govee_device_state['reported'].setdefault(device_mac, {})
+                _govee_apply_command_to_known(known_state, cmd_name, value)
+            if cmd_name == 'color':
+                lighting_state_cache['last_rgb'] = (value['r'], value['g'], value['b'])
         
-        # STEP 2: Set color
-        color_data = {
-            'device': device_mac,
-            'model': device_model,
-            'cmd': {
-                'name': 'color',
-                'value': {'r': int(r), 'g': int(g), 'b': int(b)}
-            }
-        }
-        
-        color_response = requests.put(
-            'https://developer-api.govee.com/v1/devices/control',
-            headers=headers,
-            json=color_data,
-            timeout=5
-        )
-        
-        # Update global rate limit timestamp
-        lighting_state_cache['last_govee_call'] = time.time()
-        
-        if color_response.status_code == 200:
-            # Update per-device cache on success
-            if 'device_rgb' not in lighting_state_cache:
-                lighting_state_cache['device_rgb'] = {}
-            lighting_state_cache['device_rgb'][device_mac] = current_rgb
-            lighting_state_cache['last_rgb'] = current_rgb  # Also update global
-            
-            brightness_str = f" @ {brightness}%" if brightness else ""
-            print(f"✓ Govee: Set {device_name} to RGB({r},{g},{b}){brightness_str}")
-            return {'success': True, 'device': device_name}
-        else:
-            error_detail = parse_govee_error(color_response)
-            print(f"✗ Govee color failed for {device_name}: {error_detail}")
-            return {'success': False, 'error': error_detail, 'device': device_name}
+        print(f"✓ Govee: {device_name} reconciled with {len(sent)} command(s): {', '.join(sent)}")
+        return {'success': True, 'device': device_name, 'commands': sent}
             
     except ImportError:
         return {'success': False, 'error': 'requests library not installed'}
@@ -816,6 +1670,121 @@ def set_govee_color(device, r, g, b, brightness=None):
         print(f"✗ Govee error for {device_name}: {e}")
         return {'success': False, 'error': str(e), 'device': device_name}
 
+
+def set_govee_color(device, r, g, b, brightness=None):
+    """Control Govee device via cloud API with rate limiting
+    
+    Records the desired color/brightness and reconciles, so only the
+    commands that actually change something are sent.
+    """
+    set_govee_desired(device, power='on', brightness=brightness, color=(r, g, b))
+    return reconcile_govee_device(device)
+
+
+def _govee_state_snapshot():
+    """JSON-friendly desired/last-known state per device"""
+    with govee_state_lock:
+        return {
+            mac: {
+                'desired': govee_device_state['desired'].get(mac, {}),
+                'known': govee_device_state['reported'].get(mac, {})
+            }
+            for mac in set(govee_device_state['desired']) | set(govee_device_state['reported'])
+        }
+
+
+def _govee_wait_spacing():
+    """Sleep out the global spacing between Govee cloud calls (caller holds govee_call_lock)"""
+    wait = lighting_state_cache['last_govee_call'] + lighting_state_cache['govee_rate_limit'] - time.time()
+    if wait > 0:
+        time.sleep(wait)
+
+
+def _debounced_govee_color(device, r, g, b, brightness):
+    """Dispatcher target (the reconciler waits out the global Govee spacing)"""
+    return set_govee_color(device, r, g, b, brightness)
+
+
+def refresh_govee_states(devices=None):
+    """Refresh last-known state for devices (default: all enabled) from the cloud"""
+    govee_config = config.get('govee', {})
+    api_key = govee_config.get('apiKey', '')
+    if not govee_config.get('enabled') or not api_key:
+        return {}
+
+    if devices is None:
+        devices = [d for d in govee_config.get('devices', []) if d.get('enabled', True)]
+
+    errors = {}
+    for device in devices:
+        _, error = refresh_govee_state(device)
+        if error:
+            errors[device.get('name', device.get('device'))] = error
+    return errors
+
+
+def _govee_state_refresh_loop():
+    """Keep cached state fresh within the hourly quota, oldest device first"""
+    while True:
+        govee_config = config.get('govee', {})
+        quota = _clamp_int(govee_config.get('stateQuotaPerHour', GOVEE_STATE_QUOTA_PER_HOUR),
+                           1, 10000, GOVEE_STATE_QUOTA_PER_HOUR)
+        # Leave a share of the quota for foreground reads (stale cache hits, /api/lighting/sync)
+        reserved = int(quota * GOVEE_STATE_FOREGROUND_SHARE)
+        spacing = 3600.0 / max(1, quota - reserved)
+        time.sleep(spacing)
+
+        if not govee_config.get('enabled') or _govee_state_quota_left() <= reserved:
+            continue
+
+        # Refresh-ahead: pick the device closest to (or past) its TTL. While the
+        # circuit is open every device is a candidate so a state read probes recovery.
+        probing = breaker_status('govee')['degraded']
+        now = time.time()
+        candidates = []
+        for device in govee_config.get('devices', []):
+            if not device.get('enabled', True):
+                continue
+            refreshed_at = govee_device_state['reported'].get(device.get('device'), {}).get('refreshedAt') or 0
+            remaining = refreshed_at + _govee_state_ttl(device) * 0.8 - now
+            if remaining <= 0 or probing:
+                candidates.append((refreshed_at, device.get('device'), device))
+        if candidates:
+            device = min(candidates)[2]
+            _, error = refresh_govee_state(device)
+            if error:
+                print(f"⚠️  Govee state refresh failed for {device.get('name')}: {error}")
+
+
+def reconcile_all_govee(refresh=True):
+    """Reconcile every enabled device now (seeds desired state from the theme if empty)"""
+    govee_config = config.get('govee', {})
+    devices = [d for d in govee_config.get('devices', []) if d.get('enabled', True)]
+
+    theme = config.get('theme', {})
+    rgb = theme.get('rgb', {})
+    for device in devices:
+        if device.get('device') not in govee_device_state['desired']:
+            set_govee_desired(
+                device,
+                power='on',
+                brightness=theme.get('brightness', 80),
+                color=(rgb.get('r', 255), rgb.get('g', 255), rgb.get('b', 255))
+            )
+
+    if refresh:
+        refresh_govee_states(devices)
+
+    for device in devices:
+        replace_govee_reconcile(device)
+    _kick_govee_queue()
+    return len(devices)
+
+
+# Replay the latest desired state once the Govee cloud recovers
+breaker_on_close('govee', lambda: reconcile_all_govee(refresh=False))
+
+
 def parse_govee_error(response):
     """Parse Govee API error responses into actionable messages"""
     status = response.status_code
@@ -843,167 +1812,2357 @@ def parse_govee_error(response):
     
     return f"API error {status}: {response.text[:100]}"
 
-def fetch_govee_devices(api_key):
-    """Fetch devices from Govee API"""
-    import requests
+def fetch_govee_devices(api_key):
+    """Fetch devices from Govee API"""
+    import requests
+
+    headers = {
+        'Govee-API-Key': api_key,
+        'Content-Type': 'application/json'
+    }
+
+    return requests.get(
+        'https://developer-api.govee.com/v1/devices',
+        headers=headers,
+        timeout=10
+    )
+
+SIGNALRGB_API_URL = 'http://127.0.0.1:16038'
+SIGNALRGB_APPLY_PATH = '/api/v1/lighting/effects/{name}/apply'
+
+# Persistent SignalRGB controller: one HTTP session (api mode), the last applied
+# profile, recent switch latencies and a color index for nearest-profile lookups.
+signalrgb_state = {
+    'session': None,
+    'current': None,
+    'switches': deque(maxlen=50),
+    'index': None,
+    'indexKey': None
+}
+
+
+def _signalrgb_mode(signalrgb_config):
+    # SignalRGB is Windows-only; elsewhere a mode must be chosen explicitly
+    # ('stub' records switches so the flow can be exercised without the app)
+    return signalrgb_config.get('mode') or ('url' if WINDOWS else None)
+
+
+def _srgb_to_lab(rgb):
+    """Vectorized sRGB (0-255, shape (..., 3)) to CIE L*a*b* (D65)"""
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = c @ np.array([[0.4124, 0.2126, 0.0193],
+                        [0.3576, 0.7152, 0.1192],
+                        [0.1805, 0.0722, 0.9505]])
+    xyz /= np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16.0 / 116.0)
+    return np.stack([116.0 * f[..., 1] - 16.0,
+                     500.0 * (f[..., 0] - f[..., 1]),
+                     200.0 * (f[..., 1] - f[..., 2])], axis=-1)
+
+
+def _signalrgb_profile_index():
+    """(names, Lab array) for configured profile colors, rebuilt only when config changes"""
+    colors = config.get('signalrgb', {}).get('profileColors', {})
+    key = tuple(sorted((name, c.get('r', 0), c.get('g', 0), c.get('b', 0)) for name, c in colors.items()))
+    if signalrgb_state['indexKey'] != key:
+        names = [k[0] for k in key]
+        rgb = [k[1:] for k in key]
+        if np is not None and rgb:
+            signalrgb_state['index'] = (names, _srgb_to_lab(rgb))
+        else:
+            signalrgb_state['index'] = (names, rgb)
+        signalrgb_state['indexKey'] = key
+    return signalrgb_state['index']
+
+
+def nearest_signalrgb_profile(r, g, b):
+    """Closest configured profile to an arbitrary color (perceptual distance when NumPy is available)"""
+    names, points = _signalrgb_profile_index()
+    if not names:
+        return None
+    if np is not None:
+        distances = ((points - _srgb_to_lab((r, g, b))) ** 2).sum(axis=1)
+        return names[int(np.argmin(distances))]
+    return min(zip(names, points), key=lambda p: sum((a - c) ** 2 for a, c in zip(p[1], (r, g, b))))[0]
+
+
+def _signalrgb_apply(profile_name, requested_at, force=False):
+    """Switch the running SignalRGB instance to a profile (runs on the dispatch worker)
+
+    force re-sends even when we believe the profile is active (it may have
+    been changed in the SignalRGB app since).
+    """
+    signalrgb_config = config.get('signalrgb', {})
+    mode = _signalrgb_mode(signalrgb_config)
+    if profile_name == signalrgb_state['current'] and not force:
+        return {'success': True, 'profile': profile_name, 'cached': True}
+    started = time.monotonic()
+
+    try:
+        if mode == 'api':
+            if signalrgb_state['session'] is None:
+                import requests
+                signalrgb_state['session'] = requests.Session()
+            from urllib.parse import quote
+            base = signalrgb_config.get('apiUrl', SIGNALRGB_API_URL).rstrip('/')
+            path = signalrgb_config.get('applyPath', SIGNALRGB_APPLY_PATH).format(name=quote(profile_name, safe=''))
+            response = signalrgb_state['session'].post(base + path, timeout=2)
+            if response.status_code >= 400:
+                raise RuntimeError(f'SignalRGB API returned {response.status_code}')
+        elif mode == 'url':
+            from urllib.parse import quote
+            # Handed to the already-running app by its URL-scheme handler
+            url = f"signalrgb://effect/apply/{quote(profile_name)}?-silentlaunch-"
+            if WINDOWS:
+                os.startfile(url)
+            else:
+                subprocess.run(['xdg-open', url], timeout=3, check=False)
+        elif mode != 'stub':
+            raise ValueError(f'Unknown SignalRGB mode: {mode}')
+    except Exception as e:
+        print(f"✗ SignalRGB error: {e}")
+        return {'success': False, 'error': str(e), 'profile': profile_name}
+
+    finished = time.monotonic()
+    signalrgb_state['current'] = profile_name
+    signalrgb_state['switches'].append({
+        'profile': profile_name,
+        'mode': mode,
+        'at': _now_iso(),
+        'callMs': round((finished - started) * 1000, 1),
+        'latencyMs': round((finished - requested_at) * 1000, 1)
+    })
+    print(f"✓ SignalRGB: Switched to profile '{profile_name}' via {mode}")
+    return {'success': True, 'profile': profile_name}
+
+
+def set_signalrgb_profile(theme_name, rgb=None, force=False):
+    """Switch SignalRGB profile based on theme (or the nearest profile to rgb)
+
+    Rapid switches are debounced so only the latest profile is applied; force
+    re-asserts the profile even if it is believed to be active already.
+    """
+    signalrgb_config = config.get('signalrgb', {})
+    
+    if not signalrgb_config.get('enabled'):
+        return {'success': False, 'error': 'SignalRGB not enabled'}
+    if _signalrgb_mode(signalrgb_config) is None:
+        return {'success': False, 'error': "SignalRGB is Windows-only; set signalrgb.mode to 'api' or 'stub'"}
+    
+    profiles = signalrgb_config.get('profiles', {})
+    profile_name = profiles.get(theme_name) if theme_name else None
+    matched = 'theme'
+    if not profile_name and rgb is not None:
+        profile_name = nearest_signalrgb_profile(*rgb)
+        matched = 'nearest'
+    
+    if not profile_name:
+        print(f"⚠️  No SignalRGB profile mapped for theme: {theme_name}")
+        return {'success': False, 'error': f'No profile for theme {theme_name}'}
+    
+    # Always queue, even for the current profile: it replaces any pending switch (A -> B -> A ends on A)
+    debounce_ms = _clamp_int(signalrgb_config.get('debounceMs', 250), 0, 5000, 250)
+    job = submit_debounced('signalrgb', _signalrgb_apply, args=(profile_name, time.monotonic(), force),
+                           delay=debounce_ms / 1000.0, max_wait=1.0, lane='signalrgb')
+    return {'success': True, 'profile': profile_name, 'matched': matched, 'queued': True, 'jobId': job['id']}
+
+
+def signalrgb_status():
+    switches = list(signalrgb_state['switches'])
+    latencies = sorted(s['latencyMs'] for s in switches)
+    return {
+        'mode': _signalrgb_mode(config.get('signalrgb', {})),
+        'current': signalrgb_state['current'],
+        'switches': switches[-10:],
+        'latencyMs': {
+            'avg': round(sum(latencies) / len(latencies), 1) if latencies else None,
+            'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None
+        }
+    }
+
+
+def process_govee_queue():
+    """Process Govee commands one at a time from the queue"""
+    global govee_queue_processing
+    
+    with govee_queue_lock:
+        if govee_queue_processing or not govee_queue:
+            return
+        govee_queue_processing = True
+    
+    try:
+        while True:
+            with govee_queue_lock:
+                if not govee_queue:
+                    # Cleared under the lock: anything appended after this kicks a new processor
+                    govee_queue_processing = False
+                    break
+                cmd = govee_queue.pop(0)
+            device = cmd['device']
+            device_name = device.get('name', 'Unknown')
+            
+            if cmd.get('reconcile'):
+                print(f"\n🎨 Processing queue: {device_name} (reconcile)")
+                result = reconcile_govee_device(device)
+            else:
+                r, g, b = cmd['r'], cmd['g'], cmd['b']
+                brightness = cmd.get('brightness')
+                print(f"\n🎨 Processing queue: {device_name}")
+                print(f"   RGB: ({r}, {g}, {b}) @ {brightness}%")
+                
+                # Execute the command
+                result = set_govee_color(device, r, g, b, brightness)
+            
+            # Log result
+            if result.get('success'):
+                print(f"✓ {device_name} updated successfully")
+            else:
+                print(f"✗ {device_name} failed: {result.get('error')}")
+            
+            # Wait 1.1 seconds before next command (Govee rate limit safety)
+            remaining = len(govee_queue)
+            if remaining and not result.get('noop') and not result.get('circuit'):  # Only wait if more commands remain and we hit the API
+                print(f"⏱️  Waiting 1.1s before next command... ({remaining} remaining)")
+                time.sleep(1.1)
+    finally:
+        with govee_queue_lock:
+            govee_queue_processing = False
+    print(f"\n✓ Queue completed\n")
+
+
+def _govee_command(device, r, g, b, brightness):
+    return {'device': device, 'r': r, 'g': g, 'b': b, 'brightness': brightness}
+
+
+def queue_govee_command(device, r, g, b, brightness=None):
+    """Add a Govee command to the queue"""
+    device_name = device.get('name', 'Unknown')
+    print(f"📝 Queued: {device_name} → RGB({r},{g},{b}) @ {brightness}%")
+    
+    with govee_queue_lock:
+        govee_queue.append(_govee_command(device, r, g, b, brightness))
+
+
+def clear_govee_queue():
+    with govee_queue_lock:
+        govee_queue.clear()
+
+
+def _replace_govee_entry(device, entry):
+    """Swap a device's pending entry for this one (caller holds govee_queue_lock); True if replaced"""
+    device_mac = device.get('device')
+    for index, cmd in enumerate(govee_queue):
+        if cmd['device'].get('device') == device_mac:
+            govee_queue[index] = entry
+            return True
+    govee_queue.append(entry)
+    return False
+
+
+def replace_govee_command(device, r, g, b, brightness=None):
+    """Queue a Govee command, replacing any pending one for the same device
+
+    Returns True if a pending command was superseded.
+    """
+    with govee_queue_lock:
+        return _replace_govee_entry(device, _govee_command(device, r, g, b, brightness))
+
+
+def replace_govee_reconcile(device):
+    """Queue a reconcile-now entry for a device (replaces a pending one)"""
+    with govee_queue_lock:
+        return _replace_govee_entry(device, {'device': device, 'reconcile': True})
+
+
+def _kick_govee_queue():
+    """Start the queue processor unless one is already draining the queue"""
+    with govee_queue_lock:
+        start = bool(govee_queue) and not govee_queue_processing
+    if start:
+        threading.Thread(target=process_govee_queue, daemon=True).start()
+
+
+# ============================================================
+# LAN LIGHTS (WLED JSON API + DDP/DRGB REALTIME)
+# ============================================================
+
+WLED_DDP_PORT = 4048
+WLED_UDP_REALTIME_PORT = 21324
+DDP_HEADER_LEN = 10
+DDP_MAX_PIXELS = 480  # 1440 data bytes per packet
+DRGB_MAX_PIXELS = 490
+DNRGB_MAX_PIXELS = 489
+DRGB_TIMEOUT_SECONDS = 2  # WLED returns to normal mode after this
+
+# Realtime stream state per LAN device: {device_key: stream}
+lan_streams = {}
+lan_streams_lock = threading.Lock()
+_lan_socket = None
+_lan_socket_lock = threading.Lock()
+
+
+def _lan_device_key(device):
+    return device.get('id') or f"{device.get('ip', 'unknown')}:{device.get('port', '')}"
+
+
+def _lan_get_socket():
+    """Shared non-blocking UDP socket for all realtime frames"""
+    global _lan_socket
+    if _lan_socket is None:
+        with _lan_socket_lock:
+            if _lan_socket is None:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.setblocking(False)
+                _lan_socket = sock
+    return _lan_socket
+
+
+def wled_get_state(device, timeout=2):
+    """Read WLED state (on/bri/segments) via the JSON API"""
+    import requests
+
+    response = requests.get(f"http://{device.get('ip')}/json/state", timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def wled_get_info(device, timeout=2):
+    """Read WLED info (LED count, version, realtime status) via the JSON API"""
+    import requests
+
+    response = requests.get(f"http://{device.get('ip')}/json/info", timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def wled_set_state(device, r=None, g=None, b=None, brightness=None, on=True, transition_ms=None):
+    """Set WLED power, brightness (0-100%) and primary color via the JSON API"""
+    device_name = device.get('name', device.get('ip', 'Unknown'))
+    payload = {'on': bool(on)}
+    if brightness is not None:
+        payload['bri'] = _clamp_int(round(float(brightness) * 2.55), 0, 255, 255)
+    if r is not None:
+        payload['seg'] = [{'col': [[int(r), int(g), int(b)]]}]
+    if transition_ms is not None:
+        # WLED transitions are in 100 ms units
+        payload['tt'] = _clamp_int(int(transition_ms) // 100, 0, 65535, 7)
+
+    try:
+        import requests
+
+        response = requests.post(
+            f"http://{device.get('ip')}/json/state",
+            json=payload,
+            timeout=2
+        )
+        if response.status_code == 200:
+            print(f"✓ WLED: Set {device_name} → {payload}")
+            return {'success': True, 'device': device_name}
+        return {'success': False, 'error': f'WLED returned {response.status_code}', 'device': device_name}
+    except ImportError:
+        return {'success': False, 'error': 'requests library not installed'}
+    except Exception as e:
+        print(f"✗ WLED error for {device_name}: {e}")
+        return {'success': False, 'error': str(e), 'device': device_name}
+
+
+def _lan_led_count(device):
+    led_count = device.get('ledCount')
+    if led_count:
+        return _clamp_int(led_count, 1, 10000, 30)
+    try:
+        info = wled_get_info(device)
+        return _clamp_int(info.get('leds', {}).get('count'), 1, 10000, 30)
+    except Exception:
+        return 30
+
+
+def _lan_build_stream(device, led_count):
+    """Preallocate packet buffers for a device so frames never allocate
+
+    Each packet is (buffer, memoryview, first_pixel, pixel_count). Headers are
+    written once here; per frame only pixel bytes and the DDP sequence change.
+    """
+    protocol = (device.get('protocol') or 'ddp').lower()
+    packets = []
+
+    if protocol == 'ddp':
+        port = device.get('port') or WLED_DDP_PORT
+        for first in range(0, led_count, DDP_MAX_PIXELS):
+            count = min(DDP_MAX_PIXELS, led_count - first)
+            buf = bytearray(DDP_HEADER_LEN + count * 3)
+            buf[0] = 0x40  # version 1, push flag set on the last packet below
+            buf[2] = 0x0B  # RGB, 8 bits per channel
+            buf[3] = 0x01  # default output device
+            buf[4:8] = (first * 3).to_bytes(4, 'big')
+            buf[8:10] = (count * 3).to_bytes(2, 'big')
+            packets.append((buf, memoryview(buf), first, count, DDP_HEADER_LEN))
+        packets[-1][0][0] |= 0x01
+    elif protocol == 'drgb' and led_count <= DRGB_MAX_PIXELS:
+        port = device.get('port') or WLED_UDP_REALTIME_PORT
+        buf = bytearray(2 + led_count * 3)
+        buf[0] = 2  # DRGB
+        buf[1] = DRGB_TIMEOUT_SECONDS
+        packets.append((buf, memoryview(buf), 0, led_count, 2))
+    else:
+        # DNRGB carries a start index, so strips longer than DRGB allows are chunked
+        port = device.get('port') or WLED_UDP_REALTIME_PORT
+        for first in range(0, led_count, DNRGB_MAX_PIXELS):
+            count = min(DNRGB_MAX_PIXELS, led_count - first)
+            buf = bytearray(4 + count * 3)
+            buf[0] = 4  # DNRGB
+            buf[1] = DRGB_TIMEOUT_SECONDS
+            buf[2:4] = first.to_bytes(2, 'big')
+            packets.append((buf, memoryview(buf), first, count, 4))
+        protocol = 'dnrgb'
+
+    return {
+        'name': device.get('name', device.get('ip', 'Unknown')),
+        'addr': (device.get('ip'), int(port)),
+        'protocol': protocol,
+        'ledCount': led_count,
+        'packets': packets,
+        'seq': 0,
+        'framesSent': 0,
+        'sendErrors': 0,
+        'lastSentAt': None
+    }
+
+
+def lan_get_stream(device):
+    """Get (or lazily build) the preallocated realtime stream for a device"""
+    key = _lan_device_key(device)
+    stream = lan_streams.get(key)
+    if stream is None:
+        # The LED count may need a /json/info round trip; never hold the lock for it
+        led_count = _lan_led_count(device)
+        with lan_streams_lock:
+            stream = lan_streams.get(key)
+            if stream is None:
+                stream = _lan_build_stream(device, led_count)
+                lan_streams[key] = stream
+    return stream
+
+
+def lan_fill_solid(stream, r, g, b):
+    """Fill every pixel of a stream with one color, in place"""
+    for buf, view, first, count, offset in stream['packets']:
+        view[offset] = int(r) & 0xFF
+        view[offset + 1] = int(g) & 0xFF
+        view[offset + 2] = int(b) & 0xFF
+        # Doubling copy within the buffer: O(log n) slice copies, no new objects sized n
+        filled = 3
+        total = count * 3
+        while filled < total:
+            chunk = min(filled, total - filled)
+            view[offset + filled:offset + filled + chunk] = view[offset:offset + chunk]
+            filled += chunk
+
+
+def lan_set_pixels(stream, pixels):
+    """Copy a packed RGB frame (bytes-like, 3 bytes per LED) into the stream buffers"""
+    source = memoryview(pixels).cast('B')
+    for buf, view, first, count, offset in stream['packets']:
+        start = first * 3
+        end = min(start + count * 3, len(source))
+        if end <= start:
+            break
+        view[offset:offset + (end - start)] = source[start:end]
+
+
+def lan_push(stream):
+    """Send the current frame of a stream over UDP"""
+    sock = _lan_get_socket()
+    if stream['protocol'] == 'ddp':
+        # 4-bit sequence number, 0 means "unused" so cycle 1..15
+        stream['seq'] = stream['seq'] % 15 + 1
+        for buf, view, first, count, offset in stream['packets']:
+            buf[1] = stream['seq']
+
+    try:
+        for buf, view, first, count, offset in stream['packets']:
+            sock.sendto(view, stream['addr'])
+    except (BlockingIOError, OSError):
+        stream['sendErrors'] += 1
+        return False
+
+    stream['framesSent'] += 1
+    stream['lastSentAt'] = time.monotonic()
+    return True
+
+
+def lan_stream_stats():
+    """Per-device realtime counters for the lighting API"""
+    return {
+        key: {
+            'name': s['name'],
+            'protocol': s['protocol'],
+            'ledCount': s['ledCount'],
+            'framesSent': s['framesSent'],
+            'sendErrors': s['sendErrors']
+        }
+        for key, s in list(lan_streams.items())
+    }
+
+
+def _lan_enabled_devices():
+    lan_config = config.get('lan_lights', {})
+    if not lan_config.get('enabled'):
+        return []
+    return [d for d in lan_config.get('devices', []) if d.get('enabled', True) and d.get('ip')]
+
+
+def apply_lan_theme(devices, r, g, b, brightness):
+    """Push a theme to WLED devices via the JSON API (runs off the request thread)"""
+    for device in devices:
+        wled_set_state(device, r, g, b, brightness)
+
+
+def reconcile_lan_theme(devices, r, g, b, brightness):
+    """Read each WLED device's state and send the theme only where it differs"""
+    bri = _clamp_int(round(float(brightness) * 2.55), 0, 255, 255)
+    sent = 0
+    for device in devices:
+        try:
+            state = wled_get_state(device)
+            segments = state.get('seg') or [{}]
+            color = (segments[0].get('col') or [[None]])[0][:3]
+            if state.get('on') and state.get('bri') == bri and list(color) == [int(r), int(g), int(b)]:
+                continue
+        except Exception:
+            pass   # unreadable: send the theme anyway
+        wled_set_state(device, r, g, b, brightness)
+        sent += 1
+    return sent
+
+
+# ============================================================
+# SEGMENT COLOR PIPELINE (RGBIC strips, Govee cloud v2 + WLED)
+# ============================================================
+
+GOVEE_V2_CONTROL_URL = 'https://openapi.api.govee.com/router/api/v1/device/control'
+
+segment_lock = threading.Lock()
+# Fleet layout: every segment-capable device owns a block of rows in one (R, 3)
+# array so gamma, white balance and calibration run as a single vectorized pass.
+segment_pipeline = {
+    'layout': None,
+    'fingerprint': None
+}
+
+
+def _segment_targets():
+    targets = []
+    govee_config = config.get('govee', {})
+    if govee_config.get('enabled'):
+        for device in govee_config.get('devices', []):
+            segments = _clamp_int(device.get('segments', 0), 0, 1000, 0)
+            if device.get('enabled', True) and segments:
+                targets.append({'key': f"govee:{device.get('device')}", 'backend': 'govee',
+                                'device': device, 'segments': segments,
+                                'aliases': {device.get('device')}})
+    for device in _lan_enabled_devices():
+        segments = _clamp_int(device.get('segments', 1), 1, 1000, 1)
+        targets.append({'key': f"lan:{_lan_device_key(device)}", 'backend': 'lan',
+                        'device': device, 'segments': segments,
+                        'aliases': {device.get('id'), device.get('ip')} - {None}})
+    return targets
+
+
+def _segment_layout():
+    """Build (or reuse) the fleet layout; rebuilt only when relevant config changes"""
+    lighting_config = config.get('lighting', {})
+    targets = _segment_targets()
+    fingerprint = json.dumps([
+        [t['key'], t['segments'], t['device'].get('calibration'), t['device'].get('whiteBalance'),
+         t['device'].get('gamma')] for t in targets
+    ] + [lighting_config.get('gamma'), lighting_config.get('whiteBalance')], sort_keys=True, default=str)
+    if segment_pipeline['fingerprint'] == fingerprint:
+        return segment_pipeline['layout']
+
+    rows = sum(t['segments'] for t in targets)
+    matrices = np.empty((rows, 3, 3), dtype=np.float32)
+    gamma = np.empty((rows, 1), dtype=np.float32)
+    by_key = {}
+    offset = 0
+    for target in targets:
+        device = target['device']
+        block = slice(offset, offset + target['segments'])
+        offset += target['segments']
+        target['rows'] = block
+
+        # White balance is folded into the calibration matrix: M' = diag(wb) @ M
+        calibration = np.array(device.get('calibration') or np.eye(3), dtype=np.float32).reshape(3, 3)
+        balance = device.get('whiteBalance') or lighting_config.get('whiteBalance') or [1.0, 1.0, 1.0]
+        matrices[block] = np.diag(np.array(balance, dtype=np.float32)) @ calibration
+        gamma[block] = float(device.get('gamma') or lighting_config.get('gamma') or 1.0)
+
+        by_key[target['key']] = target
+        for alias in target['aliases']:
+            by_key[alias] = target
+
+    layout = {
+        'targets': targets,
+        'byKey': by_key,
+        'rows': rows,
+        'matrices': matrices,
+        'gamma': gamma,
+        'frame': np.zeros((rows, 3), dtype=np.float32),      # requested colors
+        'work': np.zeros((rows, 3), dtype=np.float32),
+        'target': np.zeros((rows, 3), dtype=np.uint8),       # corrected output
+        'lastSent': np.full((rows, 3), -1, dtype=np.int16)   # -1: never sent
+    }
+    segment_pipeline['layout'] = layout
+    segment_pipeline['fingerprint'] = fingerprint
+    return layout
+
+
+def _segment_correct(layout):
+    """Calibration + white balance, then gamma (out = 255 * (in / 255) ** gamma), for the whole fleet in one pass"""
+    work = layout['work']
+    np.einsum('rij,rj->ri', layout['matrices'], layout['frame'], out=work)
+    np.clip(work, 0.0, 255.0, out=work)
+    work /= 255.0
+    np.power(work, layout['gamma'], out=work)
+    work *= 255.0
+    np.rint(work, out=work)
+    layout['target'][...] = work
+
+
+def set_segment_frame(frames, dispatch=True):
+    """Set per-segment colors for one or more devices and schedule sends of what changed
+
+    frames: {device ref: [[r, g, b], ...] or [{'r','g','b'}, ...]}; a single color
+    fills every segment, shorter lists repeat. Returns {device key: job or None}.
+    """
+    if np is None:
+        raise RuntimeError('NumPy is required for segment control (pip install numpy)')
+
+    with segment_lock:
+        layout = _segment_layout()
+        touched = []
+        for ref, colors in frames.items():
+            target = layout['byKey'].get(ref)
+            if target is None:
+                raise ValueError(f'Unknown or non-segmented device: {ref}')
+            values = np.array([[c.get('r', 0), c.get('g', 0), c.get('b', 0)] if isinstance(c, dict) else c
+                               for c in colors], dtype=np.float32).reshape(-1, 3)
+            if not len(values):
+                raise ValueError(f'No colors given for {ref}')
+            reps = -(-target['segments'] // len(values))
+            layout['frame'][target['rows']] = np.tile(values, (reps, 1))[:target['segments']]
+            touched.append(target)
+
+        _segment_correct(layout)
+
+    jobs = {}
+    for target in touched:
+        jobs[target['key']] = submit_debounced(
+            f"segments:{target['key']}", flush_segments, args=(target['key'],),
+            delay=0.05, lane=target['backend']
+        ) if dispatch else None
+    return jobs
+
+
+def segment_changes(key):
+    """(target, segment indices, uint8 colors) that differ from what was last sent"""
+    with segment_lock:
+        # Reuse the layout set_segment_frame built; a config change rebuilds it there
+        layout = segment_pipeline['layout'] or _segment_layout()
+        target = layout['byKey'].get(key)
+        if target is None:
+            return None, None, None
+        wanted = layout['target'][target['rows']]
+        changed = np.flatnonzero((wanted != layout['lastSent'][target['rows']]).any(axis=1))
+        return target, changed, wanted[changed].copy()
+
+
+def _segment_mark_sent(target, indices, colors):
+    with segment_lock:
+        layout = segment_pipeline['layout']
+        if layout is not None and layout['byKey'].get(target['key']) is target:
+            layout['lastSent'][target['rows'].start + indices] = colors
+
+
+def flush_segments(key):
+    """Send only the changed segments of one device to its backend"""
+    target, indices, colors = segment_changes(key)
+    if target is None:
+        return {'success': False, 'error': 'Device no longer segmented'}
+    if not len(indices):
+        return {'success': True, 'noop': True, 'segments': 0}
+
+    if target['backend'] == 'govee':
+        result = _govee_send_segments(target['device'], indices, colors)
+    else:
+        result = _wled_send_segments(target['device'], target['segments'], indices, colors)
+
+    # Govee sends one call per color, so a failure part-way may still have delivered some
+    delivered = result.pop('delivered', None)
+    if delivered is not None and len(delivered):
+        _segment_mark_sent(target, indices[delivered], colors[delivered])
+    if result.get('success'):
+        if delivered is None:
+            _segment_mark_sent(target, indices, colors)
+        result['segments'] = int(len(indices))
+    return result
+
+
+def _govee_send_segments(device, indices, colors):
+    """Govee cloud v2: one segment_color_setting call per distinct color, spaced like every Govee call
+
+    The result's 'delivered' lists the positions (into indices) that Govee
+    accepted, so a failure part-way leaves the rest to be resent.
+    """
+    api_key = config.get('govee', {}).get('apiKey', '')
+    if not api_key:
+        return {'success': False, 'error': 'Govee API key not configured'}
+    if not breaker_allow('govee'):
+        return {'success': False, 'error': 'Govee cloud degraded (circuit open)', 'circuit': 'open'}
+
+    groups = {}
+    for position, (index, (r, g, b)) in enumerate(zip(indices.tolist(), colors.tolist())):
+        groups.setdefault((r << 16) | (g << 8) | b, []).append((position, index))
+
+    import requests
+    delivered = []
+    try:
+        for rgb_int, members in groups.items():
+            segments = [index for _, index in members]
+            with govee_call_lock:
+                _govee_wait_spacing()
+                response = requests.post(
+                    GOVEE_V2_CONTROL_URL,
+                    headers=_govee_headers(api_key),
+                    json={
+                        'requestId': uuid.uuid4().hex,
+                        'payload': {
+                            'sku': device.get('model'),
+                            'device': device.get('device'),
+                            'capability': {
+                                'type': 'devices.capabilities.segment_color_setting',
+                                'instance': 'segmentedColorRgb',
+                                'value': {'segment': segments, 'rgb': rgb_int}
+                            }
+                        }
+                    },
+                    timeout=5
+                )
+                lighting_state_cache['last_govee_call'] = time.time()
+            record_upstream_response('govee', response)
+            if response.status_code != 200:
+                return {'success': False, 'error': parse_govee_error(response), 'delivered': delivered}
+            # v2 reports command failures in the body with HTTP 200
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            if body.get('code') != 200:
+                return {'success': False, 'delivered': delivered,
+                        'error': f"Govee rejected segment command: {body.get('msg') or body.get('message') or body.get('code')}"}
+            delivered.extend(position for position, _ in members)
+    except requests.exceptions.RequestException as e:
+        breaker_failure('govee', type(e).__name__)
+        return {'success': False, 'error': str(e), 'delivered': delivered}
+
+    return {'success': True, 'commands': len(groups), 'delivered': delivered}
+
+
+def _wled_send_segments(device, segment_count, indices, colors):
+    """WLED JSON API individual LED ranges: one request for all changed segments"""
+    leds = lan_get_stream(device)['ledCount']
+    ranges = []
+    for index, (r, g, b) in zip(indices.tolist(), colors.tolist()):
+        ranges.extend([index * leds // segment_count, (index + 1) * leds // segment_count, f'{r:02X}{g:02X}{b:02X}'])
+
+    try:
+        import requests
+
+        response = requests.post(
+            f"http://{device.get('ip')}/json/state",
+            json={'on': True, 'seg': [{'id': 0, 'i': ranges}]},
+            timeout=2
+        )
+        if response.status_code != 200:
+            return {'success': False, 'error': f'WLED returned {response.status_code}'}
+        return {'success': True, 'commands': 1}
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+
+def segment_layout_summary():
+    with segment_lock:
+        layout = _segment_layout() if np is not None else None
+        if layout is None:
+            return {'devices': [], 'segments': 0}
+        return {
+            'segments': layout['rows'],
+            'devices': [
+                {
+                    'key': t['key'],
+                    'name': t['device'].get('name', t['key']),
+                    'backend': t['backend'],
+                    'segments': t['segments'],
+                    'colors': layout['target'][t['rows']].tolist()
+                }
+                for t in layout['targets']
+            ]
+        }
+
+
+# ============================================================
+# LIGHTING EFFECTS ENGINE (fades, breathing, color cycles)
+# ============================================================
+
+# Max frame rate per backend; Govee cloud is throttled far below LAN
+LIGHTING_BACKEND_RATES = {
+    'lan': 60.0,
+    'govee': 0.5
+}
+
+lighting_engine_lock = threading.RLock()
+lighting_engine_wake = threading.Condition(lighting_engine_lock)
+
+# Single scheduler thread state. Targets are device bindings with preallocated
+# frame buffers; effects own a contiguous block of rows (one row per segment).
+lighting_engine = {
+    'thread': None,
+    'effects': {},      # effect_id -> effect
+    'targets': {},      # target key -> target
+    'backends': {},     # backend -> {'interval', 'nextDue', 'framesSent', 'framesDropped', 'sentTimes'}
+    'lastColors': {}    # target key -> (r, g, b) last frame delivered
+}
+
+
+def _engine_backend(name):
+    backend = lighting_engine['backends'].get(name)
+    if backend is None:
+        rates = config.get('lighting', {}).get('backendRates', {})
+        rate = float(rates.get(name, LIGHTING_BACKEND_RATES.get(name, 1.0)))
+        backend = {
+            'interval': 1.0 / max(0.01, rate),
+            'nextDue': time.monotonic(),
+            'framesSent': 0,
+            'framesDropped': 0,
+            'sentTimes': deque(maxlen=120)
+        }
+        lighting_engine['backends'][name] = backend
+    return backend
+
+
+def _engine_resolve_targets(backends, device_refs=None):
+    """Build target bindings for the requested backends (optionally filtered)"""
+    targets = []
+    if 'lan' in backends:
+        for device in _lan_enabled_devices():
+            key = f"lan:{_lan_device_key(device)}"
+            if device_refs and not ({key, device.get('id'), device.get('ip')} & set(device_refs)):
+                continue
+            targets.append({'key': key, 'backend': 'lan', 'device': device,
+                            'segments': _clamp_int(device.get('segments', 1), 1, 1000, 1)})
+    if 'govee' in backends and config.get('govee', {}).get('enabled'):
+        for device in config.get('govee', {}).get('devices', []):
+            if not device.get('enabled', True):
+                continue
+            key = f"govee:{device.get('device')}"
+            if device_refs and not ({key, device.get('device')} & set(device_refs)):
+                continue
+            targets.append({'key': key, 'backend': 'govee', 'device': device, 'segments': 1})
+    return targets
+
+
+def _engine_bind_target(target):
+    """Attach preallocated per-frame buffers to a target (LAN streams resolved by the caller)"""
+    if target['backend'] == 'lan':
+        stream = target['stream']
+        leds = stream['ledCount']
+        segments = min(target['segments'], leds)
+        target['segments'] = segments
+        target['stream'] = stream
+        if segments > 1:
+            target['ledToRow'] = (np.arange(leds) * segments // leds).astype(np.intp)
+            target['pixels'] = np.zeros((leds, 3), dtype=np.uint8)
+    lighting_engine['targets'][target['key']] = target
+    return target
+
+
+def _engine_start_color(key):
+    last = lighting_engine['lastColors'].get(key) or lighting_state_cache.get('last_rgb')
+    if last:
+        return last
+    rgb = config.get('theme', {}).get('rgb', {})
+    return (rgb.get('r', 0), rgb.get('g', 0), rgb.get('b', 0))
+
+
+def start_lighting_effect(effect_type, colors, duration_ms=1000, period_ms=4000, backends=('lan', 'govee'),
+                          devices=None, brightness=None, min_level=0.15, spread=0.0):
+    """Start a fade/breathe/cycle effect on every matching device
+
+    Devices already running another effect are moved to the new one. Returns
+    the effect summary, or raises ValueError for bad input.
+    """
+    if np is None:
+        raise RuntimeError('NumPy is required for lighting effects (pip install numpy)')
+    if effect_type not in ('fade', 'breathe', 'cycle'):
+        raise ValueError('type must be one of: fade, breathe, cycle')
+    if not colors:
+        raise ValueError('at least one color is required')
+
+    palette = np.array([[c.get('r', 0), c.get('g', 0), c.get('b', 0)] for c in colors], dtype=np.float32)
+
+    resolved = _engine_resolve_targets(backends, devices)
+    for target in resolved:
+        if target['backend'] == 'lan':
+            # A new stream may ask the strip for its LED count; never under the engine lock
+            target['stream'] = lan_get_stream(target['device'])
+
+    with lighting_engine_lock:
+        targets = [_engine_bind_target(t) for t in resolved]
+        if not targets:
+            raise ValueError('No enabled lighting devices for the requested backends')
+
+        keys = {t['key'] for t in targets}
+        for other_id, other in list(lighting_engine['effects'].items()):
+            other['targets'] = [t for t in other['targets'] if t['key'] not in keys]
+            if not other['targets']:
+                del lighting_engine['effects'][other_id]
+            else:
+                _engine_layout_rows(other)
+
+        effect = {
+            'id': str(uuid.uuid4())[:8],
+            'type': effect_type,
+            'targets': targets,
+            'palette': palette,
+            'startedAt': time.monotonic(),
+            'duration': max(0.0, float(duration_ms) / 1000.0),
+            'period': max(0.05, float(period_ms) / 1000.0),
+            'minLevel': max(0.0, min(1.0, float(min_level))),
+            'spread': float(spread),
+            'brightness': brightness
+        }
+        _engine_layout_rows(effect)
+        lighting_engine['effects'][effect['id']] = effect
+        for target in targets:
+            _engine_backend(target['backend'])
+
+        if lighting_engine['thread'] is None or not lighting_engine['thread'].is_alive():
+            lighting_engine['thread'] = threading.Thread(target=_lighting_engine_loop, daemon=True)
+            lighting_engine['thread'].start()
+        lighting_engine_wake.notify()
+
+    print(f"✨ Effect {effect['id']}: {effect_type} on {len(targets)} device(s)")
+    return _engine_effect_summary(effect)
+
+
+def _engine_layout_rows(effect):
+    """(Re)build the row arrays an effect renders into, one row per segment"""
+    rows = []
+    phase = []
+    offset = 0
+    for index, target in enumerate(effect['targets']):
+        segments = target['segments']
+        target['rows'] = slice(offset, offset + segments)
+        offset += segments
+        rows.extend([_engine_start_color(target['key'])] * segments)
+        # Chase along segments, optionally offset per device
+        phase.extend((np.arange(segments) / segments + index * effect['spread']).tolist())
+    effect['start'] = np.array(rows, dtype=np.float32).reshape(-1, 3)
+    effect['phase'] = np.array(phase, dtype=np.float32)
+    effect['out'] = np.empty_like(effect['start'])
+    effect['outU8'] = np.empty(effect['start'].shape, dtype=np.uint8)
+
+
+def _engine_render(effect, now):
+    """Compute this frame for every row of an effect; returns True when finished"""
+    t = now - effect['startedAt']
+    out = effect['out']
+    palette = effect['palette']
+
+    if effect['type'] == 'fade':
+        progress = 1.0 if effect['duration'] <= 0 else min(1.0, t / effect['duration'])
+        eased = progress * progress * (3.0 - 2.0 * progress)  # smoothstep
+        np.subtract(palette[0], effect['start'], out=out)
+        out *= eased
+        out += effect['start']
+        finished = progress >= 1.0
+    elif effect['type'] == 'breathe':
+        level = effect['minLevel'] + (1.0 - effect['minLevel']) * 0.5 * (1.0 - np.cos(2.0 * np.pi * t / effect['period']))
+        np.multiply(palette[0], level, out=out)
+        finished = effect['duration'] > 0 and t >= effect['duration']
+    else:
+        # Cycle: walk the palette, interpolating between neighbours
+        position = (t / effect['period'] + effect['phase']) * len(palette)
+        index = np.floor(position).astype(np.intp)
+        frac = (position - index)[:, None]
+        a = palette[index % len(palette)]
+        b = palette[(index + 1) % len(palette)]
+        np.subtract(b, a, out=out)
+        out *= frac
+        out += a
+        finished = effect['duration'] > 0 and t >= effect['duration']
+
+    np.clip(out, 0, 255, out=out)
+    np.rint(out, out=out)
+    effect['outU8'][...] = out
+    return finished
+
+
+def _engine_deliver(target, rows):
+    """Hand one frame to a target's backend without blocking the scheduler"""
+    key = target['key']
+    first = rows[0]
+    color = (int(first[0]), int(first[1]), int(first[2]))
+
+    if target['backend'] == 'lan':
+        stream = target['stream']
+        if target['segments'] > 1:
+            np.take(rows, target['ledToRow'], axis=0, out=target['pixels'])
+            lan_set_pixels(stream, target['pixels'])
+        else:
+            lan_fill_solid(stream, *color)
+        ok = lan_push(stream)
+        lighting_engine['lastColors'][key] = color
+        return ok
+
+    # Govee: latest-wins per device in the command queue, unchanged frames skipped
+    if lighting_engine['lastColors'].get(key) == color:
+        return True
+    lighting_engine['lastColors'][key] = color
+    replaced = replace_govee_command(target['device'], *color, brightness=target.get('brightness'))
+    _kick_govee_queue()
+    return not replaced
+
+
+def _lighting_engine_loop():
+    """The one scheduler thread: render all effects in a batch, deliver per backend rate"""
+    while True:
+        with lighting_engine_lock:
+            while not lighting_engine['effects']:
+                lighting_engine_wake.wait()
+
+            now = time.monotonic()
+            active = {t['backend'] for e in lighting_engine['effects'].values() for t in e['targets']}
+            due = set()
+            for name in active:
+                backend = _engine_backend(name)
+                if backend['nextDue'] <= now:
+                    # Frames whose slot passed entirely while we were late are dropped
+                    missed = int((now - backend['nextDue']) // backend['interval'])
+                    backend['framesDropped'] += missed
+                    backend['nextDue'] += (missed + 1) * backend['interval']
+                    due.add(name)
+
+            if due:
+                for effect_id, effect in list(lighting_engine['effects'].items()):
+                    finished = _engine_render(effect, now)
+                    for target in effect['targets']:
+                        # The final frame always goes out, even to throttled backends
+                        if target['backend'] not in due and not finished:
+                            continue
+                        if finished and effect['brightness'] is not None:
+                            target['brightness'] = effect['brightness']
+                        backend = lighting_engine['backends'][target['backend']]
+                        if _engine_deliver(target, effect['outU8'][target['rows']]):
+                            backend['framesSent'] += 1
+                            backend['sentTimes'].append(now)
+                        else:
+                            backend['framesDropped'] += 1
+                        target.pop('brightness', None)
+                    if finished:
+                        del lighting_engine['effects'][effect_id]
+
+            next_due = min((lighting_engine['backends'][n]['nextDue'] for n in active), default=now + 1.0)
+            lighting_engine_wake.wait(timeout=max(0.0, next_due - time.monotonic()))
+
+
+def stop_lighting_effects(effect_id=None):
+    with lighting_engine_lock:
+        if effect_id:
+            removed = 1 if lighting_engine['effects'].pop(effect_id, None) else 0
+        else:
+            removed = len(lighting_engine['effects'])
+            lighting_engine['effects'].clear()
+        lighting_engine_wake.notify()
+    return removed
+
+
+def _engine_effect_summary(effect):
+    return {
+        'id': effect['id'],
+        'type': effect['type'],
+        'devices': [t['device'].get('name', t['key']) for t in effect['targets']],
+        'rows': int(effect['start'].shape[0]),
+        'elapsedMs': int((time.monotonic() - effect['startedAt']) * 1000)
+    }
+
+
+def lighting_engine_stats():
+    """Achieved FPS and dropped frames per backend, plus active effects"""
+    now = time.monotonic()
+    with lighting_engine_lock:
+        backends = {}
+        for name, backend in lighting_engine['backends'].items():
+            recent = [t for t in backend['sentTimes'] if now - t <= 2.0]
+            fps = (len(recent) - 1) / (recent[-1] - recent[0]) if len(recent) > 1 and recent[-1] > recent[0] else 0.0
+            backends[name] = {
+                'maxFps': round(1.0 / backend['interval'], 2),
+                'fps': round(fps, 1),
+                'framesSent': backend['framesSent'],
+                'framesDropped': backend['framesDropped']
+            }
+        return {
+            'running': bool(lighting_engine['effects']),
+            'effects': [_engine_effect_summary(e) for e in lighting_engine['effects'].values()],
+            'backends': backends
+        }
+
+
+def apply_theme(theme_name=None, transition=None, palette=None):
+    """Apply theme to all enabled lighting systems
+
+    transition: optional {'type': 'fade', 'durationMs': 800}; falls back to
+    theme['transition']. Fades run on the effects engine instead of jumping.
+    palette: optional {'dominant', 'accent'} (cover art) applied over the saved
+    theme without changing it; LAN lights take the accent.
+    """
+    theme = config.get('theme', {})
+    
+    if palette:
+        # Temporary theme: the saved theme (name, rgb) stays what the user picked
+        theme = dict(theme, name=theme_name or theme.get('name', 'Default'), rgb=palette['dominant'])
+    elif theme_name:
+        # If theme name provided, look it up or update current theme name
+        theme['name'] = theme_name
+    
+    rgb = theme.get('rgb', {})
+    r, g, b = rgb.get('r', 255), rgb.get('g', 255), rgb.get('b', 255)
+    accent = (palette or {}).get('accent') or rgb
+    lan_r, lan_g, lan_b = accent.get('r', r), accent.get('g', g), accent.get('b', b)
+    brightness = theme.get('brightness', 80)
+    sync_config = theme.get('sync', {})
+    transition = transition if transition is not None else theme.get('transition')
+    
+    results = {
+        'theme': theme['name'],
+        'rgb': rgb,
+        'signalrgb': None,
+        'govee': None,
+        'lan': None
+    }
+    
+    # Fade LAN/Govee devices through the effects engine (throttled per backend)
+    faded = set()
+    if transition and transition.get('type', 'fade') == 'fade' and np is not None:
+        fade_backends = [name for name in ('lan', 'govee') if sync_config.get(name)]
+        accent_fade = 'lan' in fade_backends and (lan_r, lan_g, lan_b) != (r, g, b)
+        if accent_fade:
+            fade_backends.remove('lan')
+        try:
+            if fade_backends:
+                results['transition'] = start_lighting_effect(
+                    'fade', [{'r': r, 'g': g, 'b': b}],
+                    duration_ms=transition.get('durationMs', 800),
+                    backends=fade_backends,
+                    brightness=brightness
+                )
+                faded.update(fade_backends)
+            if accent_fade:
+                results['accentTransition'] = start_lighting_effect(
+                    'fade', [{'r': lan_r, 'g': lan_g, 'b': lan_b}],
+                    duration_ms=transition.get('durationMs', 800),
+                    backends=['lan'],
+                    brightness=brightness
+                )
+                faded.add('lan')
+        except ValueError as e:
+            results['transition'] = {'success': False, 'error': str(e)}
+    
+    # 1. SignalRGB (PC hardware)
+    if sync_config.get('signalrgb'):
+        results['signalrgb'] = set_signalrgb_profile(theme['name'], (r, g, b))
+    
+    # 2. Govee (cloud API) - queue commands, don't execute yet
+    if sync_config.get('govee') and 'govee' in faded:
+        results['govee'] = {'transition': True}
+    elif sync_config.get('govee'):
+        govee_devices = config.get('govee', {}).get('devices', [])
+        enabled_devices = [d for d in govee_devices if d.get('enabled', True)]
+        
+        print(f"\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        print(f"🎨 Queuing {len(enabled_devices)} Govee device(s)")
+        print(f"   Theme: {theme['name']}")
+        print(f"   RGB: ({r}, {g}, {b})")
+        print(f"   Brightness: {brightness}%")
+        print(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        
+        # Clear existing queue and add new commands
+        clear_govee_queue()
+        
+        for device in enabled_devices:
+            queue_govee_command(device, r, g, b, brightness)
+        
+        # Start processing queue in background
+        _kick_govee_queue()
+        
+        results['govee'] = {
+            'queued': len(enabled_devices),
+            'devices': [d.get('name') for d in enabled_devices]
+        }
+    
+    # 3. LAN lights (WLED JSON API); a fade is already driving them over DDP
+    if sync_config.get('lan') and 'lan' in faded:
+        results['lan'] = {'transition': True}
+    elif sync_config.get('lan'):
+        lan_devices = _lan_enabled_devices()
+        if lan_devices:
+            threading.Thread(target=apply_lan_theme, args=(lan_devices, lan_r, lan_g, lan_b, brightness), daemon=True).start()
+            results['lan'] = {
+                'queued': len(lan_devices),
+                'devices': [d.get('name', d.get('ip')) for d in lan_devices]
+            }
+        else:
+            results['lan'] = {'success': False, 'error': 'No LAN lights enabled'}
+    
+    lighting_state_cache['last_theme'] = theme['name']
+    if palette:
+        return results
+
+    # Update last applied timestamp
+    theme['lastUpdated'] = datetime.now().isoformat()
+    save_config()
+    
+    return results
+
+# ============================================================
+# LIGHTING SCHEDULE (one heap-driven timer thread)
+# ============================================================
+
+SCHEDULE_DAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+SCHEDULE_MISFIRE_GRACE_MINUTES = 60
+
+schedule_lock = threading.Lock()
+schedule_wake = threading.Condition(schedule_lock)
+
+# heap of (fire_at epoch, seq, entry_id, version); stale versions are skipped on pop
+schedule_state = {
+    'heap': [],
+    'entries': {},    # entry_id -> entry (from config['schedule'])
+    'versions': {},   # entry_id -> current version
+    'seq': 0,
+    'thread': None
+}
+
+
+def _schedule_parse(entry):
+    """Validate an entry; returns (hour, minute, weekday set) or raises ValueError"""
+    match = re.fullmatch(r'(\d{1,2}):(\d{2})', str(entry.get('at', '')).strip())
+    if not match or int(match.group(1)) > 23 or int(match.group(2)) > 59:
+        raise ValueError('at must be HH:MM (24h)')
+    days = entry.get('days') or SCHEDULE_DAYS
+    if isinstance(days, str):
+        days = {'weekdays': SCHEDULE_DAYS[:5], 'weekends': SCHEDULE_DAYS[5:], 'daily': SCHEDULE_DAYS}.get(days, [days])
+    weekdays = {SCHEDULE_DAYS.index(d[:3].lower()) for d in days if d[:3].lower() in SCHEDULE_DAYS}
+    if not weekdays:
+        raise ValueError('days must name at least one weekday')
+    return int(match.group(1)), int(match.group(2)), weekdays
+
+
+def _schedule_occurrence(entry, reference, direction):
+    """Next (direction=1, strictly after) or previous (direction=-1, at or before) local fire time"""
+    hour, minute, weekdays = _schedule_parse(entry)
+    ref = datetime.fromtimestamp(reference)
+    for offset in range(0, 8):
+        day = ref + timedelta(days=offset * direction)
+        candidate = day.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if candidate.weekday() not in weekdays:
+            continue
+        ts = candidate.timestamp()
+        if (direction > 0 and ts > reference) or (direction < 0 and ts <= reference):
+            return ts
+    return None
+
+
+def _schedule_push(entry_id, fire_at):
+    schedule_state['seq'] += 1
+    heapq.heappush(schedule_state['heap'],
+                   (fire_at, schedule_state['seq'], entry_id, schedule_state['versions'][entry_id]))
+
+
+def rebuild_schedule(now=None):
+    """Load entries from config and rebuild the heap (O(n log n), n = entries)"""
+    now = now if now is not None else time.time()
+    with schedule_lock:
+        schedule_state['heap'] = []
+        schedule_state['entries'] = {}
+        for entry in config.get('schedule', []):
+            if not entry.get('enabled', True) or not entry.get('id'):
+                continue
+            try:
+                fire_at = _schedule_occurrence(entry, now, 1)
+            except ValueError as e:
+                print(f"⚠️  Skipping schedule entry {entry.get('name', entry['id'])}: {e}")
+                continue
+            schedule_state['entries'][entry['id']] = entry
+            schedule_state['versions'][entry['id']] = schedule_state['versions'].get(entry['id'], 0) + 1
+            _schedule_push(entry['id'], fire_at)
+        schedule_wake.notify()
+    return len(schedule_state['entries'])
+
+
+def _schedule_pop_due(now):
+    """Pop every due entry and push its next occurrence; caller holds schedule_lock"""
+    heap = schedule_state['heap']
+    due = []
+    while heap and heap[0][0] <= now:
+        fire_at, _, entry_id, version = heapq.heappop(heap)
+        if schedule_state['versions'].get(entry_id) != version or entry_id not in schedule_state['entries']:
+            continue
+        entry = schedule_state['entries'][entry_id]
+        due.append((fire_at, entry))
+        next_fire = _schedule_occurrence(entry, max(now, fire_at), 1)
+        if next_fire:
+            _schedule_push(entry_id, next_fire)
+    return due
+
+
+def _fire_schedule_entry(entry, fire_at, late=False):
+    """Feed a scheduled scene into the normal theme pipeline"""
+    scene = entry.get('theme', {})
+    theme = config.setdefault('theme', {})
+    if scene.get('rgb'):
+        theme['rgb'] = dict(scene['rgb'])
+    if scene.get('brightness') is not None:
+        theme['brightness'] = scene['brightness']
+    name = scene.get('name') or entry.get('name') or theme.get('name', 'Scheduled')
+
+    print(f"⏰ Schedule: {entry.get('name', entry['id'])} → {name}{' (missed fire)' if late else ''}")
+    entry['lastFiredAt'] = datetime.fromtimestamp(fire_at).isoformat()
+    try:
+        apply_theme(name, transition=entry.get('transition'))  # also persists lastFiredAt
+    except Exception as e:
+        print(f"✗ Schedule entry {entry.get('name', entry['id'])} failed: {e}")
+
+
+def _schedule_catch_up(now):
+    """After a restart, fire the most recent scene missed within the grace window"""
+    grace = _clamp_int(config.get('lighting', {}).get('scheduleMisfireGraceMinutes', SCHEDULE_MISFIRE_GRACE_MINUTES),
+                       0, 24 * 60, SCHEDULE_MISFIRE_GRACE_MINUTES) * 60
+    latest = None
+    for entry in schedule_state['entries'].values():
+        previous = _schedule_occurrence(entry, now, -1)
+        if previous is None or now - previous > grace:
+            continue
+        last_fired = entry.get('lastFiredAt')
+        if last_fired and datetime.fromisoformat(last_fired).timestamp() >= previous:
+            continue
+        if latest is None or previous > latest[0]:
+            latest = (previous, entry)
+    # Scenes override each other, so only the newest missed one matters
+    if latest:
+        _fire_schedule_entry(latest[1], latest[0], late=True)
+
+
+def _schedule_loop():
+    rebuild_schedule()
+    _schedule_catch_up(time.time())
+    while True:
+        with schedule_lock:
+            heap = schedule_state['heap']
+            if not heap:
+                schedule_wake.wait()
+                continue
+            # Wake at the next fire time (capped, so wall-clock jumps are noticed)
+            delay = heap[0][0] - time.time()
+            if delay > 0:
+                schedule_wake.wait(timeout=min(delay, 300))
+                continue
+            due = _schedule_pop_due(time.time())
+        for fire_at, entry in due:
+            _fire_schedule_entry(entry, fire_at)
+
+
+def start_schedule():
+    if schedule_state['thread'] is None or not schedule_state['thread'].is_alive():
+        schedule_state['thread'] = threading.Thread(target=_schedule_loop, daemon=True)
+        schedule_state['thread'].start()
+
+
+def upcoming_schedule(limit=20):
+    """Next firings in time order, from the live heap"""
+    with schedule_lock:
+        live = [item for item in schedule_state['heap']
+                if schedule_state['versions'].get(item[2]) == item[3] and item[2] in schedule_state['entries']]
+        upcoming = heapq.nsmallest(limit, live)
+        return [
+            {
+                'id': entry_id,
+                'name': schedule_state['entries'][entry_id].get('name'),
+                'at': datetime.fromtimestamp(fire_at).isoformat(),
+                'inSeconds': int(fire_at - time.time()),
+                'theme': schedule_state['entries'][entry_id].get('theme', {})
+            }
+            for fire_at, _, entry_id, _ in upcoming
+        ]
+
+
+# ============================================================
+# COVER ART THEMES (dominant/accent color per game)
+# ============================================================
+
+PALETTE_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "seezee_palettes.json")
+COVER_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cover_cache")
+COVER_MAX_BYTES = 8 * 1024 * 1024   # covers are a few hundred KB; refuse anything huge
+
+palette_lock = threading.Lock()
+palette_cache = None  # game_id -> palette, loaded lazily from PALETTE_CACHE_FILE
+
+
+def _load_palette_cache():
+    global palette_cache
+    if palette_cache is None:
+        try:
+            with open(PALETTE_CACHE_FILE, 'r', encoding='utf-8') as f:
+                palette_cache = json.load(f)
+        except (OSError, ValueError):
+            palette_cache = {}
+    return palette_cache
+
+
+def _save_palette_cache():
+    try:
+        tmp_path = PALETTE_CACHE_FILE + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(palette_cache, f, indent=2)
+        os.replace(tmp_path, PALETTE_CACHE_FILE)
+    except Exception as e:
+        print(f"✗ Error saving palette cache: {e}")
+
+
+def _steam_librarycache_images(app_id):
+    """Candidate cover files in Steam's local librarycache (old and new layouts)"""
+    candidates = []
+    for library in find_steam_libraries():
+        librarycache = os.path.join(os.path.dirname(library), 'appcache', 'librarycache')
+        for name in ('library_600x900.jpg', 'header.jpg', 'library_hero.jpg'):
+            candidates.append(os.path.join(librarycache, f'{app_id}_{name}'))
+            candidates.append(os.path.join(librarycache, str(app_id), name))
+    return candidates
+
+
+def _find_cover_image(game):
+    """Local cover file for a game: Steam librarycache first, then our download cache
+
+    game must be a library entry (collect_library_games), never request data:
+    its coverImage is the only URL fetched.
+    """
+    app_id = game.get('steamAppId')
+    if app_id:
+        for path in _steam_librarycache_images(app_id):
+            if os.path.isfile(path):
+                return path
+
+    url = game.get('coverImage')
+    if not url:
+        return None
+    cached = os.path.join(COVER_CACHE_DIR, hashlib.md5(url.encode()).hexdigest() + '.img')
+    if os.path.isfile(cached):
+        return cached
+
+    tmp_path = cached + '.part'
+    try:
+        import requests
+        with requests.get(url, timeout=10, stream=True) as response:
+            if response.status_code != 200:
+                return None
+            content_type = response.headers.get('Content-Type', '')
+            if not content_type.startswith('image/'):
+                print(f"✗ Cover for {game.get('id')} is not an image ({content_type or 'no content type'})")
+                return None
+            os.makedirs(COVER_CACHE_DIR, exist_ok=True)
+            size = 0
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(64 * 1024):
+                    size += len(chunk)
+                    if size > COVER_MAX_BYTES:
+                        raise ValueError(f'cover larger than {COVER_MAX_BYTES // (1024 * 1024)} MB')
+                    f.write(chunk)
+        os.replace(tmp_path, cached)
+        return cached
+    except Exception as e:
+        print(f"✗ Cover download failed for {game.get('id')}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return None
+
+
+def extract_palette(image_path, clusters=5, iterations=8):
+    """Dominant and accent colors via k-means on a 64x64 thumbnail
+
+    Dominant favours big, saturated clusters; accent is the most saturated
+    remaining cluster that is clearly distinct from the dominant one.
+    """
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        img = img.convert('RGB')
+        img.thumbnail((64, 64))
+        pixels = np.asarray(img, dtype=np.float32).reshape(-1, 3)
+
+    # Near-black and near-white pixels (letterboxing, logos) say little about the mood
+    luma = pixels @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    keep = (luma > 20) & (luma < 240)
+    if keep.sum() >= clusters * 4:
+        pixels = pixels[keep]
+
+    # Deterministic init: spread seeds along the luma ordering
+    order = np.argsort(pixels @ np.array([0.299, 0.587, 0.114], dtype=np.float32))
+    centers = pixels[order[np.linspace(0, len(order) - 1, clusters).astype(np.intp)]].copy()
+    for _ in range(iterations):
+        distances = ((pixels[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        counts = np.bincount(labels, minlength=clusters)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, pixels)
+        nonempty = counts > 0
+        centers[nonempty] = sums[nonempty] / counts[nonempty, None]
+
+    maxc = centers.max(axis=1)
+    minc = centers.min(axis=1)
+    saturation = np.where(maxc > 0, (maxc - minc) / np.maximum(maxc, 1e-6), 0.0)
+    share = counts / max(1, counts.sum())
+    dominant = int(np.argmax(share * (saturation + 0.15)))
+
+    distinct = ((centers - centers[dominant]) ** 2).sum(axis=1) > 60.0 ** 2
+    distinct[dominant] = False
+    accent = int(np.argmax(np.where(distinct, saturation * (share > 0.02), -1.0))) if distinct.any() else dominant
+
+    def as_rgb(index):
+        r, g, b = (int(round(v)) for v in centers[index])
+        return {'r': r, 'g': g, 'b': b}
+
+    return {'dominant': as_rgb(dominant), 'accent': as_rgb(accent)}
+
+
+def get_game_palette(game, force=False):
+    """Memoized palette for a game; extraction runs at most once per game ID"""
+    game_id = game.get('id') or (f"steam_{game['steamAppId']}" if game.get('steamAppId') else None)
+    if not game_id:
+        return None
+
+    with palette_lock:
+        cached = _load_palette_cache().get(game_id)
+    # Palettes cached before accents were extracted are redone once
+    if cached and 'accent' in cached and not force:
+        return cached
+
+    if np is None:
+        return None
+    image_path = _find_cover_image(game)
+    if not image_path:
+        return None
+
+    try:
+        palette = extract_palette(image_path)
+    except ImportError:
+        print("⚠️  Cover art themes need Pillow: pip install pillow")
+        return None
+    except Exception as e:
+        print(f"✗ Palette extraction failed for {game_id}: {e}")
+        return None
+
+    palette['source'] = os.path.basename(image_path)
+    palette['extractedAt'] = _now_iso()
+    with palette_lock:
+        _load_palette_cache()[game_id] = palette
+        _save_palette_cache()
+    return palette
+
+
+def find_library_game(game_id=None, steam_app_id=None):
+    """Library entry matching a game id or Steam app ID, else None"""
+    games, _, _ = collect_library_games()
+    for game in games:
+        if game_id and game.get('id') == game_id:
+            return game
+        if steam_app_id and str(game.get('steamAppId')) == str(steam_app_id):
+            return game
+    return None
+
+
+def apply_game_theme(game):
+    """Theme the room from a library game's cover art, leaving the saved theme as is"""
+    title = game.get('title') or game.get('id')
+    palette = get_game_palette(game)
+    if not palette:
+        print(f"⚠️  No cover art for {title}; theme unchanged")
+        return {'success': False, 'error': 'No cover art palette'}
+
+    print(f"🎨 Cover art theme for {title}: {palette['dominant']} / accent {palette.get('accent')}")
+    return apply_theme(f"{title} (cover art)", palette=palette)
+
+
+def apply_launch_theme(game_id, steam_app_id):
+    """Background job for a launch: resolve the game in the library, then theme from its art"""
+    game = find_library_game(game_id, steam_app_id)
+    if game is None:
+        print(f"⚠️  Cover art theme skipped: {game_id or steam_app_id} is not in the library")
+        return {'success': False, 'error': 'Game not in library'}
+    return apply_game_theme(game)
+
+
+def precompute_library_palettes():
+    """Batch job: extract palettes for every game in the library that lacks one"""
+    games, _, _ = collect_library_games()
+    computed = 0
+    skipped = 0
+    for game in games:
+        with palette_lock:
+            known = game.get('id') in _load_palette_cache()
+        if known:
+            skipped += 1
+            continue
+        if get_game_palette(game):
+            computed += 1
+    print(f"✓ Palettes: {computed} extracted, {skipped} already cached, {len(games)} games")
+    return {'success': True, 'computed': computed, 'cached': skipped, 'games': len(games)}
+
+
+# ============================================================
+# DEVICE AGENTS (concurrent /stats polling with per-agent health)
+# ============================================================
+
+AGENT_TIMEOUT_SECONDS = 2.0         # per-agent budget for a healthy agent
+AGENT_PROBE_TIMEOUT_SECONDS = 0.5   # budget when re-probing an agent marked offline
+AGENT_POLL_DEADLINE_SECONDS = 2.5   # whole fleet, regardless of agent count
+AGENT_OFFLINE_BACKOFF = (5.0, 60.0)  # fast-fail window after a failure: base, max
+
+agent_health_lock = threading.Lock()
+agent_health = {}   # device_id -> {'online', 'failures', 'retryAt', 'lastSeen', 'latencyMs', 'lastError'}
+
+
+def _device_id(device):
+    return device.get('id') or f"{device.get('name', 'device')}-{device.get('ip', 'unknown')}"
+
+
+def _agent_record(device_id, online, latency_ms=None, error=None):
+    """Track agent health; repeated failures widen the fast-fail window"""
+    now = time.time()
+    with agent_health_lock:
+        health = agent_health.setdefault(device_id, {
+            'online': False, 'failures': 0, 'retryAt': 0.0, 'lastSeen': None, 'latencyMs': None, 'lastError': None
+        })
+        if online:
+            health.update({'online': True, 'failures': 0, 'retryAt': 0.0, 'lastSeen': now,
+                           'latencyMs': latency_ms, 'lastError': None})
+        else:
+            health['failures'] += 1
+            base, cap = AGENT_OFFLINE_BACKOFF
+            health.update({'online': False, 'lastError': error,
+                           'retryAt': now + min(cap, base * 2 ** (health['failures'] - 1))})
+        return dict(health)
+
+
+def _fetch_agent_stats(device, timeout):
+    import requests
+
+    started = time.monotonic()
+    url = f"http://{device.get('ip')}:{device.get('port', 5050)}/stats"
+    # Optional field selection (e.g. "cpu,memory,gpu") so the agent only samples what we show
+    monitoring = config.get('monitoring', {}) if isinstance(config.get('monitoring'), dict) else {}
+    fields = device.get('fields') or monitoring.get('fields')
+    params = {'fields': ','.join(fields) if isinstance(fields, list) else fields} if fields else None
+    try:
+        response = requests.get(url, params=params, timeout=(min(timeout, 1.0), timeout))
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        stats = response.json()
+    except Exception as e:
+        _agent_record(_device_id(device), False, error=str(e))
+        raise
+    _agent_record(_device_id(device), True, latency_ms=int((time.monotonic() - started) * 1000))
+    return stats
+
+
+def _device_info(device):
+    return {
+        'id': _device_id(device),
+        'name': device.get('name', 'Unknown Device'),
+        'type': device.get('type', 'pc'),
+        'ip': device.get('ip', '0.0.0.0'),
+        'online': False,
+        'stats': None
+    }
+
+
+def poll_agents(devices, deadline=None):
+    """Fetch /stats from every monitored agent concurrently under one deadline
+
+    Agents that failed recently are not contacted until their backoff expires,
+    then get a short probe budget; healthy agents get their own timeoutMs
+    (default AGENT_TIMEOUT_SECONDS), capped by the deadline.
+    """
+    monitoring = config.get('monitoring', {}) if isinstance(config.get('monitoring'), dict) else {}
+    if deadline is None:
+        deadline = _clamp_int(monitoring.get('deadlineMs'), 200, 30000, int(AGENT_POLL_DEADLINE_SECONDS * 1000)) / 1000.0
+    now = time.time()
+    results = []
+    futures = {}
+
+    for device in devices:
+        info = _device_info(device)
+        results.append(info)
+        if not device.get('monitorStats', True):
+            continue
+
+        with agent_health_lock:
+            health = dict(agent_health.get(info['id'], {}))
+        if health.get('failures') and now < health.get('retryAt', 0):
+            info['error'] = health.get('lastError')
+            info['retryInSeconds'] = round(health['retryAt'] - now, 1)
+            continue
+
+        if health.get('failures'):
+            timeout = AGENT_PROBE_TIMEOUT_SECONDS
+        else:
+            timeout = _clamp_int(device.get('timeoutMs'), 100, 30000, int(AGENT_TIMEOUT_SECONDS * 1000)) / 1000.0
+        futures[info['id']] = (info, fanout_pool.submit(_fetch_agent_stats, device, min(timeout, deadline)))
+
+    if futures:
+        wait_futures([f for _, f in futures.values()], timeout=deadline)
 
-    headers = {
-        'Govee-API-Key': api_key,
-        'Content-Type': 'application/json'
-    }
+    for device_id, (info, future) in futures.items():
+        if not future.done():
+            info['error'] = f"No response within {int(deadline * 1000)} ms"
+            continue
+        if future.exception() is not None:
+            info['error'] = str(future.exception())
+            continue
+        info['online'] = True
+        info['stats'] = future.result()
+        with agent_health_lock:
+            info['latencyMs'] = agent_health.get(device_id, {}).get('latencyMs')
 
-    return requests.get(
-        'https://developer-api.govee.com/v1/devices',
-        headers=headers,
-        timeout=10
-    )
+    return results
+
+
+# Fleet collector: one thread samples every enabled agent (and this PC) on a
+# fixed cadence; endpoints read the latest snapshot instead of polling agents.
+FLEET_SAMPLE_SECONDS = 2.0
+FLEET_TRANSITIONS_MAX = 200
+
+fleet_lock = threading.Lock()
+fleet_wake = threading.Event()
+fleet_state = {
+    'devices': {},          # device_id -> {'info', 'sampledAt', 'sampledAtIso'}
+    'hub': None,            # {'stats' | 'error', 'sampledAt', 'sampledAtIso'}
+    'transitions': deque(maxlen=FLEET_TRANSITIONS_MAX),
+    'samples': 0,
+    'thread': None,
+    'ready': threading.Event()
+}
+
+
+def _fleet_interval():
+    monitoring = config.get('monitoring', {}) if isinstance(config.get('monitoring'), dict) else {}
+    return _clamp_int(monitoring.get('intervalMs'), 500, 60000, int(FLEET_SAMPLE_SECONDS * 1000)) / 1000.0
+
+
+def _fleet_store(devices, info, now, now_iso):
+    """Store one device sample (caller holds fleet_lock), logging online/offline changes"""
+    before = fleet_state['devices'].get(info['id'])
+    if before is None or before['info']['online'] != info['online']:
+        fleet_state['transitions'].append({
+            'id': info['id'],
+            'name': info['name'],
+            'online': info['online'],
+            'at': now_iso
+        })
+    devices[info['id']] = {'info': info, 'sampledAt': now, 'sampledAtIso': now_iso}
+
+
+def sample_fleet():
+    """One collector pass: agents not pushing telemetry concurrently, plus this PC"""
+    devices = [d for d in config.get('devices', []) if d.get('enabled', True)]
+    pushing = telemetry_fresh_ids()
+    # Pushing agents still get an occasional full poll for what the datagram lacks
+    refresh = telemetry_refresh_due(pushing, time.time())
+    results = poll_agents([d for d in devices if _device_id(d) not in pushing or _device_id(d) in refresh])
+    now = time.time()
+    now_iso = _now_iso()
+
+    for info in results:
+        if not info['online']:
+            missed = telemetry_missed(info['id'], now)
+            if missed:
+                info['error'] = f"{missed} ({info['error']})" if info.get('error') else missed
 
-def set_signalrgb_profile(theme_name):
-    """Switch SignalRGB profile based on theme"""
-    signalrgb_config = config.get('signalrgb', {})
-    
-    if not signalrgb_config.get('enabled'):
-        return {'success': False, 'error': 'SignalRGB not enabled'}
-    
-    exec_path = signalrgb_config.get('execPath', '')
-    if not os.path.exists(exec_path):
-        return {'success': False, 'error': 'SignalRGB executable not found'}
-    
-    profiles = signalrgb_config.get('profiles', {})
-    profile_name = profiles.get(theme_name)
-    
-    if not profile_name:
-        print(f"⚠️  No SignalRGB profile mapped for theme: {theme_name}")
-        return {'success': False, 'error': f'No profile for theme {theme_name}'}
-    
     try:
-        # Launch SignalRGB with profile switch
-        subprocess.Popen(
-            [exec_path, '--profile', profile_name],
-            shell=False,
-            creationflags=subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP if WINDOWS else 0,
-            start_new_session=not WINDOWS
-        )
-        print(f"✓ SignalRGB: Switched to profile '{profile_name}'")
-        return {'success': True, 'profile': profile_name}
+        hub_sample = {'stats': collect_hub_stats()}
+    except ImportError:
+        hub_sample = {'error': 'psutil not installed. Run: pip install psutil'}
     except Exception as e:
-        print(f"✗ SignalRGB error: {e}")
-        return {'success': False, 'error': str(e)}
+        hub_sample = {'error': str(e)}
+    hub_sample.update({'sampledAt': now, 'sampledAtIso': now_iso})
+
+    with fleet_lock:
+        previous = fleet_state['devices']
+        # Pushing agents keep the entry their last datagram wrote
+        current = {i: previous[i] for i in pushing if i in previous}
+        for info in results:
+            if info['id'] in pushing:
+                if not info['online']:
+                    continue   # datagrams still arriving: a failed refresh doesn't make it offline
+                pushed = previous.get(info['id'], {}).get('info', {})
+                info = dict(info, transport='udp', telemetry=pushed.get('telemetry'))
+            _fleet_store(current, info, now, now_iso)
+        fleet_state['devices'] = current
+        fleet_state['hub'] = hub_sample
+        fleet_state['samples'] += 1
+    for info in results:
+        # Pushing agents' history comes from their datagrams
+        if info['online'] and isinstance(info['stats'], dict) and info['id'] not in pushing:
+            record_fleet_history(info['id'], now, info['stats'])
+    if 'stats' in hub_sample:
+        record_fleet_history(HUB_HISTORY_ID, now, hub_sample['stats'])
+    fleet_state['ready'].set()
+
+
+def _fleet_collector_loop():
+    next_run = time.monotonic()
+    while True:
+        try:
+            sample_fleet()
+        except Exception as e:
+            print(f"[Fleet] Sample failed: {e}")
+        next_run += _fleet_interval()
+        delay = next_run - time.monotonic()
+        if delay < 0:
+            # A slow pass: keep the cadence instead of bunching samples
+            next_run = time.monotonic()
+            delay = 0
+        if fleet_wake.wait(timeout=delay):
+            fleet_wake.clear()
+            next_run = time.monotonic()
+
+
+def start_fleet_collector():
+    with fleet_lock:
+        thread = fleet_state['thread']
+        if thread is None or not thread.is_alive():
+            fleet_state['thread'] = threading.Thread(target=_fleet_collector_loop, daemon=True)
+            fleet_state['thread'].start()
+
+
+def fleet_snapshot(wait=AGENT_POLL_DEADLINE_SECONDS + 0.5):
+    """Latest collector results; the first caller waits for the first pass"""
+    start_fleet_collector()
+    if not fleet_state['ready'].is_set():
+        fleet_state['ready'].wait(timeout=wait)
+    with fleet_lock:
+        return {
+            'devices': dict(fleet_state['devices']),
+            'hub': fleet_state['hub'],
+            'transitions': list(fleet_state['transitions'])
+        }
 
-def process_govee_queue():
-    """Process Govee commands one at a time from the queue"""
-    global govee_queue_processing
-    
-    if govee_queue_processing or not govee_queue:
-        return
-    
-    govee_queue_processing = True
-    
-    while govee_queue:
-        cmd = govee_queue.pop(0)
-        device = cmd['device']
-        r, g, b = cmd['r'], cmd['g'], cmd['b']
-        brightness = cmd.get('brightness')
-        device_name = device.get('name', 'Unknown')
-        
-        print(f"\n🎨 Processing queue: {device_name}")
-        print(f"   RGB: ({r}, {g}, {b}) @ {brightness}%")
-        
-        # Execute the command
-        result = set_govee_color(device, r, g, b, brightness)
-        
-        # Log result
-        if result.get('success'):
-            print(f"✓ {device_name} updated successfully")
+
+# ============================================================
+# FLEET HISTORY (columnar ring buffers + optional SQLite rollups)
+# ============================================================
+
+FLEET_HISTORY_SECONDS = 3600
+FLEET_HISTORY_METRICS = ('cpu', 'memory', 'gpu', 'gpuTemp', 'netSent', 'netRecv')
+HISTORY_DB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "seezee_history.sqlite3")
+HISTORY_ROLLUPS = ((60, 86400), (3600, 7 * 86400))   # (bucket seconds, retention seconds)
+HISTORY_RANGES = {'15m': 900, '1h': 3600, '6h': 6 * 3600, '24h': 86400, '7d': 7 * 86400}
+HUB_HISTORY_ID = 'hub'
+
+# device_id -> {'times': array('d'), 'values': {metric: array('f')}, 'head', 'count', 'capacity'}
+fleet_history_lock = threading.Lock()
+fleet_history = {}
+history_db_lock = threading.Lock()
+history_db_state = {'conn': None, 'minuteDone': None, 'thread': None}
+
+
+def _history_values(stats):
+    """Chartable numbers from an agent (or hub) stats payload; NaN when absent"""
+    def number(value):
+        return float(value) if isinstance(value, (int, float)) else float('nan')
+
+    gpu = stats.get('gpu') if isinstance(stats.get('gpu'), dict) else {}
+    network = stats.get('network') or {}
+    return {
+        'cpu': number((stats.get('cpu') or {}).get('usage')),
+        'memory': number((stats.get('memory') or {}).get('percent')),
+        'gpu': number(gpu.get('usage')),
+        'gpuTemp': number(gpu.get('temp')),
+        'netSent': number(network.get('sentRate')),
+        'netRecv': number(network.get('recvRate'))
+    }
+
+
+def record_fleet_history(device_id, at, stats):
+    with fleet_history_lock:
+        ring = fleet_history.get(device_id)
+        if ring is None:
+            capacity = int(FLEET_HISTORY_SECONDS / max(0.5, _fleet_interval()))
+            ring = {
+                'times': array('d', bytes(8 * capacity)),
+                'values': {m: array('f', [float('nan')]) * capacity for m in FLEET_HISTORY_METRICS},
+                'head': 0,
+                'count': 0,
+                'capacity': capacity
+            }
+            fleet_history[device_id] = ring
+        slot = ring['head']
+        ring['times'][slot] = at
+        for metric, value in _history_values(stats).items():
+            ring['values'][metric][slot] = value
+        ring['head'] = (slot + 1) % ring['capacity']
+        ring['count'] = min(ring['count'] + 1, ring['capacity'])
+
+
+def history_raw(device_id, metric, since):
+    """(times, values) oldest first for samples after since; NumPy arrays when available"""
+    with fleet_history_lock:
+        ring = fleet_history.get(device_id)
+        if ring is None:
+            return [], []
+        capacity, count, head = ring['capacity'], ring['count'], ring['head']
+        start = (head - count) % capacity
+        if np is not None:
+            times = np.frombuffer(ring['times'], dtype=np.float64)
+            values = np.frombuffer(ring['values'][metric], dtype=np.float32)
+            order = (start + np.arange(count)) % capacity
+            times, values = times[order], values[order].astype(np.float64)   # copies, safe after unlock
+            keep = times > since
+            return times[keep], values[keep]
+        order = [(start + i) % capacity for i in range(count)]
+        samples = [(ring['times'][i], ring['values'][metric][i]) for i in order if ring['times'][i] > since]
+    return [t for t, _ in samples], [v for _, v in samples]
+
+
+def lttb(times, values, threshold):
+    """Largest-Triangle-Three-Buckets: keep the points that preserve the chart's shape
+
+    Vectorized per bucket with NumPy (pure Python otherwise). NaN gaps are
+    dropped first. Returns (times, values) with at most threshold points.
+    """
+    if np is not None:
+        times = np.asarray(times, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        keep = ~np.isnan(values)
+        times, values = times[keep], values[keep]
+        n = len(times)
+        if threshold >= n or threshold < 3:
+            return times.tolist(), values.tolist()
+
+        # Bucket edges over the interior points; the last "next bucket" is the final point
+        edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+        counts = np.diff(np.append(edges, n))
+        avg_t = np.add.reduceat(times, edges) / counts
+        avg_v = np.add.reduceat(values, edges) / counts
+        selected = [0]
+        a = 0
+        edge_list = edges.tolist()
+        for i in range(threshold - 2):
+            lo, hi = edge_list[i], edge_list[i + 1]
+            ta, va = times[a], values[a]
+            area = np.abs((ta - avg_t[i + 1]) * (values[lo:hi] - va) - (ta - times[lo:hi]) * (avg_v[i + 1] - va))
+            a = lo + int(area.argmax())
+            selected.append(a)
+        selected.append(n - 1)
+        return times[selected].tolist(), values[selected].tolist()
+
+    points = [(t, v) for t, v in zip(times, values) if v == v]
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return [t for t, _ in points], [v for _, v in points]
+    every = (n - 2) / (threshold - 2)
+    sampled = [points[0]]
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = int(i * every) + 1, int((i + 1) * every) + 1
+        next_lo, next_hi = hi, min(int((i + 2) * every) + 1, n)
+        window = points[next_lo:next_hi] or [points[-1]]
+        avg_t = sum(t for t, _ in window) / len(window)
+        avg_v = sum(v for _, v in window) / len(window)
+        at, av = points[a]
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((at - avg_t) * (points[j][1] - av) - (at - points[j][0]) * (avg_v - av))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return [t for t, _ in sampled], [v for _, v in sampled]
+
+
+def minmax_buckets(times, mins, maxs, buckets):
+    """Per-bucket min and max (keeps spikes that averaging would hide)"""
+    series = {'t': [], 'min': [], 'max': []}
+    n = len(times)
+    if n == 0:
+        return series
+    buckets = max(1, min(buckets, n))
+    if np is not None:
+        times, mins, maxs = (np.asarray(x, dtype=np.float64) for x in (times, mins, maxs))
+        edges = np.linspace(0, n, buckets + 1).astype(np.intp)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)   # all-NaN buckets
+            low = np.fmin.reduceat(mins, edges[:-1])
+            high = np.fmax.reduceat(maxs, edges[:-1])
+        series['t'] = times[edges[1:] - 1].tolist()
+        series['min'] = [None if x != x else round(x, 2) for x in low.tolist()]
+        series['max'] = [None if x != x else round(x, 2) for x in high.tolist()]
+        return series
+    size = n / buckets
+    for b in range(buckets):
+        lo, hi = int(b * size), int((b + 1) * size)
+        low = [x for x in mins[lo:hi] if x == x]
+        high = [x for x in maxs[lo:hi] if x == x]
+        series['t'].append(times[hi - 1])
+        series['min'].append(round(min(low), 2) if low else None)
+        series['max'].append(round(max(high), 2) if high else None)
+    return series
+
+
+def _history_db_enabled():
+    monitoring = config.get('monitoring', {}) if isinstance(config.get('monitoring'), dict) else {}
+    return bool(monitoring.get('historyDb'))
+
+
+def _history_db():
+    """Lazily opened rollup database (caller holds history_db_lock)"""
+    if history_db_state['conn'] is None:
+        import sqlite3
+
+        conn = sqlite3.connect(HISTORY_DB_FILE, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rollup (
+                device TEXT NOT NULL, metric TEXT NOT NULL, resolution INTEGER NOT NULL, ts INTEGER NOT NULL,
+                min REAL, max REAL, avg REAL,
+                PRIMARY KEY (device, metric, resolution, ts)
+            ) WITHOUT ROWID
+        """)
+        history_db_state['conn'] = conn
+    return history_db_state['conn']
+
+
+def rollup_fleet_history(now=None):
+    """Fold completed minutes of raw samples into 1m rows, completed hours into 1h rows, expire old rows"""
+    now = time.time() if now is None else now
+    minute_end = int(now // 60 * 60)
+    minute_start = history_db_state['minuteDone']
+    if minute_start is None:
+        minute_start = minute_end - 60
+    if minute_end <= minute_start:
+        return 0
+
+    rows = []
+    with fleet_history_lock:
+        device_ids = list(fleet_history)
+    for device_id in device_ids:
+        for metric in FLEET_HISTORY_METRICS:
+            times, values = history_raw(device_id, metric, minute_start - 1e-6)
+            buckets = {}
+            for t, v in zip(times, values):
+                if minute_start <= t < minute_end and v == v:
+                    buckets.setdefault(int(t // 60 * 60), []).append(float(v))
+            for ts, vals in buckets.items():
+                rows.append((device_id, metric, 60, ts, min(vals), max(vals), sum(vals) / len(vals)))
+
+    with history_db_lock:
+        conn = _history_db()
+        conn.executemany('INSERT OR REPLACE INTO rollup VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        hour_start, hour_end = minute_start // 3600 * 3600, minute_end // 3600 * 3600
+        if hour_end > hour_start:
+            # Crossed an hour boundary: roll the completed hour(s) up from the minute rows
+            conn.execute("""
+                INSERT OR REPLACE INTO rollup
+                SELECT device, metric, 3600, (ts / 3600) * 3600, MIN(min), MAX(max), AVG(avg)
+                FROM rollup WHERE resolution = 60 AND ts >= ? AND ts < ?
+                GROUP BY device, metric, ts / 3600
+            """, (hour_start, hour_end))
+        for resolution, retention in HISTORY_ROLLUPS:
+            conn.execute('DELETE FROM rollup WHERE resolution = ? AND ts < ?', (resolution, now - retention))
+        conn.commit()
+    history_db_state['minuteDone'] = minute_end
+    return len(rows)
+
+
+def _history_rollup_loop():
+    while True:
+        # Just after each minute boundary, once the collector has stored that minute's samples
+        time.sleep(60 - time.time() % 60 + 2)
+        if not _history_db_enabled():
+            continue
+        try:
+            rollup_fleet_history()
+        except Exception as e:
+            print(f"[History] Rollup failed: {e}")
+
+
+def start_history_rollups():
+    if history_db_state['thread'] is None:
+        history_db_state['thread'] = threading.Thread(target=_history_rollup_loop, daemon=True)
+        history_db_state['thread'].start()
+
+
+def query_fleet_history(device_id, metric, seconds, width, mode):
+    """Chart-ready series for one device metric: raw ring for the last hour, rollups beyond"""
+    since = time.time() - seconds
+    with fleet_history_lock:
+        ring = fleet_history.get(device_id)
+        raw_span = ring['capacity'] * _fleet_interval() if ring else 0
+
+    if seconds <= raw_span or not _history_db_enabled():
+        times, values = history_raw(device_id, metric, since)
+        source = 'raw'
+        mins = maxs = values
+    else:
+        resolution = 60 if seconds <= HISTORY_ROLLUPS[0][1] else 3600
+        with history_db_lock:
+            rows = _history_db().execute(
+                'SELECT ts, min, max, avg FROM rollup WHERE device = ? AND metric = ? AND resolution = ? AND ts >= ? ORDER BY ts',
+                (device_id, metric, resolution, since)
+            ).fetchall()
+        times = [r[0] for r in rows]
+        mins, maxs, values = [r[1] for r in rows], [r[2] for r in rows], [r[3] for r in rows]
+        source = f"rollup-{'1m' if resolution == 60 else '1h'}"
+
+    result = {'source': source, 'points': len(times), 'truncated': seconds > raw_span and source == 'raw'}
+    if mode == 'minmax':
+        result.update(minmax_buckets(times, mins, maxs, width))
+    else:
+        t, v = lttb(times, values, width)
+        result.update({'t': t, 'v': [round(x, 2) for x in v]})
+    return result
+
+
+# ============================================================
+# DEVICE TELEMETRY (UDP push from agents)
+# ============================================================
+
+# Agents started with SEEZEE_HUB_TELEMETRY push one fixed-layout datagram per
+# interval (see seezee_telemetry); the receiver merges it into the device's
+# last full /stats snapshot and the collector stops polling that agent over
+# HTTP until TELEMETRY_MISSED_HEARTBEATS intervals pass without a datagram.
+# The datagram only carries the fast-changing metrics, so the collector still
+# fetches a full snapshot every TELEMETRY_FULL_REFRESH_SECONDS.
+TELEMETRY_MISSED_HEARTBEATS = 3
+TELEMETRY_FULL_REFRESH_SECONDS = 60.0
+TELEMETRY_REORDER_WINDOW = 64   # a seq this far behind (same boot) is a late datagram, not a restart
+
+telemetry_lock = threading.Lock()
+telemetry_state = {
+    'agents': {},           # device_id -> {'host', 'boot', 'ip', 'seq', 'intervalMs', 'lastAt', 'fullAt',
+                            #               'received', 'lost', 'late', 'restarts'}
+    'hosts': {},            # host hash -> device_id (agents keep their id across IP changes)
+    'received': 0,
+    'rejected': 0,          # malformed datagrams or unknown senders
+    'port': None,
+    'error': None,
+    'thread': None
+}
+
+
+def _telemetry_config():
+    monitoring = config.get('monitoring', {}) if isinstance(config.get('monitoring'), dict) else {}
+    port = _clamp_int(monitoring.get('telemetryPort'), 1, 65535, seezee_telemetry.TELEMETRY_PORT)
+    return bool(monitoring.get('telemetry', False)), port
+
+
+def _telemetry_device(host_id, ip):
+    """Configured device a datagram belongs to: known host hash first, then source IP"""
+    devices = {_device_id(d): d for d in config.get('devices', []) if d.get('enabled', True)}
+    with telemetry_lock:
+        device_id = telemetry_state['hosts'].get(host_id)
+    if device_id in devices:
+        return devices[device_id]
+    for device_id, device in devices.items():
+        if device.get('ip') == ip:
+            with telemetry_lock:
+                telemetry_state['hosts'][host_id] = device_id
+            return device
+    return None
+
+
+def _telemetry_sequence(device_id, header, ip, now):
+    """Update per-agent sequence tracking; False for duplicates and late datagrams"""
+    with telemetry_lock:
+        agent = telemetry_state['agents'].get(device_id)
+        if agent is None or agent['host'] != header['host']:
+            agent = {'host': header['host'], 'boot': header['boot'], 'seq': header['seq'], 'fullAt': 0.0,
+                     'received': 0, 'lost': 0, 'late': 0, 'restarts': 0}
+            telemetry_state['agents'][device_id] = agent
+        elif agent['boot'] != header['boot']:
+            # New boot nonce: the agent restarted and its seq began again
+            agent['restarts'] += 1
+            agent['boot'] = header['boot']
+            agent['seq'] = header['seq']
         else:
-            print(f"✗ {device_name} failed: {result.get('error')}")
-        
-        # Wait 1.1 seconds before next command (Govee rate limit safety)
-        if govee_queue:  # Only wait if more commands remain
-            print(f"⏱️  Waiting 1.1s before next command... ({len(govee_queue)} remaining)")
-            time.sleep(1.1)
-    
-    govee_queue_processing = False
-    print(f"\n✓ Queue completed\n")
+            gap = (header['seq'] - agent['seq']) & 0xFFFFFFFF
+            if gap == 0:
+                return False
+            behind = 0x100000000 - gap
+            if gap >= 0x80000000 and behind <= TELEMETRY_REORDER_WINDOW:
+                # Reordered in flight: counted as lost when the newer one arrived; its data is older
+                agent['late'] += 1
+                agent['lost'] = max(0, agent['lost'] - 1)
+                return False
+            if gap >= 0x80000000:
+                # Far behind with the same boot nonce: treat as a restart rather than guess
+                agent['restarts'] += 1
+            else:
+                agent['lost'] += gap - 1
+            agent['seq'] = header['seq']
+        agent.update({'ip': ip, 'intervalMs': header['intervalMs'], 'lastAt': now})
+        agent['received'] += 1
+        return dict(agent)
 
-def queue_govee_command(device, r, g, b, brightness=None):
-    """Add a Govee command to the queue"""
-    global govee_queue
-    
-    device_name = device.get('name', 'Unknown')
-    print(f"📝 Queued: {device_name} → RGB({r},{g},{b}) @ {brightness}%")
-    
-    govee_queue.append({
-        'device': device,
-        'r': r,
-        'g': g,
-        'b': b,
-        'brightness': brightness
-    })
 
-def apply_theme(theme_name=None):
-    """Apply theme to all enabled lighting systems"""
-    theme = config.get('theme', {})
-    
-    if theme_name:
-        # If theme name provided, look it up or update current theme name
-        theme['name'] = theme_name
-    
-    rgb = theme.get('rgb', {})
-    r, g, b = rgb.get('r', 255), rgb.get('g', 255), rgb.get('b', 255)
-    brightness = theme.get('brightness', 80)
-    sync_config = theme.get('sync', {})
-    
-    results = {
-        'theme': theme['name'],
-        'rgb': rgb,
-        'signalrgb': None,
-        'govee': None,
-        'lan': None
+def _telemetry_summary(agent):
+    total = agent['received'] + agent['lost']
+    return {
+        'seq': agent['seq'],
+        'intervalMs': agent['intervalMs'],
+        'received': agent['received'],
+        'lost': agent['lost'],
+        'lossRate': round(agent['lost'] / total, 4) if total else 0.0,
+        'late': agent['late'],
+        'restarts': agent['restarts']
     }
-    
-    # 1. SignalRGB (PC hardware)
-    if sync_config.get('signalrgb'):
-        results['signalrgb'] = set_signalrgb_profile(theme['name'])
-    
-    # 2. Govee (cloud API) - queue commands, don't execute yet
-    if sync_config.get('govee'):
-        govee_devices = config.get('govee', {}).get('devices', [])
-        enabled_devices = [d for d in govee_devices if d.get('enabled', True)]
-        
-        print(f"\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
-        print(f"🎨 Queuing {len(enabled_devices)} Govee device(s)")
-        print(f"   Theme: {theme['name']}")
-        print(f"   RGB: ({r}, {g}, {b})")
-        print(f"   Brightness: {brightness}%")
-        print(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
-        
-        # Clear existing queue and add new commands
-        global govee_queue
-        govee_queue.clear()
-        
-        for device in enabled_devices:
-            queue_govee_command(device, r, g, b, brightness)
-        
-        # Start processing queue in background
-        import threading
-        threading.Thread(target=process_govee_queue, daemon=True).start()
-        
-        results['govee'] = {
-            'queued': len(enabled_devices),
-            'devices': [d.get('name') for d in enabled_devices]
+
+
+def receive_telemetry(data, addr):
+    """Apply one datagram to the fleet snapshot; False when it was rejected"""
+    parsed = seezee_telemetry.unpack(data)
+    device = _telemetry_device(parsed[0]['host'], addr[0]) if parsed else None
+    if device is None:
+        with telemetry_lock:
+            telemetry_state['rejected'] += 1
+        return False
+    header, stats = parsed
+    now = time.time()
+    agent = _telemetry_sequence(_device_id(device), header, addr[0], now)
+    if not agent:
+        return True
+    with telemetry_lock:
+        telemetry_state['received'] += 1
+
+    info = dict(_device_info(device), online=True, transport='udp', telemetry=_telemetry_summary(agent))
+    _agent_record(info['id'], True)
+    with fleet_lock:
+        before = fleet_state['devices'].get(info['id'])
+        info['stats'] = _merge_telemetry(before['info'].get('stats') if before else None, stats)
+        _fleet_store(fleet_state['devices'], info, now, _now_iso())
+    record_fleet_history(info['id'], now, info['stats'])
+    return True
+
+
+def _merge_telemetry(full, stats):
+    """Datagram metrics laid over the last full /stats snapshot
+
+    Fields the datagram doesn't carry (hostname, uptime, cores, temps, disk
+    size, other GPUs) keep their last polled values.
+    """
+    if not isinstance(full, dict):
+        return stats
+    merged = dict(full)
+    for field, values in stats.items():
+        merged[field] = dict(full[field], **values) if isinstance(full.get(field), dict) else values
+    if 'gpu' in stats and isinstance(merged.get('gpus'), list) and merged['gpus']:
+        merged['gpus'] = [merged['gpu']] + merged['gpus'][1:]
+    return merged
+
+
+def telemetry_refresh_due(device_ids, now):
+    """Pushing agents due a full HTTP snapshot; marks them refreshed (one attempt per period)"""
+    due = set()
+    with telemetry_lock:
+        for device_id in device_ids:
+            agent = telemetry_state['agents'].get(device_id)
+            if agent is not None and now - agent['fullAt'] >= TELEMETRY_FULL_REFRESH_SECONDS:
+                agent['fullAt'] = now
+                due.add(device_id)
+    return due
+
+
+def telemetry_fresh_ids(now=None):
+    """Devices whose datagrams are arriving on schedule (the collector skips them)"""
+    now = time.time() if now is None else now
+    with telemetry_lock:
+        return {
+            device_id for device_id, agent in telemetry_state['agents'].items()
+            if now - agent['lastAt'] < agent['intervalMs'] / 1000.0 * TELEMETRY_MISSED_HEARTBEATS
         }
-    
-    # 3. LAN lights (future: HTTP/UDP control)
-    if sync_config.get('lan'):
-        results['lan'] = {'success': False, 'error': 'LAN control not yet implemented'}
-    
-    # Update last applied timestamp
-    theme['lastUpdated'] = datetime.now().isoformat()
-    lighting_state_cache['last_theme'] = theme['name']
-    save_config()
-    
-    return results
+
+
+def telemetry_missed(device_id, now):
+    """Offline reason for an agent that stopped pushing, else None"""
+    with telemetry_lock:
+        agent = telemetry_state['agents'].get(device_id)
+        if agent is None:
+            return None
+        interval = max(0.001, agent['intervalMs'] / 1000.0)
+        silent = now - agent['lastAt']
+    if silent < interval * TELEMETRY_MISSED_HEARTBEATS:
+        return None
+    return f"Missed {int(silent / interval)} telemetry heartbeats (last datagram {round(silent, 1)}s ago)"
+
+
+def telemetry_status():
+    with telemetry_lock:
+        return {
+            'listening': telemetry_state['port'] is not None,
+            'port': telemetry_state['port'],
+            'received': telemetry_state['received'],
+            'rejected': telemetry_state['rejected'],
+            'agents': {i: _telemetry_summary(a) for i, a in telemetry_state['agents'].items()},
+            'error': telemetry_state['error']
+        }
+
+
+def _telemetry_receiver_loop(sock):
+    while True:
+        try:
+            data, addr = sock.recvfrom(512)
+        except OSError as e:
+            print(f"[Telemetry] Receiver stopped: {e}")
+            with telemetry_lock:
+                telemetry_state.update({'port': None, 'error': str(e)})
+            return
+        try:
+            receive_telemetry(data, addr)
+        except Exception as e:
+            print(f"[Telemetry] Datagram from {addr[0]} failed: {e}")
+
+
+def start_telemetry_receiver():
+    """Listen for agent datagrams when monitoring.telemetry is enabled (read at startup)"""
+    enabled, port = _telemetry_config()
+    if not enabled or telemetry_state['thread'] is not None:
+        return
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.bind(('0.0.0.0', port))
+    except OSError as e:
+        sock.close()
+        telemetry_state['error'] = f"Cannot listen on UDP {port}: {e}"
+        print(f"[Telemetry] {telemetry_state['error']}")
+        return
+    telemetry_state['port'] = sock.getsockname()[1]
+    telemetry_state['thread'] = threading.Thread(target=_telemetry_receiver_loop, args=(sock,), daemon=True)
+    telemetry_state['thread'].start()
+    print(f"📨 Telemetry: listening for agent datagrams on UDP {telemetry_state['port']}")
+
 
 # ============================================================
 # API ENDPOINTS
@@ -1146,9 +4305,8 @@ def create_directory():
     except Exception as e:
         return jsonify({'error': f"Failed to create folder: {e}"}), 500
 
-@app.route('/api/games', methods=['GET'])
-def get_games():
-    """Return list of all games from Steam + Epic Games + custom folders"""
+def collect_library_games():
+    """Scan Steam + Epic Games + custom folders; returns (unique games, steam libraries, folders)"""
     all_games = []
     
     # 1. Scan Steam libraries
@@ -1187,6 +4345,13 @@ def get_games():
     print(f"\n✓ Total items found: {len(all_games)} ({len(all_games) - len(unique_games)} duplicates removed)")
     print(f"✓ Unique games: {len(unique_games)}\n")
     
+    return unique_games, steam_libraries, folders
+
+@app.route('/api/games', methods=['GET'])
+def get_games():
+    """Return list of all games from Steam + Epic Games + custom folders"""
+    unique_games, steam_libraries, folders = collect_library_games()
+    
     return jsonify({
         'games': unique_games, 
         'count': len(unique_games),
@@ -1194,6 +4359,21 @@ def get_games():
         'customFolders': len(folders)
     })
 
+def _queue_cover_art_theme(data):
+    """If enabled, theme the room from the launched game's cover art in the background
+
+    The request only names the game (steamAppId or id); its cover URL and
+    palette cache key come from the library scan, never from the client.
+    """
+    if not config.get('theme', {}).get('autoFromCoverArt'):
+        return
+    game_id = data.get('id')
+    steam_app_id = data.get('steamAppId')
+    if not game_id and not steam_app_id:
+        print(f"⚠️  Cover art theme skipped: launch request has no game id ({data.get('execPath')})")
+        return
+    submit_debounced('cover-theme', apply_launch_theme, args=(game_id, steam_app_id), delay=0, lane='palettes')
+
 @app.route('/api/launch', methods=['POST'])
 def launch_game():
     """Launch a game via Steam protocol or executable path"""
@@ -1210,6 +4390,8 @@ def launch_game():
         else:
             os.system(f'xdg-open steam://rungameid/{steam_app_id}')
         
+        _queue_cover_art_theme(data)
+        
         return jsonify({
             'success': True, 
             'message': f'Launching Steam game {steam_app_id}',
@@ -1263,6 +4445,8 @@ def launch_game():
                     start_new_session=True
                 )
             
+            _queue_cover_art_theme(data)
+            
             return jsonify({
                 'success': True,
                 'message': f'Launching {os.path.basename(exec_path)}',
@@ -1519,111 +4703,131 @@ def launch_app():
     
     return jsonify({'error': f'App/URL not found: {app_id}'}), 404
 
-@app.route('/api/system-stats', methods=['GET'])
-def get_system_stats():
-    """Get system stats for this PC"""
-    try:
-        import psutil
-        
-        # CPU
-        cpu_percent = psutil.cpu_percent(interval=0.1)
-        cpu_count = psutil.cpu_count()
-        
-        # Memory
-        mem = psutil.virtual_memory()
-        
-        # Disk
-        disk = psutil.disk_usage('/')
-        
-        # Network
-        net = psutil.net_io_counters()
-        
-        stats = {
-            'hostname': os.environ.get('COMPUTERNAME', os.environ.get('HOSTNAME', 'Unknown')),
-            'platform': 'windows' if WINDOWS else 'linux',
-            'cpu': {
-                'usage': cpu_percent,
-                'cores': cpu_count
-            },
-            'memory': {
-                'used': round(mem.used / (1024**3), 2),
-                'total': round(mem.total / (1024**3), 2),
-                'percent': mem.percent
-            },
-            'disk': {
-                'used': round(disk.used / (1024**3), 2),
-                'total': round(disk.total / (1024**3), 2),
-                'percent': disk.percent
-            },
-            'network': {
-                'sent': round(net.bytes_sent / (1024**2), 2),
-                'recv': round(net.bytes_recv / (1024**2), 2)
-            }
+hub_net_counters = {}   # previous net_io_counters() reading: 'sent', 'recv', 'at' (monotonic)
+
+
+def collect_hub_stats():
+    """Sample this PC's stats (raises ImportError without psutil)
+
+    Network rates (bytes/s) cover the time since the previous call; the
+    first call reports none.
+    """
+    import psutil
+
+    # CPU
+    # Non-blocking: the collector calls this on a fixed cadence, so the
+    # value covers the time since the previous sample
+    cpu_percent = psutil.cpu_percent(interval=None)
+    cpu_count = psutil.cpu_count()
+    
+    # Memory
+    mem = psutil.virtual_memory()
+    
+    # Disk
+    disk = psutil.disk_usage('/')
+    
+    # Network
+    net = psutil.net_io_counters()
+    net_at = time.monotonic()
+    elapsed = net_at - hub_net_counters.get('at', net_at)
+    if elapsed > 0:
+        sent_rate = int(max(0, net.bytes_sent - hub_net_counters['sent']) / elapsed)
+        recv_rate = int(max(0, net.bytes_recv - hub_net_counters['recv']) / elapsed)
+    else:
+        sent_rate = recv_rate = None
+    hub_net_counters.update(sent=net.bytes_sent, recv=net.bytes_recv, at=net_at)
+    
+    stats = {
+        'hostname': os.environ.get('COMPUTERNAME', os.environ.get('HOSTNAME', 'Unknown')),
+        'platform': 'windows' if WINDOWS else 'linux',
+        'cpu': {
+            'usage': cpu_percent,
+            'cores': cpu_count
+        },
+        'memory': {
+            'used': round(mem.used / (1024**3), 2),
+            'total': round(mem.total / (1024**3), 2),
+            'percent': mem.percent
+        },
+        'disk': {
+            'used': round(disk.used / (1024**3), 2),
+            'total': round(disk.total / (1024**3), 2),
+            'percent': disk.percent
+        },
+        'network': {
+            'sent': round(net.bytes_sent / (1024**2), 2),
+            'recv': round(net.bytes_recv / (1024**2), 2),
+            'sentRate': sent_rate,
+            'recvRate': recv_rate
         }
-        
-        # Try to get GPU stats (optional)
-        try:
-            # This will only work if nvidia-ml-py3 is installed
-            import pynvml
-            pynvml.nvmlInit()
-            handle = pynvml.nvmlDeviceGetHandleByIndex(0)
-            gpu_util = pynvml.nvmlDeviceGetUtilizationRates(handle)
-            gpu_mem = pynvml.nvmlDeviceGetMemoryInfo(handle)
-            
-            stats['gpu'] = {
-                'usage': gpu_util.gpu,
-                'memory': {
-                    'used': round(gpu_mem.used / (1024**3), 2),
-                    'total': round(gpu_mem.total / (1024**3), 2)
-                }
-            }
-            pynvml.nvmlShutdown()
-        except:
-            pass
-        
-        return jsonify(stats)
+    }
     
-    except ImportError:
-        return jsonify({'error': 'psutil not installed. Run: pip install psutil'}), 500
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    # GPU stats (optional): persistent NVML session shared with the agent code
+    gpus = seezee_sensors.gpu_sensors().read()
+    if gpus:
+        stats['gpus'] = gpus
+        stats['gpu'] = gpus[0]
+    
+    return stats
+
+
+@app.route('/api/system-stats', methods=['GET'])
+def get_system_stats():
+    """Get system stats for this PC (latest collector sample)"""
+    snapshot = fleet_snapshot()
+    hub_sample = snapshot['hub']
+    if hub_sample is None:
+        return jsonify({'error': 'Stats not sampled yet'}), 503
+    if hub_sample.get('error'):
+        return jsonify({'error': hub_sample['error']}), 500
+    return jsonify({
+        **hub_sample['stats'],
+        'sampledAt': hub_sample['sampledAtIso'],
+        'ageSeconds': round(time.time() - hub_sample['sampledAt'], 1)
+    })
 
 @app.route('/api/devices', methods=['GET'])
 def get_devices():
-    """Get all configured devices and their status"""
-    devices = config.get('devices', [])
-    device_stats = []
-    
-    for device in devices:
-        if not device.get('enabled', True):
-            continue
-        
-        device_info = {
-            'id': device.get('id') or f"{device.get('name', 'device')}-{device.get('ip', 'unknown')}",
-            'name': device.get('name', 'Unknown Device'),
-            'type': device.get('type', 'pc'),
-            'ip': device.get('ip', '0.0.0.0'),
-            'online': False,
-            'stats': None
-        }
-        
-        # Try to fetch stats if monitoring is enabled
-        if device.get('monitorStats', True):
-            try:
-                import requests
-                response = requests.get(
-                    f"http://{device.get('ip')}:{device.get('port', 5050)}/stats",
-                    timeout=2
-                )
-                if response.status_code == 200:
-                    device_info['online'] = True
-                    device_info['stats'] = response.json()
-            except:
-                pass
-        
-        device_stats.append(device_info)
-    
-    return jsonify({'devices': device_stats})
+    """Get all configured devices and their status (latest collector sample)"""
+    snapshot = fleet_snapshot()
+    now = time.time()
+    device_stats = []
+    for device in config.get('devices', []):
+        if not device.get('enabled', True):
+            continue
+        sample = snapshot['devices'].get(_device_id(device))
+        if sample is None:
+            # Added since the last pass; the collector has been woken for it
+            info = dict(_device_info(device), pending=True, sampledAt=None, ageSeconds=None)
+        else:
+            info = dict(sample['info'], sampledAt=sample['sampledAtIso'],
+                        ageSeconds=round(now - sample['sampledAt'], 1))
+        device_stats.append(info)
+
+    return jsonify({'devices': device_stats, 'transitions': snapshot['transitions'][-20:],
+                    'telemetry': telemetry_status()})
+
+
+@app.route('/api/devices/<device_id>/history', methods=['GET'])
+def get_device_history(device_id):
+    """Downsampled metric history: ?metric=cpu&range=1h&width=300&mode=lttb|minmax ('hub' = this PC)"""
+    metric = request.args.get('metric', 'cpu')
+    if metric not in FLEET_HISTORY_METRICS:
+        return jsonify({'error': f"metric must be one of: {', '.join(FLEET_HISTORY_METRICS)}"}), 400
+    range_name = request.args.get('range', '1h')
+    if range_name not in HISTORY_RANGES:
+        return jsonify({'error': f"range must be one of: {', '.join(HISTORY_RANGES)}"}), 400
+    mode = request.args.get('mode', 'lttb')
+    if mode not in ('lttb', 'minmax'):
+        return jsonify({'error': "mode must be 'lttb' or 'minmax'"}), 400
+    width = _clamp_int(request.args.get('width'), 10, 4000, 300)
+
+    known = device_id == HUB_HISTORY_ID or any(_device_id(d) == device_id for d in config.get('devices', []))
+    if not known and device_id not in fleet_history:
+        return jsonify({'error': 'Device not found'}), 404
+
+    series = query_fleet_history(device_id, metric, HISTORY_RANGES[range_name], width, mode)
+    return jsonify({'device': device_id, 'metric': metric, 'range': range_name, 'mode': mode, **series})
 
 
 @app.route('/api/devices/test', methods=['POST'])
@@ -1677,6 +4881,7 @@ def add_device():
                 existing['type'] = device_type
             config['devices'] = devices
             save_config()
+            fleet_wake.set()
             return jsonify({'success': True, 'device': existing, 'deduped': True})
 
     new_device = {
@@ -1691,6 +4896,7 @@ def add_device():
     devices.append(new_device)
     config['devices'] = devices
     save_config()
+    fleet_wake.set()
 
     return jsonify({'success': True, 'device': new_device, 'deduped': False})
 
@@ -1732,7 +4938,7 @@ def set_theme():
     
     # Apply to all systems
     try:
-        results = apply_theme(theme_name)
+        results = apply_theme(theme_name, transition=data.get('transition'))
         return jsonify({
             'success': True,
             'message': f"Applied theme: {config['theme']['name']}",
@@ -1747,30 +4953,225 @@ def get_lighting_devices():
     return jsonify({
         'govee': {
             'enabled': config.get('govee', {}).get('enabled', False),
-            'devices': config.get('govee', {}).get('devices', [])
+            'devices': config.get('govee', {}).get('devices', []),
+            'state': _govee_state_snapshot(),
+            'circuit': breaker_status('govee')
         },
         'signalrgb': {
             'enabled': config.get('signalrgb', {}).get('enabled', False),
-            'profiles': config.get('signalrgb', {}).get('profiles', {})
+            'profiles': config.get('signalrgb', {}).get('profiles', {}),
+            'profileColors': config.get('signalrgb', {}).get('profileColors', {}),
+            'current': signalrgb_state['current']
         },
         'lan': {
             'enabled': config.get('lan_lights', {}).get('enabled', False),
-            'devices': config.get('lan_lights', {}).get('devices', [])
+            'devices': config.get('lan_lights', {}).get('devices', []),
+            'streams': lan_stream_stats()
         }
     })
 
+@app.route('/api/lighting/health', methods=['GET'])
+def get_lighting_health():
+    """Upstream circuit state so the UI can show 'cloud degraded' immediately"""
+    govee = breaker_status('govee')
+    return jsonify({
+        'cloudDegraded': govee['degraded'],
+        'breakers': {'govee': govee},
+        'pendingCommands': len(govee_queue)
+    })
+
+@app.route('/api/lighting/segments', methods=['GET'])
+def get_lighting_segments():
+    """Segment layout of the fleet and the last corrected colors"""
+    return jsonify(segment_layout_summary())
+
+@app.route('/api/lighting/segments', methods=['POST'])
+def set_lighting_segments():
+    """Set per-segment colors; only segments that changed are sent"""
+    data = request.json or {}
+    frames = data.get('frames') or ({data['device']: data.get('segments', [])} if data.get('device') else {})
+    if not frames:
+        return jsonify({'error': 'frames or device + segments required'}), 400
+
+    try:
+        jobs = set_segment_frame(frames)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({
+        'success': True,
+        'accepted': True,
+        'jobs': {key: job['id'] for key, job in jobs.items()}
+    }), 202
+
+@app.route('/api/lighting/palettes/<game_id>', methods=['GET'])
+def get_game_palette_endpoint(game_id):
+    """Cached cover art palette for a game"""
+    with palette_lock:
+        palette = _load_palette_cache().get(game_id)
+    if not palette:
+        return jsonify({'error': 'No palette cached for this game'}), 404
+    return jsonify({'id': game_id, 'palette': palette})
+
+@app.route('/api/lighting/palettes/precompute', methods=['POST'])
+def precompute_palettes_endpoint():
+    """Start the batch palette job for the whole library"""
+    job = submit_debounced('palettes:precompute', precompute_library_palettes, delay=0, lane='palettes')
+    return jsonify({
+        'success': True,
+        'accepted': True,
+        'jobId': job['id'],
+        'statusUrl': f"/api/lighting/jobs/{job['id']}"
+    }), 202
+
+@app.route('/api/lighting/schedule', methods=['GET'])
+def get_lighting_schedule():
+    """Configured scenes and their upcoming firings"""
+    limit = _clamp_int(request.args.get('limit', 20), 1, 500, 20)
+    return jsonify({
+        'entries': config.get('schedule', []),
+        'upcoming': upcoming_schedule(limit)
+    })
+
+@app.route('/api/lighting/schedule', methods=['POST'])
+def add_lighting_schedule():
+    """Add a scheduled scene: {name, at: 'HH:MM', days, theme: {name, rgb, brightness}, transition}"""
+    data = request.json or {}
+    entry = {
+        'id': str(uuid.uuid4()),
+        'name': data.get('name') or 'Scene',
+        'at': data.get('at'),
+        'days': data.get('days') or 'daily',
+        'theme': data.get('theme') or {},
+        'enabled': data.get('enabled', True)
+    }
+    if data.get('transition'):
+        entry['transition'] = data['transition']
+
+    try:
+        _schedule_parse(entry)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not entry['theme'].get('rgb') and entry['theme'].get('brightness') is None and not entry['theme'].get('name'):
+        return jsonify({'error': 'theme needs rgb, brightness or name'}), 400
+
+    config.setdefault('schedule', []).append(entry)
+    save_config()
+    rebuild_schedule()
+    start_schedule()
+    return jsonify({'success': True, 'entry': entry, 'upcoming': upcoming_schedule(5)})
+
+@app.route('/api/lighting/schedule', methods=['DELETE'])
+def delete_lighting_schedule():
+    """Remove a scheduled scene by ID"""
+    entry_id = request.args.get('id')
+    if not entry_id:
+        return jsonify({'error': 'Schedule entry ID is required'}), 400
+
+    entries = config.get('schedule', [])
+    config['schedule'] = [e for e in entries if e.get('id') != entry_id]
+    if len(config['schedule']) == len(entries):
+        return jsonify({'error': 'Schedule entry not found'}), 404
+
+    save_config()
+    rebuild_schedule()
+    return jsonify({'success': True, 'entries': config['schedule']})
+
+@app.route('/api/lighting/signalrgb', methods=['GET'])
+def get_signalrgb_status():
+    """Current SignalRGB profile and per-switch latency"""
+    return jsonify(signalrgb_status())
+
+@app.route('/api/lighting/lan/state', methods=['GET'])
+def get_lan_device_state():
+    """Query WLED JSON state of a LAN light (by id or ip)"""
+    device_ref = request.args.get('device')
+    if not device_ref:
+        return jsonify({'error': 'device parameter required'}), 400
+
+    devices = config.get('lan_lights', {}).get('devices', [])
+    device = next((d for d in devices if device_ref in (d.get('id'), d.get('ip'))), None)
+    if not device:
+        return jsonify({'error': 'Device not found in configuration'}), 404
+
+    try:
+        return jsonify({'success': True, 'state': wled_get_state(device)})
+    except ImportError:
+        return jsonify({'error': 'requests library not installed'}), 500
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 502
+
+@app.route('/api/lighting/effects', methods=['GET'])
+def get_lighting_effects():
+    """Active effects plus achieved FPS / dropped frames per backend"""
+    return jsonify(lighting_engine_stats())
+
+@app.route('/api/lighting/effects', methods=['POST'])
+def start_lighting_effect_endpoint():
+    """Start a fade, breathe or cycle effect"""
+    data = request.json or {}
+    colors = data.get('colors') or ([data['rgb']] if data.get('rgb') else [])
+
+    try:
+        effect = start_lighting_effect(
+            data.get('type', 'fade'),
+            colors,
+            duration_ms=data.get('durationMs', 1000 if data.get('type', 'fade') == 'fade' else 0),
+            period_ms=data.get('periodMs', 4000),
+            backends=data.get('backends', ['lan', 'govee']),
+            devices=data.get('devices'),
+            brightness=data.get('brightness'),
+            min_level=data.get('minLevel', 0.15),
+            spread=data.get('spread', 0.0)
+        )
+        return jsonify({'success': True, 'effect': effect})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/lighting/effects', methods=['DELETE'])
+def stop_lighting_effect_endpoint():
+    """Stop one effect (?id=) or all effects"""
+    removed = stop_lighting_effects(request.args.get('id'))
+    return jsonify({'success': True, 'stopped': removed})
+
 @app.route('/api/lighting/sync', methods=['POST'])
 def sync_lighting():
-    """Force sync current theme to all devices (bypass cache)"""
-    # Clear cache to force update
-    lighting_state_cache['last_rgb'] = None
-    lighting_state_cache['last_theme'] = None
+    """Reconcile now: refresh real device state, then send only what differs"""
+    theme = config.get('theme', {})
+    sync_config = theme.get('sync', {})
+    rgb = theme.get('rgb', {})
+    r, g, b = rgb.get('r', 255), rgb.get('g', 255), rgb.get('b', 255)
+    results = {'signalrgb': None, 'govee': None, 'lan': None}
     
     try:
-        results = apply_theme()
+        if sync_config.get('signalrgb'):
+            # Sync re-asserts: the profile may have been changed in the SignalRGB app
+            results['signalrgb'] = set_signalrgb_profile(theme.get('name', 'Default'), (r, g, b), force=True)
+        
+        if sync_config.get('govee') and config.get('govee', {}).get('enabled'):
+            devices = [d for d in config.get('govee', {}).get('devices', []) if d.get('enabled', True)]
+            threading.Thread(target=reconcile_all_govee, daemon=True).start()
+            results['govee'] = {
+                'reconciling': len(devices),
+                'devices': [d.get('name') for d in devices]
+            }
+        
+        if sync_config.get('lan'):
+            lan_devices = _lan_enabled_devices()
+            threading.Thread(
+                target=reconcile_lan_theme,
+                args=(lan_devices, r, g, b, theme.get('brightness', 80)),
+                daemon=True
+            ).start()
+            results['lan'] = {'reconciling': len(lan_devices)}
+        
         return jsonify({
             'success': True,
-            'message': 'Forced lighting sync',
+            'message': 'Reconciling lighting state',
             'results': results
         })
     except Exception as e:
@@ -1874,7 +5275,7 @@ def sync_govee_devices():
 
 @app.route('/api/lighting/govee/state', methods=['GET'])
 def get_govee_device_state():
-    """Query current state of a Govee device"""
+    """Current state of a Govee device, served from the TTL cache"""
     device_mac = request.args.get('device')
     model = request.args.get('model')
     
@@ -1887,24 +5288,19 @@ def get_govee_device_state():
     if not api_key:
         return jsonify({'error': 'Govee API key not configured'}), 400
     
+    device = next((d for d in govee_config.get('devices', []) if d.get('device') == device_mac), None)
+    if device is None:
+        device = {'device': device_mac, 'model': model, 'name': device_mac}
+    
     try:
-        import requests
-        
-        headers = {
-            'Govee-API-Key': api_key,
-            'Content-Type': 'application/json'
-        }
-        
-        response = requests.get(
-            f'https://developer-api.govee.com/v1/devices/state',
-            headers=headers,
-            params={'device': device_mac, 'model': model},
-            timeout=5
-        )
+        state, meta = get_govee_state_cached(device)
+        if state is None:
+            return jsonify({'status': 502, 'error': meta.get('error')}), 502
         
         return jsonify({
-            'status': response.status_code,
-            'response': response.json() if response.status_code == 200 else response.text
+            'status': 200,
+            'state': state,
+            **meta
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1929,11 +5325,10 @@ def lighting_batch_control():
     if enable_signalrgb:
         signalrgb_config = config.get('signalrgb', {})
         if signalrgb_config.get('enabled'):
-            # Map RGB to closest profile or apply direct color
-            results['signalrgb'] = {
-                'success': True,
-                'message': f'Applied RGB({rgb["r"]}, {rgb["g"]}, {rgb["b"]})'
-            }
+            # Map RGB to the closest configured profile
+            results['signalrgb'] = set_signalrgb_profile(None, (rgb['r'], rgb['g'], rgb['b']))
+            if results['signalrgb'].get('success'):
+                results['signalrgb']['message'] = f"Applied profile {results['signalrgb']['profile']}"
     
     # Queue Govee commands if enabled
     if enable_govee and device_macs:
@@ -1944,8 +5339,7 @@ def lighting_batch_control():
         selected_devices = [d for d in all_devices if d.get('device') in device_macs]
         
         if selected_devices:
-            global govee_queue
-            govee_queue.clear()
+            clear_govee_queue()
             
             r, g, b = rgb['r'], rgb['g'], rgb['b']
             
@@ -1972,7 +5366,7 @@ def lighting_batch_control():
 
 @app.route('/api/lighting/device', methods=['POST'])
 def lighting_device_control():
-    """Apply lighting to a single device immediately"""
+    """Accept a single-device update; the latest value per device is sent after a short debounce"""
     data = request.json
     device_mac = data.get('device')
     rgb = data.get('rgb', {'r': 255, 'g': 255, 'b': 255})
@@ -1990,53 +5384,663 @@ def lighting_device_control():
         return jsonify({'error': 'Device not found in configuration'}), 404
     
     r, g, b = rgb['r'], rgb['g'], rgb['b']
-    result = set_govee_color(device, r, g, b, brightness)
+    debounce_ms = _clamp_int(config.get('govee', {}).get('debounceMs', 150), 0, 5000, 150)
+    job = submit_debounced(
+        f"govee:{device_mac}",
+        _debounced_govee_color,
+        args=(device, r, g, b, brightness),
+        delay=debounce_ms / 1000.0,
+        lane='govee'
+    )
     
-    return jsonify(result)
+    return jsonify({
+        'success': True,
+        'accepted': True,
+        'jobId': job['id'],
+        'statusUrl': f"/api/lighting/jobs/{job['id']}",
+        'device': device.get('name', 'Unknown')
+    }), 202
+
+
+@app.route('/api/lighting/jobs/<job_id>', methods=['GET'])
+def get_lighting_job(job_id):
+    """Completion status and latency of an accepted lighting update"""
+    job = get_dispatch_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
 
 
 # ============================================================
 # AUDIO
 # ============================================================
 
-@app.route('/api/audio/state', methods=['GET'])
-def get_audio_state():
-    """Return current audio control capabilities and state."""
-    system_state = _system_volume_get()
-    spotify_configured = _spotify_access_token() is not None
-    spotify_now_playing = None
-    spotify_error = None
-
-    if spotify_configured:
-        data, error = _spotify_request('GET', '/v1/me/player/currently-playing')
-        if error is None:
-            spotify_now_playing = _normalize_spotify_currently_playing(data)
+# Shared now-playing snapshot, kept fresh by one adaptive poller thread.
+# Readers get progressMs interpolated from the monotonic clock between polls.
+SPOTIFY_POLL_PLAYING = 5.0
+SPOTIFY_POLL_PAUSED = 15.0
+SPOTIFY_POLL_IDLE = 30.0
+SPOTIFY_POLLER_IDLE_STOP = 120.0  # stop polling when nobody has read for this long
+SPOTIFY_REFRESH_SETTLE = 0.4
+
+spotify_now_playing_lock = threading.Lock()
+spotify_now_playing = {
+    'nowPlaying': None,
+    'error': None,
+    'fetchedAt': None,      # time.monotonic() of the last poll
+    'fetchedAtIso': None,
+    'lastReadAt': 0.0,
+    'polls': 0,
+    'player': {},           # shuffle / repeat / volumePercent as last commanded
+    'pendingSkips': 0,
+    'thread': None,
+    'ready': threading.Event(),
+    'wake': threading.Event()
+}
+
+
+def _spotify_error_message(error):
+    """Readable message from a _spotify_request error tuple"""
+    try:
+        error_data, status_code = error
+        if isinstance(error_data, dict):
+            details = error_data.get('details', {})
+            message = details.get('error', {}).get('message') if isinstance(details, dict) and isinstance(details.get('error'), dict) else None
+            if message:
+                return message
+            if status_code == 401:
+                return 'Invalid or expired Spotify token'
+            if status_code == 404:
+                return 'No active Spotify device found'
+            return error_data.get('error', f'Spotify error {status_code}')
+    except Exception:
+        pass
+    return 'Spotify request failed'
+
+
+def _spotify_poll_once():
+    data, error = _spotify_request('GET', '/v1/me/player/currently-playing')
+    with spotify_now_playing_lock:
+        if error is None and _spotify_commands_pending():
+            # A queued command will change this; keep the optimistic state until it lands
+            pass
+        elif error is None:
+            previous = spotify_now_playing['nowPlaying']
+            spotify_now_playing['nowPlaying'] = _normalize_spotify_currently_playing(data)
+            spotify_now_playing['error'] = None
+            spotify_now_playing['pendingSkips'] = 0
+            current = spotify_now_playing['nowPlaying']
+            if current and (previous or {}).get('albumArt') != current.get('albumArt'):
+                queue_album_art_prefetch(current)
         else:
-            # error is a tuple of (response, status_code)
-            # Try to extract a meaningful message
+            spotify_now_playing['error'] = _spotify_error_message(error)
+        spotify_now_playing['fetchedAt'] = time.monotonic()
+        spotify_now_playing['fetchedAtIso'] = _now_iso()
+        spotify_now_playing['polls'] += 1
+    spotify_now_playing['ready'].set()
+
+
+def _interpolated_now_playing(now=None):
+    """Copy of the snapshot's track with progressMs advanced to now; caller holds the lock"""
+    track = spotify_now_playing['nowPlaying']
+    if not track:
+        return None
+    track = dict(track)
+    fetched_at = spotify_now_playing['fetchedAt']
+    if track.get('isPlaying') and fetched_at is not None and isinstance(track.get('progressMs'), (int, float)):
+        elapsed_ms = ((now or time.monotonic()) - fetched_at) * 1000
+        progress = int(track['progressMs'] + elapsed_ms)
+        if isinstance(track.get('durationMs'), (int, float)):
+            progress = min(progress, int(track['durationMs']))
+        track['progressMs'] = progress
+    return track
+
+
+def _spotify_next_poll_delay():
+    """Poll faster near the end of a track, slower while paused or idle"""
+    with spotify_now_playing_lock:
+        if spotify_now_playing['error'] or not spotify_now_playing['nowPlaying']:
+            return SPOTIFY_POLL_IDLE
+        track = _interpolated_now_playing()
+    if not track.get('isPlaying'):
+        return SPOTIFY_POLL_PAUSED
+    if isinstance(track.get('durationMs'), (int, float)) and isinstance(track.get('progressMs'), (int, float)):
+        remaining = (track['durationMs'] - track['progressMs']) / 1000.0
+        if remaining < SPOTIFY_POLL_PLAYING:
+            # Land just after the track change
+            return max(0.5, remaining + 0.5)
+    return SPOTIFY_POLL_PLAYING
+
+
+def _spotify_poll_loop():
+    while True:
+        if time.monotonic() - spotify_now_playing['lastReadAt'] > SPOTIFY_POLLER_IDLE_STOP:
+            with spotify_now_playing_lock:
+                spotify_now_playing['thread'] = None
+            print("[Spotify] Now-playing poller idle, stopping")
+            return
+        if _spotify_access_token() is not None:
             try:
-                response_obj, status_code = error
-                if hasattr(response_obj, 'json'):
-                    error_data = response_obj.get_json()
-                    if isinstance(error_data, dict):
-                        spotify_error = error_data.get('details', {}).get('error', {}).get('message', f'Spotify error {status_code}')
-                        if not spotify_error:
-                            if status_code == 401:
-                                spotify_error = 'Invalid or expired Spotify token'
-                            elif status_code == 404:
-                                spotify_error = 'No active Spotify device found'
-                            else:
-                                spotify_error = error_data.get('error', f'Spotify error {status_code}')
-            except:
-                pass
+                _spotify_poll_once()
+            except Exception as e:
+                # Keep polling; readers must never wait on a dead poller
+                print(f"[Spotify] Poll failed: {e}")
+                spotify_now_playing['ready'].set()
+        else:
+            spotify_now_playing['ready'].set()
+        if spotify_now_playing['wake'].wait(timeout=_spotify_next_poll_delay()):
+            spotify_now_playing['wake'].clear()
+            # Give Spotify a moment to apply the command before re-reading
+            time.sleep(SPOTIFY_REFRESH_SETTLE)
+
+
+def request_spotify_refresh():
+    """Ask the poller to re-read now (e.g. after a transport command)"""
+    spotify_now_playing['wake'].set()
+
+
+def spotify_now_playing_snapshot(wait=3.0):
+    """Shared snapshot for all readers; starts the poller on first use"""
+    spotify_now_playing['lastReadAt'] = time.monotonic()
+    with spotify_now_playing_lock:
+        thread = spotify_now_playing['thread']
+        if thread is None or not thread.is_alive():
+            spotify_now_playing['thread'] = threading.Thread(target=_spotify_poll_loop, daemon=True)
+            spotify_now_playing['thread'].start()
+
+    if not spotify_now_playing['ready'].is_set():
+        spotify_now_playing['ready'].wait(timeout=wait)
+
+    with spotify_now_playing_lock:
+        fetched_at = spotify_now_playing['fetchedAt']
+        return {
+            'nowPlaying': _interpolated_now_playing(),
+            'error': spotify_now_playing['error'],
+            'player': dict(spotify_now_playing['player']),
+            'pendingSkips': spotify_now_playing['pendingSkips'],
+            'sampledAt': spotify_now_playing['fetchedAtIso'],
+            'ageMs': int((time.monotonic() - fetched_at) * 1000) if fetched_at is not None else None
+        }
+
+
+# Control commands go through the dispatcher's 'spotify' lane: seek, volume,
+# shuffle/repeat and play/pause are latest-wins per key, next/previous are
+# counted and sent as N skips. Endpoints answer 202 with the optimistic state.
+SPOTIFY_COMMAND_DEBOUNCE = 0.25
+SPOTIFY_COMMAND_MAX_WAIT = 0.75
+SPOTIFY_MAX_SKIPS = 10
+
+spotify_commands = {
+    'skips': 0,             # net next (+) / previous (-) not yet sent
+    'running': 0
+}
+
+
+def _spotify_commands_pending():
+    with dispatch_lock:
+        queued = any(key.startswith('spotify:') for key in dispatch_pending)
+    return queued or spotify_commands['running'] > 0
+
+
+def _spotify_command(method, path, params=None, body=None):
+    """Dispatcher job: one Spotify control call, reported as a result dict"""
+    spotify_commands['running'] += 1
+    try:
+        data, error = _spotify_request(method, path, params=params, body=body)
+        if error is not None:
+            return {'success': False, 'status': error[1], 'error': _spotify_error_message(error)}
+        return {'success': True, 'result': data}
+    finally:
+        spotify_commands['running'] -= 1
+        request_spotify_refresh()
+
+
+def _spotify_send_skips():
+    """Send the net number of next/previous taps collected during the window"""
+    with spotify_now_playing_lock:
+        skips = spotify_commands['skips']
+        spotify_commands['skips'] = 0
+    if skips == 0:
+        return {'success': True, 'skipped': 0}
+
+    path = '/v1/me/player/next' if skips > 0 else '/v1/me/player/previous'
+    count = min(abs(skips), SPOTIFY_MAX_SKIPS)
+    for sent in range(count):
+        result = _spotify_command('POST', path)
+        if not result['success']:
+            result['skipped'] = sent
+            return result
+    return {'success': True, 'skipped': count if skips > 0 else -count}
+
+
+def _spotify_optimistic(track_changes=None, player_changes=None):
+    """Apply the expected effect of a command to the now-playing snapshot"""
+    with spotify_now_playing_lock:
+        if track_changes and spotify_now_playing['nowPlaying']:
+            track = _interpolated_now_playing()
+            track.update(track_changes)
+            duration = track.get('durationMs')
+            if isinstance(duration, (int, float)) and isinstance(track.get('progressMs'), (int, float)):
+                track['progressMs'] = max(0, min(int(track['progressMs']), int(duration)))
+            spotify_now_playing['nowPlaying'] = track
+            spotify_now_playing['fetchedAt'] = time.monotonic()
+        if player_changes:
+            spotify_now_playing['player'].update(player_changes)
+        track = _interpolated_now_playing()
+    return track
+
+
+def submit_spotify_command(key, method, path, params=None, body=None, track_changes=None, player_changes=None):
+    """Queue a latest-wins control command; returns (job, optimistic nowPlaying)"""
+    job = submit_debounced(f"spotify:{key}", _spotify_command, args=(method, path, params, body),
+                           delay=SPOTIFY_COMMAND_DEBOUNCE, max_wait=SPOTIFY_COMMAND_MAX_WAIT, lane='spotify')
+    return job, _spotify_optimistic(track_changes, player_changes)
+
+
+def submit_spotify_skip(direction):
+    """Count a next (+1) / previous (-1) tap; the window's net total is sent at once"""
+    with spotify_now_playing_lock:
+        spotify_commands['skips'] += direction
+        spotify_now_playing['pendingSkips'] = spotify_commands['skips']
+        if spotify_now_playing['nowPlaying']:
+            spotify_now_playing['nowPlaying'] = dict(spotify_now_playing['nowPlaying'], progressMs=0)
+            spotify_now_playing['fetchedAt'] = time.monotonic()
+    invalidate_spotify_library('/v1/me/player/queue')
+    job = submit_debounced('spotify:skip', _spotify_send_skips, delay=SPOTIFY_COMMAND_DEBOUNCE,
+                           max_wait=SPOTIFY_COMMAND_MAX_WAIT, lane='spotify')
+    with spotify_now_playing_lock:
+        return job, _interpolated_now_playing()
+
+
+def _spotify_command_unavailable():
+    """Fail fast (before queuing) when commands cannot be sent"""
+    if _spotify_access_token() is None:
+        return jsonify({'error': 'Spotify not configured'}), 400
+    status = breaker_status('spotify')
+    if status['state'] == 'open':
+        return jsonify({
+            'error': 'Spotify degraded (circuit open)',
+            'circuit': status['state'],
+            'retryInSeconds': status['retryInSeconds']
+        }), 503
+    return None
+
+
+def _spotify_accepted(job, now_playing, **fields):
+    return jsonify({
+        'success': True,
+        'accepted': True,
+        'jobId': job['id'],
+        'statusUrl': f"/api/audio/jobs/{job['id']}",
+        'nowPlaying': now_playing,
+        **fields
+    }), 202
+
+
+# Library browsing cache: LRU of Spotify GET responses keyed by user, path and
+# params. Fresh entries are served from memory, stale ones are served while a
+# background If-None-Match revalidation runs, and the next page is prefetched.
+SPOTIFY_LIBRARY_CACHE_MAX = 256
+SPOTIFY_LIBRARY_TTL = {
+    '/v1/me/playlists': 300,
+    '/v1/me/player/recently-played': 60,
+    '/v1/search': 900,
+    '/v1/me/player/queue': 5
+}
+SPOTIFY_LIBRARY_PAGE_LIMIT = 20
+
+spotify_library_lock = threading.Lock()
+spotify_library_cache = OrderedDict()   # key -> {'data', 'etag', 'fetchedAt'}
+spotify_library_stats = {'hits': 0, 'stale': 0, 'misses': 0, 'revalidated': 0, 'prefetched': 0}
+
+
+def _spotify_user_key():
+    """Stable per-login cache namespace (the refresh token outlives access tokens)"""
+    spotify = _get_spotify_config()
+    secret = spotify.get('refresh_token') or _spotify_stored_token(spotify) or ''
+    return hashlib.sha1(secret.encode('utf-8')).hexdigest()[:12]
+
+
+def _spotify_library_key(path, params):
+    return (_spotify_user_key(), path, tuple(sorted((params or {}).items())))
+
+
+def _spotify_library_fetch(key, path, params):
+    """Fetch (or revalidate) one page into the cache; returns (entry, error)"""
+    with spotify_library_lock:
+        cached = spotify_library_cache.get(key)
+    headers = {'If-None-Match': cached['etag']} if cached and cached.get('etag') else None
+    meta = {}
+    data, error = _spotify_request('GET', path, params=params, headers=headers, meta=meta)
+    if error is not None:
+        return None, error
+
+    with spotify_library_lock:
+        if meta.get('status') == 304 and cached:
+            entry = dict(cached, fetchedAt=time.time())
+            spotify_library_stats['revalidated'] += 1
+        else:
+            entry = {'data': data, 'etag': meta.get('etag'), 'fetchedAt': time.time()}
+        spotify_library_cache[key] = entry
+        spotify_library_cache.move_to_end(key)
+        while len(spotify_library_cache) > SPOTIFY_LIBRARY_CACHE_MAX:
+            spotify_library_cache.popitem(last=False)
+    return entry, None
+
+
+def _spotify_next_page_params(path, params, data):
+    """Params for the page after this one, or None on the last page"""
+    if not isinstance(data, dict):
+        return None
+    if path == '/v1/me/player/recently-played':
+        before = (data.get('cursors') or {}).get('before')
+        return dict(params, before=before) if data.get('next') and before else None
+    paging = data
+    if path == '/v1/search':
+        # Page the first result type that has more items
+        paging = next((v for v in data.values() if isinstance(v, dict) and v.get('next')), None)
+    if not paging or not paging.get('next'):
+        return None
+    limit = int(params.get('limit', SPOTIFY_LIBRARY_PAGE_LIMIT))
+    return dict(params, offset=int(params.get('offset', 0)) + limit)
+
+
+def _spotify_prefetch(path, params):
+    key = _spotify_library_key(path, params)
+    with spotify_library_lock:
+        if key in spotify_library_cache:
+            return {'success': True, 'cached': True}
+    entry, error = _spotify_library_fetch(key, path, params)
+    if entry is not None:
+        spotify_library_stats['prefetched'] += 1
+    return {'success': error is None}
+
+
+def spotify_library_get(path, params, ttl=None, prefetch=True):
+    """Cached GET for browsing endpoints; returns (data, meta, error)"""
+    params = {k: v for k, v in params.items() if v is not None}
+    ttl = SPOTIFY_LIBRARY_TTL.get(path, 60) if ttl is None else ttl
+    key = _spotify_library_key(path, params)
+    with spotify_library_lock:
+        entry = spotify_library_cache.get(key)
+        if entry is not None:
+            spotify_library_cache.move_to_end(key)
+
+    age = time.time() - entry['fetchedAt'] if entry else None
+    if entry is not None and age <= ttl:
+        spotify_library_stats['hits'] += 1
+        source = 'cache'
+    elif entry is not None and path != '/v1/me/player/queue':
+        # Serve stale immediately; revalidate with the stored ETag in the background
+        spotify_library_stats['stale'] += 1
+        submit_debounced(f"spotify-library:{key}", _spotify_library_fetch, args=(key, path, params),
+                         delay=0, lane='spotify-library')
+        source = 'stale'
+    else:
+        spotify_library_stats['misses'] += 1
+        entry, error = _spotify_library_fetch(key, path, params)
+        if error is not None:
+            return None, None, error
+        age = 0.0
+        source = 'spotify'
+
+    if prefetch:
+        next_params = _spotify_next_page_params(path, params, entry['data'])
+        if next_params:
+            submit_debounced(f"spotify-prefetch:{path}:{sorted(next_params.items())}", _spotify_prefetch,
+                             args=(path, next_params), delay=0, lane='spotify-library')
+
+    return entry['data'], {'source': source, 'ageSeconds': round(age, 1)}, None
+
+
+def invalidate_spotify_library(path):
+    """Drop cached pages for a path (e.g. the queue after a skip)"""
+    with spotify_library_lock:
+        for key in [k for k in spotify_library_cache if k[1] == path]:
+            del spotify_library_cache[key]
+
+
+def _spotify_image_url(images):
+    return images[0].get('url') if isinstance(images, list) and images and isinstance(images[0], dict) else None
+
+
+def _normalize_spotify_track(item):
+    if not isinstance(item, dict):
+        return None
+    album = item.get('album') if isinstance(item.get('album'), dict) else {}
+    art_url = _spotify_image_url(album.get('images') or item.get('images'))
+    return {
+        'id': item.get('id'),
+        'uri': item.get('uri'),
+        'title': item.get('name'),
+        'artists': [a.get('name') for a in item.get('artists', []) if isinstance(a, dict) and a.get('name')],
+        'album': album.get('name'),
+        'albumArtUrl': art_url,
+        'albumArt': album_art_path(art_url),
+        'durationMs': item.get('duration_ms')
+    }
+
+
+def _normalize_spotify_playlist(item):
+    if not isinstance(item, dict):
+        return None
+    return {
+        'id': item.get('id'),
+        'uri': item.get('uri'),
+        'name': item.get('name'),
+        'owner': (item.get('owner') or {}).get('display_name'),
+        'imageUrl': _spotify_image_url(item.get('images')),
+        'trackCount': (item.get('tracks') or {}).get('total')
+    }
+
+
+def _spotify_paging(data, params):
+    data = data if isinstance(data, dict) else {}
+    return {
+        'offset': int(params.get('offset', 0)),
+        'limit': int(params.get('limit', SPOTIFY_LIBRARY_PAGE_LIMIT)),
+        'total': data.get('total'),
+        'hasMore': bool(data.get('next'))
+    }
+
+
+def _library_page_params():
+    return {
+        'limit': _clamp_int(request.args.get('limit'), 1, 50, SPOTIFY_LIBRARY_PAGE_LIMIT),
+        'offset': _clamp_int(request.args.get('offset'), 0, 100000, 0)
+    }
+
+
+# Album art proxy: Spotify art is downloaded once, resized to the kiosk's
+# display size and kept in a size-bounded disk LRU (file mtime = last use).
+ALBUM_ART_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "album_art_cache")
+ALBUM_ART_DEFAULT_SIZE = 256
+ALBUM_ART_MAX_URLS = 2000
+
+album_art_lock = threading.Lock()
+album_art_urls = OrderedDict()   # hash -> upstream URL
+album_art_inflight = {}          # cache path -> threading.Event for the download in progress
+album_art_stats = {'hits': 0, 'misses': 0, 'prefetched': 0, 'evicted': 0}
+
+
+def album_art_path(url):
+    """Register an upstream art URL; returns the hub path that serves it"""
+    if not url:
+        return None
+    art_hash = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+    with album_art_lock:
+        album_art_urls[art_hash] = url
+        album_art_urls.move_to_end(art_hash)
+        while len(album_art_urls) > ALBUM_ART_MAX_URLS:
+            album_art_urls.popitem(last=False)
+    return f"/api/audio/art/{art_hash}"
+
+
+def _album_art_size(requested=None):
+    default = _clamp_int(config.get('audio', {}).get('artSize', ALBUM_ART_DEFAULT_SIZE), 32, 640, ALBUM_ART_DEFAULT_SIZE)
+    size = _clamp_int(requested, 32, 640, default)
+    return (size + 31) // 32 * 32   # bound the number of variants per image
+
+
+def _album_art_evict():
+    max_bytes = _clamp_int(config.get('audio', {}).get('artCacheMB', 50), 1, 10000, 50) * 1024 * 1024
+    try:
+        entries = [e for e in os.scandir(ALBUM_ART_CACHE_DIR) if e.is_file() and e.name.endswith('.jpg')]
+    except FileNotFoundError:
+        return
+    stats = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+    total = sum(size for _, size, _ in stats)
+    for _, size, path in sorted(stats):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            album_art_stats['evicted'] += 1
+        except OSError:
+            pass
+
+
+def _album_art_download(url, path, size):
+    import requests
+
+    response = requests.get(url, timeout=10)
+    if response.status_code != 200:
+        raise RuntimeError(f"HTTP {response.status_code}")
+    content = response.content
+    try:
+        from PIL import Image
+
+        with Image.open(io.BytesIO(content)) as img:
+            img = img.convert('RGB')
+            img.thumbnail((size, size), Image.LANCZOS)
+            buffer = io.BytesIO()
+            img.save(buffer, format='JPEG', quality=85, optimize=True, progressive=True)
+            content = buffer.getvalue()
+    except ImportError:
+        pass   # no Pillow: cache the original (Spotify art is already JPEG)
+
+    os.makedirs(ALBUM_ART_CACHE_DIR, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    _album_art_evict()
+
+
+def ensure_album_art(art_hash, size):
+    """Local path of the resized art, downloading on a miss (single-flight per file)"""
+    path = os.path.join(ALBUM_ART_CACHE_DIR, f"{art_hash}-{size}.jpg")
+    if os.path.isfile(path):
+        album_art_stats['hits'] += 1
+        try:
+            os.utime(path)   # LRU: mtime is last use
+        except OSError:
+            pass
+        return path, None
+
+    with album_art_lock:
+        url = album_art_urls.get(art_hash)
+        event = album_art_inflight.get(path)
+        leader = event is None and url is not None
+        if leader:
+            event = threading.Event()
+            album_art_inflight[path] = event
+    if url is None:
+        return None, 'Unknown album art'
+    if not leader:
+        event.wait(timeout=10)
+        return (path, None) if os.path.isfile(path) else (None, 'Album art download failed')
+
+    album_art_stats['misses'] += 1
+    try:
+        _album_art_download(url, path, size)
+        return path, None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        with album_art_lock:
+            album_art_inflight.pop(path, None)
+        event.set()
+
+
+def _album_art_prefetch(art_paths):
+    """Cache art for the current and next queued tracks ahead of the kiosk asking"""
+    size = _album_art_size()
+    for art_path in art_paths:
+        art_hash = art_path.rsplit('/', 1)[-1]
+        if not os.path.isfile(os.path.join(ALBUM_ART_CACHE_DIR, f"{art_hash}-{size}.jpg")):
+            if ensure_album_art(art_hash, size)[0]:
+                album_art_stats['prefetched'] += 1
+
+    data, _, error = spotify_library_get('/v1/me/player/queue', {}, prefetch=False)
+    if error is None and data:
+        upcoming = [_normalize_spotify_track(t) for t in (data.get('queue') or [])[:1]]
+        for track in upcoming:
+            if track and track.get('albumArt'):
+                art_hash = track['albumArt'].rsplit('/', 1)[-1]
+                if ensure_album_art(art_hash, size)[0]:
+                    album_art_stats['prefetched'] += 1
+    return {'success': True}
+
+
+def queue_album_art_prefetch(now_playing):
+    if now_playing and now_playing.get('albumArt'):
+        submit_debounced('album-art:prefetch', _album_art_prefetch, args=([now_playing['albumArt']],),
+                         delay=0, lane='album-art')
+
+
+def _audio_spotify_source():
+    if _spotify_access_token() is None:
+        return {'configured': False, 'nowPlaying': None, 'error': None}
+    snapshot = spotify_now_playing_snapshot()
+    return {
+        'configured': True,
+        'nowPlaying': snapshot['nowPlaying'],
+        'error': snapshot['error'],
+        'player': snapshot['player'],
+        'pendingSkips': snapshot['pendingSkips'],
+        'sampledAt': snapshot['sampledAt'],
+        'ageMs': snapshot['ageMs']
+    }
+
+
+@app.route('/api/audio/state', methods=['GET'])
+def get_audio_state():
+    """Return current audio control capabilities and state.
+
+    Sources are read concurrently under a deadline (config audio.stateDeadlineMs);
+    a slow or failing source reports its last good value marked stale.
+    """
+    started = time.monotonic()
+    deadline_ms = _clamp_int(config.get('audio', {}).get('stateDeadlineMs', 1200), 100, 10000, 1200)
+    reports = gather_with_deadline({
+        'audio:system': _system_volume_get,
+        'audio:spotify': _audio_spotify_source
+    }, deadline_ms / 1000.0)
+
+    system_report = reports['audio:system']
+    spotify_report = reports['audio:spotify']
+    system_state = system_report['value'] or {
+        'supported': False,
+        'error': system_report['error'],
+        'backend': 'none'
+    }
+    spotify_state = spotify_report['value'] or {
+        'configured': True,
+        'nowPlaying': None,
+        'error': spotify_report['error']
+    }
+
+    sources = {}
+    for name, report in (('system', system_report), ('spotify', spotify_report)):
+        sources[name] = {k: v for k, v in report.items() if k != 'value'}
 
     return jsonify({
         'system': system_state,
-        'spotify': {
-            'configured': spotify_configured,
-            'nowPlaying': spotify_now_playing,
-            'error': spotify_error
-        },
+        'spotify': spotify_state,
+        'sources': sources,
+        'latencyMs': int((time.monotonic() - started) * 1000),
         'timestamp': _now_iso()
     })
 
@@ -2075,19 +6079,26 @@ def set_spotify_token():
     
     config['spotify']['lastUpdated'] = _now_iso()
     save_config()
+    spotify_token_state['renewWake'].set()
+    request_spotify_refresh()
 
     return jsonify({'success': True, 'message': 'Spotify tokens saved'}), 200
 
 
 @app.route('/api/audio/spotify/currently-playing', methods=['GET'])
 def spotify_currently_playing():
-    data, error = _spotify_request('GET', '/v1/me/player/currently-playing')
-    if error is not None:
-        return error
+    if _spotify_access_token() is None:
+        return jsonify({'error': 'Spotify not configured'}), 400
+
+    snapshot = spotify_now_playing_snapshot()
+    if snapshot['error'] and snapshot['nowPlaying'] is None:
+        return jsonify({'error': snapshot['error']}), 502
 
     return jsonify({
         'success': True,
-        'nowPlaying': _normalize_spotify_currently_playing(data)
+        'nowPlaying': snapshot['nowPlaying'],
+        'sampledAt': snapshot['sampledAt'],
+        'ageMs': snapshot['ageMs']
     })
 
 
@@ -2099,36 +6110,143 @@ def spotify_player():
     return jsonify({'success': True, 'player': data})
 
 
-@app.route('/api/audio/spotify/play', methods=['POST'])
-def spotify_play():
-    data, error = _spotify_request('PUT', '/v1/me/player/play')
+@app.route('/api/audio/art/<art_hash>', methods=['GET'])
+def get_album_art(art_hash):
+    """Resized album art from the disk cache (?size=px, default audio.artSize)"""
+    if not re.fullmatch(r'[0-9a-f]{16}', art_hash):
+        return jsonify({'error': 'Invalid art id'}), 400
+    path, error = ensure_album_art(art_hash, _album_art_size(request.args.get('size')))
+    if path is None:
+        status = 404 if error == 'Unknown album art' else 502
+        return jsonify({'error': error}), status
+
+    # The hash names the upstream image, so a given URL never changes content
+    response = send_file(path, mimetype='image/jpeg', etag=os.path.basename(path), conditional=True)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+@app.route('/api/audio/spotify/playlists', methods=['GET'])
+def spotify_playlists():
+    """The user's playlists, one cached page at a time"""
+    params = _library_page_params()
+    data, meta, error = spotify_library_get('/v1/me/playlists', params)
     if error is not None:
         return error
-    return jsonify({'success': True, 'result': data})
+    return jsonify({
+        'success': True,
+        'items': [p for p in map(_normalize_spotify_playlist, data.get('items', [])) if p],
+        'paging': _spotify_paging(data, params),
+        **meta
+    })
 
 
-@app.route('/api/audio/spotify/pause', methods=['POST'])
-def spotify_pause():
-    data, error = _spotify_request('PUT', '/v1/me/player/pause')
+@app.route('/api/audio/spotify/recent', methods=['GET'])
+def spotify_recent():
+    """Recently played tracks; page backwards with ?before=<cursor>"""
+    params = {
+        'limit': _clamp_int(request.args.get('limit'), 1, 50, SPOTIFY_LIBRARY_PAGE_LIMIT),
+        'before': request.args.get('before')
+    }
+    data, meta, error = spotify_library_get('/v1/me/player/recently-played', params)
     if error is not None:
         return error
-    return jsonify({'success': True, 'result': data})
+    cursors = data.get('cursors') or {}
+    return jsonify({
+        'success': True,
+        'items': [
+            {'playedAt': item.get('played_at'), 'track': _normalize_spotify_track(item.get('track'))}
+            for item in data.get('items', []) if isinstance(item, dict)
+        ],
+        'before': cursors.get('before') if data.get('next') else None,
+        **meta
+    })
 
 
-@app.route('/api/audio/spotify/next', methods=['POST'])
-def spotify_next():
-    data, error = _spotify_request('POST', '/v1/me/player/next')
+@app.route('/api/audio/spotify/search', methods=['GET'])
+def spotify_search():
+    """Search tracks, albums and playlists (?q=...&type=track,playlist)"""
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({'error': 'q required'}), 400
+    types = request.args.get('type', 'track,playlist')
+    allowed = {'track', 'album', 'playlist', 'artist'}
+    types = ','.join(t for t in types.split(',') if t in allowed) or 'track'
+    params = {'q': query, 'type': types, **_library_page_params()}
+
+    data, meta, error = spotify_library_get('/v1/search', params)
     if error is not None:
         return error
-    return jsonify({'success': True, 'result': data})
+    results = {}
+    for name, paging in data.items():
+        if not isinstance(paging, dict):
+            continue
+        normalize = _normalize_spotify_playlist if name == 'playlists' else _normalize_spotify_track
+        results[name] = {
+            'items': [i for i in map(normalize, paging.get('items') or []) if i],
+            'paging': _spotify_paging(paging, params)
+        }
+    return jsonify({'success': True, 'query': query, 'results': results, **meta})
 
 
-@app.route('/api/audio/spotify/previous', methods=['POST'])
-def spotify_previous():
-    data, error = _spotify_request('POST', '/v1/me/player/previous')
+@app.route('/api/audio/spotify/queue', methods=['GET'])
+def spotify_queue():
+    """Current track and upcoming queue (short TTL, revalidated on skips)"""
+    data, meta, error = spotify_library_get('/v1/me/player/queue', {}, prefetch=False)
     if error is not None:
         return error
-    return jsonify({'success': True, 'result': data})
+    return jsonify({
+        'success': True,
+        'currentlyPlaying': _normalize_spotify_track(data.get('currently_playing')),
+        'queue': [t for t in map(_normalize_spotify_track, data.get('queue') or []) if t],
+        **meta
+    })
+
+
+@app.route('/api/audio/spotify/play', methods=['POST'])
+def spotify_play():
+    unavailable = _spotify_command_unavailable()
+    if unavailable:
+        return unavailable
+    payload = request.get_json(silent=True) or {}
+    body = None
+    if payload.get('contextUri') or payload.get('uris'):
+        # Start something picked from the library browser
+        body = {'context_uri': payload['contextUri']} if payload.get('contextUri') else {'uris': list(payload['uris'])}
+        if isinstance(payload.get('offset'), int):
+            body['offset'] = {'position': payload['offset']}
+        invalidate_spotify_library('/v1/me/player/queue')
+    job, now_playing = submit_spotify_command('playback', 'PUT', '/v1/me/player/play', body=body,
+                                              track_changes={'isPlaying': True})
+    return _spotify_accepted(job, now_playing)
+
+
+@app.route('/api/audio/spotify/pause', methods=['POST'])
+def spotify_pause():
+    unavailable = _spotify_command_unavailable()
+    if unavailable:
+        return unavailable
+    job, now_playing = submit_spotify_command('playback', 'PUT', '/v1/me/player/pause',
+                                              track_changes={'isPlaying': False})
+    return _spotify_accepted(job, now_playing)
+
+
+@app.route('/api/audio/spotify/next', methods=['POST'])
+def spotify_next():
+    unavailable = _spotify_command_unavailable()
+    if unavailable:
+        return unavailable
+    job, now_playing = submit_spotify_skip(1)
+    return _spotify_accepted(job, now_playing, pendingSkips=spotify_commands['skips'])
+
+
+@app.route('/api/audio/spotify/previous', methods=['POST'])
+def spotify_previous():
+    unavailable = _spotify_command_unavailable()
+    if unavailable:
+        return unavailable
+    job, now_playing = submit_spotify_skip(-1)
+    return _spotify_accepted(job, now_playing, pendingSkips=spotify_commands['skips'])
 
 
 @app.route('/api/audio/spotify/shuffle', methods=['POST'])
@@ -2136,10 +6254,13 @@ def spotify_shuffle():
     payload = request.json or {}
     enabled = payload.get('enabled')
     enabled = bool(enabled)
-    data, error = _spotify_request('PUT', '/v1/me/player/shuffle', params={'state': 'true' if enabled else 'false'})
-    if error is not None:
-        return error
-    return jsonify({'success': True, 'enabled': enabled, 'result': data})
+    unavailable = _spotify_command_unavailable()
+    if unavailable:
+        return unavailable
+    job, now_playing = submit_spotify_command('shuffle', 'PUT', '/v1/me/player/shuffle',
+                                              params={'state': 'true' if enabled else 'false'},
+                                              player_changes={'shuffle': enabled})
+    return _spotify_accepted(job, now_playing, enabled=enabled)
 
 
 @app.route('/api/audio/spotify/repeat', methods=['POST'])
@@ -2148,10 +6269,29 @@ def spotify_repeat():
     mode = payload.get('mode')
     if mode not in ('off', 'context', 'track'):
         return jsonify({'error': "mode must be one of: off, context, track"}), 400
-    data, error = _spotify_request('PUT', '/v1/me/player/repeat', params={'state': mode})
-    if error is not None:
-        return error
-    return jsonify({'success': True, 'mode': mode, 'result': data})
+    unavailable = _spotify_command_unavailable()
+    if unavailable:
+        return unavailable
+    job, now_playing = submit_spotify_command('repeat', 'PUT', '/v1/me/player/repeat',
+                                              params={'state': mode},
+                                              player_changes={'repeat': mode})
+    return _spotify_accepted(job, now_playing, mode=mode)
+
+
+@app.route('/api/audio/spotify/volume', methods=['POST'])
+def spotify_volume():
+    payload = request.json or {}
+    volume = payload.get('volume')
+    if volume is None or not isinstance(volume, (int, float)):
+        return jsonify({'error': 'volume required and must be a number'}), 400
+    volume = max(0, min(100, int(volume)))
+    unavailable = _spotify_command_unavailable()
+    if unavailable:
+        return unavailable
+    job, now_playing = submit_spotify_command('volume', 'PUT', '/v1/me/player/volume',
+                                              params={'volume_percent': volume},
+                                              player_changes={'volumePercent': volume})
+    return _spotify_accepted(job, now_playing, volume=volume)
 
 
 @app.route('/api/audio/spotify/seek', methods=['POST', 'OPTIONS'])
@@ -2170,11 +6310,23 @@ def spotify_seek():
     if position_ms is None or not isinstance(position_ms, (int, float)):
         return jsonify({'error': 'positionMs required and must be a number'}), 400
     
-    position_ms = int(position_ms)
-    data, error = _spotify_request('PUT', '/v1/me/player/seek', params={'position_ms': position_ms})
-    if error is not None:
-        return error
-    return jsonify({'success': True, 'positionMs': position_ms, 'result': data})
+    position_ms = max(0, int(position_ms))
+    unavailable = _spotify_command_unavailable()
+    if unavailable:
+        return unavailable
+    job, now_playing = submit_spotify_command('seek', 'PUT', '/v1/me/player/seek',
+                                              params={'position_ms': position_ms},
+                                              track_changes={'progressMs': position_ms})
+    return _spotify_accepted(job, now_playing, positionMs=position_ms)
+
+
+@app.route('/api/audio/jobs/<job_id>', methods=['GET'])
+def get_audio_job(job_id):
+    """Completion status of an accepted Spotify command"""
+    job = get_dispatch_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
 
 
 @app.route('/api/audio/spotify/login', methods=['GET'])
@@ -2206,6 +6358,17 @@ def spotify_login_url():
 # STARTUP
 # ============================================================
 
+def start_background_services():
+    """Start hub-side worker threads (call once after load_config)"""
+    threading.Thread(target=_govee_state_refresh_loop, daemon=True).start()
+    threading.Thread(target=_spotify_token_renew_loop, daemon=True).start()
+    _volume_service_ensure(wait=0)
+    start_telemetry_receiver()
+    start_fleet_collector()
+    start_history_rollups()
+    start_schedule()
+
+
 if __name__ == '__main__':
     print("=" * 60)
     print("  SEE STUDIO ZEE PC Server - Game Library Bridge v2.0")
@@ -2213,6 +6376,7 @@ if __name__ == '__main__':
     
     # Load configuration
     load_config()
+    start_background_services()
     
     # Auto-detect Steam
     libraries = find_steam_libraries()
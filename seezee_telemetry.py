@@ -0,0 +1,82 @@
+"""
+SEE STUDIO ZEE push telemetry datagram (agent -> hub, UDP)
+
+One fixed-layout, network-order packet per interval:
+
+    magic 'SZ' | version | flags | seq | boot nonce | host hash | interval ms
+    cpu % | memory % | memory used MB | memory total MB | disk %
+    gpu % | gpu temp C | net sent B/s | net recv B/s
+
+Percentages are hundredths; unknown values use the field's NONE sentinel.
+The boot nonce is random per agent start, so the hub can tell a restart
+(seq begins again) from a late, reordered datagram.
+"""
+
+import hashlib
+import struct
+
+TELEMETRY_PORT = 5051
+TELEMETRY_MAGIC = b'SZ'
+TELEMETRY_VERSION = 2
+FLAG_HAS_GPU = 0x01
+
+PACKET = struct.Struct('!2sBBIIQH' 'HHIIH' 'Hh' 'II')
+NONE_U16 = 0xFFFF
+NONE_I16 = -0x8000
+
+
+def host_hash(hostname):
+    """Stable 64-bit id for a hostname (identifies an agent across IP changes)"""
+    return int.from_bytes(hashlib.sha1(hostname.encode('utf-8')).digest()[:8], 'big')
+
+
+def _centi(value):
+    return NONE_U16 if value is None else max(0, min(10000, int(round(value * 100))))
+
+
+def _u32(value):
+    return max(0, min(0xFFFFFFFF, int(value or 0)))
+
+
+def pack(seq, boot, host_id, interval_ms, stats):
+    """Datagram for one sample; stats uses the agent /stats layout"""
+    cpu = stats.get('cpu') or {}
+    memory = stats.get('memory') or {}
+    disk = stats.get('disk') or {}
+    network = stats.get('network') or {}
+    gpu = stats.get('gpu') if isinstance(stats.get('gpu'), dict) else None
+    gpu_temp = gpu.get('temp') if gpu else None
+    return PACKET.pack(
+        TELEMETRY_MAGIC, TELEMETRY_VERSION, FLAG_HAS_GPU if gpu else 0,
+        seq & 0xFFFFFFFF, boot & 0xFFFFFFFF, host_id, max(0, min(0xFFFF, int(interval_ms))),
+        _centi(cpu.get('usage')), _centi(memory.get('percent')),
+        _u32((memory.get('used') or 0) * 1024), _u32((memory.get('total') or 0) * 1024),
+        _centi(disk.get('percent')),
+        _centi(gpu.get('usage')) if gpu else NONE_U16,
+        NONE_I16 if gpu_temp is None else max(-0x7FFF, min(0x7FFF, int(round(gpu_temp)))),
+        _u32(network.get('sentRate')), _u32(network.get('recvRate'))
+    )
+
+
+def unpack(data):
+    """(header, stats) for a valid datagram, else None; stats mirrors the /stats layout"""
+    if len(data) != PACKET.size:
+        return None
+    (magic, version, flags, seq, boot, host_id, interval_ms,
+     cpu, mem_pct, mem_used, mem_total, disk_pct, gpu, gpu_temp, sent, recv) = PACKET.unpack(data)
+    if magic != TELEMETRY_MAGIC or version != TELEMETRY_VERSION:
+        return None
+
+    def pct(value):
+        return None if value == NONE_U16 else value / 100.0
+
+    stats = {
+        'cpu': {'usage': pct(cpu)},
+        'memory': {'used': round(mem_used / 1024, 2), 'total': round(mem_total / 1024, 2), 'percent': pct(mem_pct)},
+        'disk': {'percent': pct(disk_pct)},
+        'network': {'sentRate': sent, 'recvRate': recv}
+    }
+    if flags & FLAG_HAS_GPU:
+        stats['gpu'] = {'usage': pct(gpu), 'temp': None if gpu_temp == NONE_I16 else gpu_temp}
+    header = {'seq': seq, 'boot': boot, 'host': host_id, 'intervalMs': interval_ms}
+    return header, stats